@@ -0,0 +1,114 @@
+"""
+Servidor OpenAI falso para benchmarks: embeddings deterministas (bolsa de
+palabras con hashing) y chat que responde con la primera frase del contexto.
+La latencia de cada endpoint es configurable.
+
+    python -m benchmarks.fake_openai --port 8099 --embedding-latency 0.05 --chat-latency 0.8
+    DEV_OPENAI_BASE_URL=http://127.0.0.1:8099/v1 uvicorn main:app
+"""
+
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+
+DIMENSIONS = 1536
+WORD_PATTERN = re.compile(r"\w+")
+
+app = FastAPI()
+app.state.embedding_latency = 0.0
+app.state.chat_latency = 0.0
+app.state.jitter = 0.0
+
+
+def fake_embedding(text: str, dimensions: int = DIMENSIONS) -> list[float]:
+    """Textos con palabras en común tienen similitud coseno alta"""
+    vector = [0.0] * dimensions
+    for word in WORD_PATTERN.findall(text.lower()):
+        digest = int(hashlib.blake2b(word.encode(), digest_size=8).hexdigest(), 16)
+        vector[digest % dimensions] += 1.0 if digest & 1 else -1.0
+
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+async def simulate_latency(base: float) -> None:
+    if base:
+        await asyncio.sleep(max(0.0, random.gauss(base, base * app.state.jitter)))
+
+
+def usage(prompt: str, completion: str = "") -> dict:
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(completion) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    dimensions = body.get("dimensions") or DIMENSIONS
+
+    await simulate_latency(app.state.embedding_latency)
+
+    return {
+        "object": "list",
+        "model": body["model"],
+        "data": [
+            {"object": "embedding", "index": index, "embedding": fake_embedding(text, dimensions)}
+            for index, text in enumerate(inputs)
+        ],
+        "usage": usage(" ".join(inputs)),
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = " ".join(str(message.get("content") or "") for message in body["messages"])
+
+    await simulate_latency(app.state.chat_latency)
+
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", prompt) if s.strip()]
+    answer = sentences[1] if len(sentences) > 1 else "No Answer"
+
+    return {
+        "id": f"chatcmpl-{random.getrandbits(32):x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body["model"],
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": usage(prompt, answer),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--chat-latency", type=float, default=0.8)
+    parser.add_argument("--jitter", type=float, default=0.2, help="desviación relativa")
+    args = parser.parse_args()
+
+    app.state.embedding_latency = args.embedding_latency
+    app.state.chat_latency = args.chat_latency
+    app.state.jitter = args.jitter
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,83 @@
+"""
+Servidor SMTP local (aiosmtpd) para probar el outbox sin enviar correos de
+verdad. Acepta cualquier usuario y contraseña sin TLS, cuenta sesiones,
+logins y mensajes, y puede rechazar una fracción de los mensajes con un
+error temporal (451) o permanente (550).
+
+    python -m benchmarks.fake_smtp --port 8025 --temporary-failures 0.2
+    DEV_EMAIL_HOST=127.0.0.1 DEV_EMAIL_PORT=8025 DEV_EMAIL_USE_TLS=false uvicorn main:app
+"""
+
+import argparse
+import random
+import time
+from collections import Counter
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+STATS: Counter = Counter()
+
+
+class Handler:
+    def __init__(self, temporary_failures: float = 0.0, permanent_failures: float = 0.0):
+        self.temporary_failures = temporary_failures
+        self.permanent_failures = permanent_failures
+        self.messages: list = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        STATS["sessions"] += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        roll = random.random()
+        if roll < self.permanent_failures:
+            STATS["rejected"] += 1
+            return "550 Mailbox unavailable"
+        if roll < self.permanent_failures + self.temporary_failures:
+            STATS["deferred"] += 1
+            return "451 Try again later"
+
+        STATS["messages"] += 1
+        self.messages.append((envelope.rcpt_tos, envelope.content))
+        return "250 OK"
+
+
+def authenticator(server, session, envelope, mechanism, auth_data):
+    STATS["logins"] += 1
+    return AuthResult(success=True)
+
+
+def start(port: int = 8025, **failures) -> tuple[Controller, Handler]:
+    handler = Handler(**failures)
+    controller = Controller(
+        handler,
+        hostname="127.0.0.1",
+        port=port,
+        authenticator=authenticator,
+        auth_require_tls=False,
+    )
+    controller.start()
+    return controller, handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--temporary-failures", type=float, default=0.0)
+    parser.add_argument("--permanent-failures", type=float, default=0.0)
+    args = parser.parse_args()
+
+    controller, _ = start(
+        args.port,
+        temporary_failures=args.temporary_failures,
+        permanent_failures=args.permanent_failures,
+    )
+    print(f"SMTP on 127.0.0.1:{args.port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(dict(STATS))
+    except KeyboardInterrupt:
+        controller.stop()
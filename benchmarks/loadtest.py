@@ -0,0 +1,252 @@
+"""
+Escenarios de carga contra un servidor en marcha. Informa p50/p95/p99 y
+throughput y compara con las líneas base guardadas en benchmarks/baselines.
+
+    python -m benchmarks.fake_openai &
+    DEV_OPENAI_BASE_URL=http://127.0.0.1:8099/v1 uvicorn main:app --port 8000 &
+    python -m benchmarks.seed --documents 200 --pages 50
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --concurrency 16 --requests 400
+    python -m benchmarks.loadtest ... --save-baseline   # tras un cambio aceptado
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.pdf_backends import write_pdf
+from benchmarks.preprocessing import VOCABULARY
+from benchmarks.seed import BENCH_EMAIL, BENCH_PASSWORD
+from preprocessing import fold_accents
+
+BASELINES = Path(__file__).parent / "baselines"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def random_query(rng: random.Random) -> str:
+    return " ".join(rng.choices(VOCABULARY, k=rng.randint(3, 8)))
+
+
+def large_pdf(pages: int) -> bytes:
+    rng = random.Random(pages)
+    path = Path("/tmp") / f"documind_bench_{pages}.pdf"
+    if not path.exists():
+        lines = [
+            [fold_accents(" ".join(rng.choices(VOCABULARY, k=12))) for _ in range(40)]
+            for _ in range(pages)
+        ]
+        write_pdf(path, lines)
+    return path.read_bytes()
+
+
+def large_docx(paragraphs: int) -> bytes:
+    from docx import Document as DocxDocument
+
+    rng = random.Random(paragraphs)
+    document = DocxDocument()
+    for _ in range(paragraphs):
+        document.add_paragraph(" ".join(rng.choices(VOCABULARY, k=60)))
+    output = io.BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+class Scenarios:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.rng = random.Random(0)
+        self.headers: dict = {}
+        self.document_ids: list[int] = []
+
+    async def setup(self) -> None:
+        response = await self.client.post(
+            "/token", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD}
+        )
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = await self.client.get("/documents/", headers=self.headers)
+        response.raise_for_status()
+        self.document_ids = [document["id"] for document in response.json()]
+        if not self.document_ids:
+            sys.exit("Empty corpus, run python -m benchmarks.seed first")
+
+    async def search(self):
+        return await self.client.post(
+            "/documents/search",
+            json={"content": random_query(self.rng)},
+            headers=self.headers,
+        )
+
+    async def search_batch(self):
+        return await self.client.post(
+            "/documents/search/batch",
+            json={"queries": [random_query(self.rng) for _ in range(self.args.batch_size)]},
+            headers=self.headers,
+        )
+
+    async def document_search(self):
+        document_id = self.rng.choice(self.document_ids)
+        return await self.client.post(
+            f"/documents/{document_id}/search",
+            json={"content": random_query(self.rng)},
+            headers=self.headers,
+        )
+
+    async def page_search(self):
+        document_id = self.rng.choice(self.document_ids)
+        return await self.client.post(
+            f"/documents/{document_id}/page/{self.rng.randrange(self.args.pages)}/search",
+            json={"content": random_query(self.rng)},
+            headers=self.headers,
+        )
+
+    async def corpus_page_search(self):
+        return await self.client.post(
+            "/documents/pages/search",
+            params={"fanout": self.args.fanout} if self.args.fanout is not None else {},
+            json={"content": random_query(self.rng)},
+            headers=self.headers,
+        )
+
+    async def login(self):
+        return await self.client.post(
+            "/token", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD}
+        )
+
+    async def upload_pdf(self):
+        name = f"bench_upload_{self.rng.getrandbits(32):x}.pdf"
+        content = large_pdf(self.args.upload_pages)
+        return await self.client.post(
+            "/documents/upload",
+            files=[("files", (name, content, "application/pdf"))],
+            headers=self.headers,
+        )
+
+    async def upload_docx(self):
+        name = f"bench_upload_{self.rng.getrandbits(32):x}.docx"
+        content = large_docx(self.args.upload_pages)
+        return await self.client.post(
+            "/documents/upload",
+            files=[("files", (name, content, DOCX_TYPE))],
+            headers=self.headers,
+        )
+
+
+SCENARIOS = [
+    "search",
+    "search_batch",
+    "document_search",
+    "page_search",
+    "corpus_page_search",
+    "login",
+    "upload_pdf",
+    "upload_docx",
+]
+
+
+async def run_scenario(scenarios: Scenarios, name: str, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            start = time.perf_counter()
+            try:
+                response = await getattr(scenarios, name)()
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.fmean(latencies),
+        "throughput": requests / elapsed,
+    }
+
+
+def compare(name: str, result: dict, tolerance: float) -> bool:
+    """True si el escenario empeora más de tolerance respecto a su línea base"""
+    path = BASELINES / f"{name}.json"
+    if not path.exists():
+        return False
+
+    baseline = json.loads(path.read_text())
+    regressed = False
+    for metric in ("p50", "p95", "p99"):
+        if result[metric] > baseline[metric] * (1 + tolerance):
+            print(f"  REGRESSION {metric}: {baseline[metric] * 1000:.1f}ms -> {result[metric] * 1000:.1f}ms")
+            regressed = True
+
+    if result["throughput"] < baseline["throughput"] * (1 - tolerance):
+        print(f"  REGRESSION throughput: {baseline['throughput']:.1f} -> {result['throughput']:.1f} req/s")
+        regressed = True
+
+    return regressed
+
+
+async def main(args) -> int:
+    regressions = 0
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        scenarios = Scenarios(client, args)
+        await scenarios.setup()
+
+        for name in args.scenarios:
+            requests = args.upload_requests if name.startswith("upload") else args.requests
+            result = await run_scenario(scenarios, name, requests, args.concurrency)
+            print(
+                f"{name:<16} p50 {result['p50'] * 1000:8.1f}ms  p95 {result['p95'] * 1000:8.1f}ms  "
+                f"p99 {result['p99'] * 1000:8.1f}ms  {result['throughput']:7.1f} req/s  "
+                f"errors {result['errors']}"
+            )
+            regressions += compare(name, result, args.tolerance)
+
+            if args.save_baseline:
+                BASELINES.mkdir(exist_ok=True)
+                (BASELINES / f"{name}.json").write_text(json.dumps(result, indent=2) + "\n")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--upload-requests", type=int, default=5)
+    parser.add_argument("--upload-pages", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=20, help="páginas por documento sembrado")
+    parser.add_argument("--batch-size", type=int, default=32, help="consultas por search_batch")
+    parser.add_argument("--fanout", type=int, help="documentos preseleccionados, 0 = todos")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", action="store_true")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,114 @@
+"""
+Páginas por segundo de cada motor PDF sobre un corpus de ficheros, y cuántas
+tuvo que sacar PyPDF2 porque el motor falló. Un motor que no está instalado
+no se mide (extract_pdf_pages lo sustituiría entero por PyPDF2).
+
+    python -m benchmarks.pdf_backends --generate 20 --pages 50
+    python -m benchmarks.pdf_backends benchmarks/fixtures/pdf --backends pypdf2 pdfium
+"""
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+from benchmarks.preprocessing import VOCABULARY
+from pdf_backends import PDF_BACKENDS, extract_pdf_pages_with_fallbacks
+from preprocessing import fold_accents
+
+FIXTURES = Path(__file__).parent / "fixtures" / "pdf"
+
+
+def write_pdf(path: Path, pages: list[list[str]]) -> None:
+    """PDF mínimo con Helvetica y una línea de texto por cada elemento"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # /Pages, se rellena al final
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 800 Td " + " ".join(
+            f"({line}) Tj T*" for line in lines
+        )
+        stream += " ET"
+        data = stream.encode("latin-1", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(data), data))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(f"{len(objects)} 0 R")
+
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    path.write_bytes(bytes(output))
+
+
+def generate(directory: Path, files: int, pages: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    for index in range(files):
+        content = [
+            [fold_accents(" ".join(rng.choices(VOCABULARY, k=12))) for _ in range(40)]
+            for _ in range(pages)
+        ]
+        write_pdf(directory / f"fixture_{index:03d}.pdf", content)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", type=Path, default=FIXTURES)
+    parser.add_argument(
+        "--backends", nargs="+", choices=list(PDF_BACKENDS), default=list(PDF_BACKENDS)
+    )
+    parser.add_argument("--generate", type=int, default=0, help="ficheros sintéticos")
+    parser.add_argument("--pages", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.generate:
+        generate(args.directory, args.generate, args.pages)
+
+    files = sorted(args.directory.glob("*.pdf"))
+    if not files:
+        parser.error(f"No PDF files in {args.directory}, use --generate")
+
+    print(f"{len(files)} files in {args.directory}")
+    for backend in args.backends:
+        if not PDF_BACKENDS[backend].available():
+            print(f"{backend:<10} skipped: {PDF_BACKENDS[backend].module} is not installed")
+            continue
+
+        pages = fallbacks = 0
+        start = time.perf_counter()
+        try:
+            for file in files:
+                texts, fallback_pages = extract_pdf_pages_with_fallbacks(file, backend)
+                pages += len(texts)
+                fallbacks += fallback_pages
+        except Exception as exc:
+            print(f"{backend:<10} failed: {exc}")
+            continue
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"{backend:<10} {pages:6d} pages {elapsed:8.2f}s {pages / elapsed:8.1f} pages/s"
+            f"  {fallbacks} pypdf2 fallbacks"
+        )
+
+
+if __name__ == "__main__":
+    main()
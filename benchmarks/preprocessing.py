@@ -0,0 +1,91 @@
+"""
+Benchmark del preprocesado léxico sobre un corpus sintético.
+
+    python -m benchmarks.preprocessing --pages 5000 --words 400
+"""
+
+import argparse
+import random
+import re
+import time
+
+from preprocessing import preprocess_text, stop_words, tokenize
+
+VOCABULARY = (
+    "el la de que y a en un ser se no haber por con su para como estar tener "
+    "the of and to in is was for on with as by at from that this which "
+    "documento página válvula presión bomba hidráulica mantenimiento revisión "
+    "motor eléctrico seguridad operario código número año señal información "
+    "manual procedure warning pressure pump valve maintenance engine safety"
+).split()
+
+
+def synthetic_corpus(pages: int, words: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(pages):
+        tokens = rng.choices(VOCABULARY, k=words)
+        corpus.append(
+            " ".join(
+                token.capitalize() + "," if rng.random() < 0.05 else token
+                for token in tokens
+            )
+        )
+
+    return corpus
+
+
+def legacy_preprocess_text(text):
+    from nltk.corpus import stopwords
+    from nltk.tokenize import word_tokenize
+
+    text = text.lower()
+    text = re.sub(r"[^\w\s]", "", text)
+    tokens = word_tokenize(text)
+    stop_words = set(stopwords.words("spanish") + stopwords.words("english"))
+    tokens = [word for word in tokens if word not in stop_words]
+    return " ".join(tokens)
+
+
+def measure(name: str, function, corpus: list[str]) -> float:
+    start = time.perf_counter()
+    for page in corpus:
+        function(page)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.3f}s {len(corpus) / elapsed:10.0f} pages/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.pages, args.words)
+    print(f"{args.pages} pages x {args.words} words")
+
+    stop_words(False), stop_words(True)  # carga única, fuera de la medición
+    fast = measure("preprocess_text", preprocess_text, corpus)
+    measure("tokenize (fold accents)", lambda page: tokenize(page, fold=True), corpus)
+
+    if not args.skip_legacy:
+        try:
+            legacy = measure("legacy preprocess_text", legacy_preprocess_text, corpus)
+            print(f"speedup x{legacy / fast:.1f}")
+        except LookupError as exc:
+            print(f"legacy preprocess_text skipped: {exc}")
+
+    try:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        start = time.perf_counter()
+        TfidfVectorizer(preprocessor=preprocess_text).fit_transform(corpus)
+        print(f"{'TfidfVectorizer fit':<28} {time.perf_counter() - start:8.3f}s")
+    except ImportError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Recall frente a latencia de los perfiles de vectores (dimensiones reducidas,
+int8, binario + reordenado) contra los vectores completos actuales.
+
+Sin base de datos: corpus sintético denso con la varianza concentrada en las
+primeras dimensiones (como los modelos text-embedding-3), o los vectores
+reales de pages con --from-db (usa ENV_STATE). El recall sintético es solo
+orientativo; el que cuenta es el de --from-db.
+
+    python -m benchmarks.quantization --pages 20000 --queries 200
+    python -m benchmarks.quantization --from-db --dimensions 1536 512 256
+"""
+
+import argparse
+import time
+
+import numpy
+
+from quantization import code_scores, normalize, quantize, top_candidates
+
+
+def synthetic_vectors(pages: int, queries: int, dimensions: int, seed: int = 0):
+    """Páginas agrupadas en temas; cada consulta es una página con ruido"""
+    rng = numpy.random.default_rng(seed)
+    scale = 1 / numpy.sqrt(numpy.arange(1, dimensions + 1, dtype=numpy.float32))
+    topics = rng.normal(0, 1, (max(1, pages // 50), dimensions)) * scale
+    matrix = topics[rng.integers(len(topics), size=pages)]
+    matrix = matrix + rng.normal(0, 0.5, matrix.shape) * scale
+    picked = matrix[rng.integers(pages, size=queries)]
+    noisy = picked + rng.normal(0, 0.3, picked.shape) * scale
+    return matrix.astype(numpy.float32).tolist(), noisy.astype(numpy.float32).tolist()
+
+
+def database_vectors(queries: int, seed: int = 0):
+    """Vectores de pages; las consultas son páginas al azar con ruido"""
+    import sqlalchemy
+
+    from database import engine, page_table
+
+    with engine.connect() as conn:
+        query = sqlalchemy.select(page_table.c.embeddings).where(
+            page_table.c.embeddings.is_not(None)
+        )
+        vectors = [row[0] for row in conn.execute(query)]
+
+    rng = numpy.random.default_rng(seed)
+    matrix = numpy.asarray(vectors, dtype=numpy.float32)
+    picked = matrix[rng.choice(len(matrix), size=queries)]
+    noisy = picked + rng.normal(0, 0.02, picked.shape).astype(numpy.float32)
+    return vectors, noisy.tolist()
+
+
+def recall(found: numpy.ndarray, truth: numpy.ndarray) -> float:
+    hits = [len(set(f) & set(t)) for f, t in zip(found, truth)]
+    return sum(hits) / truth.size
+
+
+def evaluate(corpus: list, queries: list, dimensions: int, mode: str, k: int, factor: int):
+    vectors = [vector[:dimensions] for vector in corpus]
+    query_vectors = normalize([vector[:dimensions] for vector in queries])
+
+    # Cada consulta convierte de nuevo lo que devuelve la base de datos, como
+    # vector_scores: listas de floats en modo none, bytes en los cuantizados
+    found = []
+    if mode == "none":
+        bytes_per_vector = dimensions * 4
+        start = time.perf_counter()
+        for query in query_vectors:
+            scores = normalize(vectors) @ query
+            found.append(numpy.argsort(-scores)[:k])
+        return numpy.asarray(found), time.perf_counter() - start, bytes_per_vector
+
+    codes = quantize(vectors, mode)
+    bytes_per_vector = len(codes[0])
+    start = time.perf_counter()
+    for query in query_vectors:
+        candidates = top_candidates(code_scores([query], codes, mode), k * factor)
+        exact = normalize([vectors[index] for index in candidates]) @ query
+        found.append(candidates[numpy.argsort(-exact)[:k]])
+    return numpy.asarray(found), time.perf_counter() - start, bytes_per_vector
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--full-dimensions", type=int, default=1536)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1536, 512, 256])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--from-db", action="store_true")
+    args = parser.parse_args()
+
+    if args.from_db:
+        corpus, queries = database_vectors(args.queries)
+    else:
+        corpus, queries = synthetic_vectors(args.pages, args.queries, args.full_dimensions)
+
+    full = len(corpus[0])
+    truth = numpy.argsort(-(normalize(queries) @ normalize(corpus).T), axis=1)[:, : args.k]
+    # referencia: float64 en la base de datos, como antes del cambio
+    baseline_bytes = full * 8
+    print(f"{len(corpus)} vectors x {full} dims, {len(queries)} queries, recall@{args.k}")
+    print(f"{'profile':<16} {'bytes/vec':>10} {'ratio':>7} {'ms/query':>9} {'recall':>7}")
+
+    for dimensions in args.dimensions:
+        if dimensions > full:
+            continue
+        for mode in ("none", "int8", "binary"):
+            found, elapsed, size = evaluate(
+                corpus, queries, dimensions, mode, args.k, args.rescore_factor
+            )
+            print(
+                f"{mode + '/' + str(dimensions):<16} {size:>10} {baseline_bytes / size:>6.1f}x "
+                f"{elapsed / len(queries) * 1000:>9.2f} {recall(found, truth):>7.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
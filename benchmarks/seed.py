@@ -0,0 +1,170 @@
+"""
+Siembra la base de datos de ENV_STATE con un corpus sintético de N
+documentos x M páginas, con embeddings del servidor falso y postings BM25,
+más un usuario confirmado para los escenarios autenticados. Las páginas y los
+documentos quedan como los deja una subida (clave del modelo, content_hash,
+códigos y centroides), para que la búsqueda vectorial los encuentre.
+
+Las tablas usan ARRAY, así que hace falta un Postgres local (no SQLite).
+
+    python -m benchmarks.seed --documents 200 --pages 50
+"""
+
+import argparse
+import random
+import time
+from typing import Optional
+
+import sqlalchemy
+
+from benchmarks.fake_openai import DIMENSIONS, fake_embedding
+from benchmarks.preprocessing import VOCABULARY
+from config import config
+from database import (
+    centroid_table,
+    create_schema,
+    document_table,
+    embedding_index_table,
+    engine,
+    page_table,
+    posting_table,
+    user_table,
+)
+from embeddings import qualified_model, vector_key
+from quantization import quantize
+from search import document_vectors, lexical_terms, page_hash, page_postings
+from security import get_password_hash
+
+BENCH_EMAIL = "bench@documind.local"
+BENCH_PASSWORD = "bench-password"
+
+
+def synthetic_page(rng: random.Random, document: int, page: int) -> str:
+    words = rng.choices(VOCABULARY, k=rng.randint(150, 400))
+    # un código único por página para las búsquedas exactas
+    words.insert(rng.randrange(len(words)), f"DOC{document}-P{page}")
+    return " ".join(words)
+
+
+def embedding_profile(conn) -> tuple[str, Optional[int]]:
+    """Modelo y dimensiones del índice activo, como utils.embedding_profile"""
+    index = conn.execute(
+        embedding_index_table.select().where(embedding_index_table.c.status == "active")
+    ).first()
+    if index:
+        return index.model, index.dimensions
+    model = qualified_model(config.EMBEDDING_PROVIDER, config.EMBEDDING_MODEL)
+    return model, config.EMBEDDING_DIMENSIONS
+
+
+def seed(documents: int, pages: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    create_schema()
+
+    with engine.begin() as conn:
+        conn.execute(user_table.delete().where(user_table.c.email == BENCH_EMAIL))
+        conn.execute(
+            user_table.insert().values(
+                email=BENCH_EMAIL,
+                password=get_password_hash(BENCH_PASSWORD),
+                confirmed=True,
+            )
+        )
+        model, dimensions = embedding_profile(conn)
+
+    # la misma clave que query_embeddings; sin dimensions el servidor falso
+    # responde vectores de DIMENSIONS
+    key = vector_key(model, dimensions)
+    dimensions = dimensions or DIMENSIONS
+
+    start = time.perf_counter()
+    for number in range(documents):
+        contents = [synthetic_page(rng, number, page) for page in range(pages)]
+        name = f"bench_{number:05d}.pdf"
+
+        pages_data = [
+            {
+                "content": content,
+                "embeddings": fake_embedding(content[:2000], dimensions),
+                "embedding_model": key,
+                "terms": lexical_terms(content),
+            }
+            for content in contents
+        ]
+        for page in pages_data:
+            page["length"] = sum(page["terms"].values())
+        centroids, codes, _ = document_vectors(pages_data)
+        page_codes = (
+            quantize([page["embeddings"] for page in pages_data], config.VECTOR_QUANTIZATION)
+            if config.VECTOR_QUANTIZATION != "none"
+            else [None] * len(pages_data)
+        )
+
+        with engine.begin() as conn:
+            document_id = conn.execute(
+                document_table.insert()
+                .values(
+                    name=name,
+                    url=f"{config.DOMAIN}/{config.DOCUMENT_PATH}/{name}",
+                    embeddings=centroids[0],
+                    codes=codes[0],
+                    embedding_model=key,
+                )
+                .returning(document_table.c.id)
+            ).scalar_one()
+            if len(centroids) > 1:
+                conn.execute(
+                    centroid_table.insert(),
+                    [
+                        {
+                            "document_id": document_id,
+                            "embeddings": vector,
+                            "codes": code,
+                            "embedding_model": key,
+                        }
+                        for vector, code in zip(centroids[1:], codes[1:])
+                    ],
+                )
+
+            for page_number, (page, code) in enumerate(zip(pages_data, page_codes)):
+                page_id = conn.execute(
+                    page_table.insert()
+                    .values(
+                        page_number=page_number,
+                        document_id=document_id,
+                        content=page["content"],
+                        content_hash=page_hash(page["content"]),
+                        embeddings=page["embeddings"],
+                        embedding_model=key,
+                        codes=code,
+                        length=page["length"],
+                    )
+                    .returning(page_table.c.id)
+                ).scalar_one()
+                conn.execute(
+                    posting_table.insert(), page_postings(page_id, document_id, page["terms"])
+                )
+
+        if (number + 1) % 10 == 0:
+            print(f"{number + 1}/{documents} documents")
+
+    elapsed = time.perf_counter() - start
+    print(f"{documents * pages} pages seeded in {elapsed:.1f}s")
+
+
+def reset() -> None:
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text("TRUNCATE documents RESTART IDENTITY CASCADE"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset", action="store_true", help="vacía el corpus antes")
+    args = parser.parse_args()
+
+    if args.reset:
+        reset()
+    seed(args.documents, args.pages, args.seed)
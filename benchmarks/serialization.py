@@ -0,0 +1,100 @@
+"""
+Coste por petición de montar y serializar los resultados de /documents/search
+sobre un corpus sintético de N documentos, sin base de datos ni OpenAI
+(importa search, así que necesita la configuración de ENV_STATE, pero no
+conecta).
+
+    antes:   un DocumentWithSimilarity por documento, sort completo, [:limit],
+             validación del response_model y json.dumps de FastAPI
+    ahora:   top-k sobre el array, modelos solo para los ganadores y orjson
+
+    python -m benchmarks.serialization --documents 5000 --limit 10
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from config import config
+from models.document import DocumentWithSimilarity
+from responses import ORJSONModelResponse
+from search import ranking, reciprocal_rank_fusion, top_scores
+
+ADAPTER = TypeAdapter(list[DocumentWithSimilarity])
+
+
+def synthetic_corpus(documents: int, seed: int = 0):
+    rng = numpy.random.default_rng(seed)
+    ids = list(range(1, documents + 1))
+    names = {id: f"documento-{id}.pdf" for id in ids}
+    scores = rng.random(documents, dtype=numpy.float32)
+    lexical_ids = rng.choice(ids, size=max(1, documents // 10), replace=False).tolist()
+    lexical = dict(zip(lexical_ids, rng.random(len(lexical_ids)).tolist()))
+    return ids, names, scores, lexical
+
+
+def document(id: int, names: dict, similarity: float, score: float) -> DocumentWithSimilarity:
+    return DocumentWithSimilarity(
+        id=id, name=names[id], url=f"/media/{names[id]}", similarity=similarity, score=score
+    )
+
+
+def before(ids, names, scores, lexical, limit) -> tuple[bytes, int]:
+    vector = dict(zip(ids, map(float, scores)))
+    fused = reciprocal_rank_fusion(ranking(vector), ranking(lexical))
+    documents = [document(id, names, vector.get(id, 0.0), fused[id]) for id in fused]
+    winners = sorted(documents, key=lambda doc: doc.score, reverse=True)[:limit]
+
+    # Lo que hace FastAPI con el valor devuelto y el response_model
+    validated = ADAPTER.validate_python(winners, from_attributes=True)
+    content = jsonable_encoder(ADAPTER.dump_python(validated, mode="json"))
+    return JSONResponse(content).body, len(documents) + len(validated)
+
+
+def after(ids, names, scores, lexical, limit) -> tuple[bytes, int]:
+    vector = top_scores(ids, scores[None, :], limit * config.RESCORE_FACTOR)[0]
+    fused = reciprocal_rank_fusion(ranking(vector), ranking(lexical))
+    winners = [document(id, names, vector.get(id, 0.0), fused[id]) for id in ranking(fused, limit)]
+    return ORJSONModelResponse(winners).body, len(winners)
+
+
+def measure(path, corpus, limit: int, requests: int) -> tuple[float, float, int]:
+    """ms por petición, pico de memoria en KiB y modelos construidos"""
+    path(*corpus, limit)  # calentamiento
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        _, models = path(*corpus, limit)
+    elapsed = (time.perf_counter() - start) / requests * 1000
+
+    tracemalloc.start()
+    path(*corpus, limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak / 1024, models
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"limit={args.limit}, {args.requests} requests per row")
+    print(f"{'documents':>9} {'path':<7} {'ms/req':>8} {'peak KiB':>9} {'models':>7}")
+    for documents in args.documents:
+        corpus = synthetic_corpus(documents)
+        for name, path in (("before", before), ("after", after)):
+            elapsed, peak, models = measure(path, corpus, args.limit, args.requests)
+            print(f"{documents:>9} {name:<7} {elapsed:>8.2f} {peak:>9.0f} {models:>7}")
+
+
+if __name__ == "__main__":
+    main()
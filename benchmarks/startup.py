@@ -0,0 +1,91 @@
+"""
+Arranque en frío de un worker: tiempo de `import main` en procesos nuevos
+(mediana de varias ejecuciones), las librerías pesadas que ya están cargadas
+al terminar el import y los módulos que más tardan según -X importtime.
+Con --lifespan mide también el arranque de la aplicación (esquema, conexión
+a la base de datos y clientes), así que necesita la base de datos de ENV_STATE.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --lifespan
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Deben cargarse al primer uso, no al arrancar
+HEAVY_MODULES = (
+    "numpy",
+    "sklearn",
+    "scipy",
+    "PyPDF2",
+    "docx",
+    "nltk",
+    "openai",
+    "sentry_sdk",
+    "tiktoken",
+    "sentence_transformers",
+)
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+lifespan = None
+if {lifespan}:
+    from fastapi.testclient import TestClient
+    start = time.perf_counter()
+    with TestClient(main.app):
+        lifespan = time.perf_counter() - start
+print(json.dumps({{"import": imported, "lifespan": lifespan, "heavy": heavy}}))
+"""
+
+
+def probe(lifespan: bool, importtime: bool = False) -> tuple[dict, str]:
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c"]
+    command.append(PROBE.format(heavy=HEAVY_MODULES, lifespan=lifespan))
+    result = subprocess.run(command, capture_output=True, text=True, env=os.environ, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(stderr: str, count: int) -> list[tuple[int, str]]:
+    """Módulos de primer nivel importados por main, por tiempo acumulado (µs)"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith("   ") and not name.startswith("    "):  # hijos directos de main
+            modules.append((int(cumulative), name.strip()))
+
+    return sorted(modules, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--lifespan", action="store_true")
+    args = parser.parse_args()
+
+    results = [probe(args.lifespan)[0] for _ in range(args.runs)]
+    imports = [result["import"] * 1000 for result in results]
+    print(f"import main: median {statistics.median(imports):.0f} ms, max {max(imports):.0f} ms")
+    if args.lifespan:
+        lifespans = [result["lifespan"] * 1000 for result in results]
+        print(f"lifespan startup: median {statistics.median(lifespans):.0f} ms")
+    print(f"heavy modules loaded at import: {', '.join(results[0]['heavy']) or 'none'}")
+
+    _, stderr = probe(False, importtime=True)
+    print("slowest imports (cumulative):")
+    for microseconds, name in slowest_imports(stderr, args.top):
+        print(f"  {microseconds / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,10 @@ import asyncio
 import json
 import time
 
-from openai import AsyncOpenAI
+from config import config, get_openai_client, logger
+from metrics import LLM_BUDGET_EXHAUSTED, LLM_LATENCY, LLM_TOKENS
 
-from config import config, logger
+llm_logger = logger.getChild("llm")
 
 
 class Completions:
@@ -15,37 +16,93 @@ class Completions:
         json_tools=[],
         functions={},
         tool_choice="auto",
+        max_rounds=None,
+        max_tokens=None,
+        timeout=None,
+        fallback_response="No Answer",
     ):
-        self.client = AsyncOpenAI(
-            api_key=config.OPENAI_API_KEY,
-        )
+        self.client = get_openai_client()
         self.name = name
         self.model = model
         self.json_tools = json_tools
         self.functions = functions
         self.tool_choice = tool_choice
         self.error_response = """Ha ocurrido un error ejecutando la herramienta {tool_name} con los argumentos {tool_args}"""
+        # Presupuesto de cada submit_message; al agotarse se devuelve fallback_response
+        self.max_rounds = max_rounds or config.LLM_MAX_ROUNDS
+        self.max_tokens = max_tokens or config.LLM_MAX_TOKENS
+        self.timeout = timeout or config.LLM_TIMEOUT
+        self.fallback_response = fallback_response
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        self.exhausted = None  # rounds | tokens | deadline si se cortó la última petición
 
     async def submit_message(self, messages):
         last_time = time.time()
+        deadline = time.monotonic() + self.timeout
+        self.usage = dict.fromkeys(self.usage, 0)
+        self.exhausted = None
         logger.debug(f"Running {self.name} with {len(self.functions)} tools")
-        while True:
+
+        for round_number in range(1, self.max_rounds + 1):
+            # En la última vuelta no se ofrecen herramientas: que responda con lo que tiene
+            last_round = round_number == self.max_rounds and self.json_tools
+            try:
+                response = await asyncio.wait_for(
+                    self.create(messages, "none" if last_round else self.tool_choice),
+                    deadline - time.monotonic(),
+                )
+            except asyncio.TimeoutError:
+                return self.degrade("deadline")
+
+            if not response.choices[0].message.tool_calls:
+                break
+
+            if self.usage["prompt_tokens"] + self.usage["completion_tokens"] >= self.max_tokens:
+                return self.degrade("tokens")
+
+            self.run_tools(messages, response)
+        else:
+            return self.degrade("rounds")
+
+        ans = (response.choices[0].message.content or "").strip()
+        llm_logger.debug("Performance de %s: %s", self.name, time.time() - last_time)
+        llm_logger.debug("Tokens de %s: %s", self.name, self.usage)
+        llm_logger.debug("%s: %.200s", self.name, ans)
+        return ans
+
+    async def create(self, messages, tool_choice):
+        with LLM_LATENCY.time(call_site=self.name, model=self.model):
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 tools=self.json_tools,
-                tool_choice=self.tool_choice,  # type: ignore
+                tool_choice=tool_choice,  # type: ignore
             )
-            if response.choices[0].message.tool_calls:
-                self.run_tools(messages, response)
-                continue
-
-            break
-
-        ans = response.choices[0].message.content.strip()  # type: ignore
-        logger.debug(f"Performance de {self.name}: {time.time() - last_time}")
-        logger.debug(f"{self.name}: {ans}")
-        return ans
+        self.add_usage(response.usage)
+        return response
+
+    def degrade(self, reason: str) -> str:
+        """Corta la petición sin error: se queda con fallback_response"""
+        self.exhausted = reason
+        LLM_BUDGET_EXHAUSTED.inc(call_site=self.name, reason=reason)
+        logger.warning(f"{self.name} ran out of {reason} budget, usage {self.usage}")
+        return self.fallback_response
+
+    def add_usage(self, usage) -> None:
+        """Suma los tokens de cada vuelta (incluidas las de herramientas)"""
+        if usage is None:
+            return
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        tokens = {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "completion_tokens": usage.completion_tokens or 0,
+            "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        }
+        for key, value in tokens.items():
+            self.usage[key] += value
+            kind = key.removesuffix("_tokens")
+            LLM_TOKENS.inc(value, call_site=self.name, model=self.model, kind=kind)
 
     def run_tools(self, messages, response) -> None:
         tools = response.choices[0].message.tool_calls
@@ -55,15 +112,15 @@ class Completions:
         for tool in tools:
             function_name = tool.function.name
             function_args = json.loads(tool.function.arguments)
-            logger.info(f"function_name: {function_name}")
-            logger.info(f"function_args: {function_args}")
+            llm_logger.debug("function_name: %s", function_name)
+            llm_logger.debug("function_args: %s", function_args)
             function_to_call = self.functions[function_name]
 
             try:
                 function_response = function_to_call(
                     **function_args,
                 )
-                logger.info(f"{tool.function.name}: {function_response[:100]}")
+                llm_logger.debug("%s: %.100s", tool.function.name, function_response)
             except Exception as exc:
                 logger.error(f"{tool.function.name}: {exc}")
                 function_response = self.error_response.format(
@@ -1,15 +1,11 @@
 import logging
 from functools import lru_cache
 from typing import Optional
-from openai import AsyncOpenAI
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from logging_conf import configure_logging
 
-configure_logging()
-logger = logging.getLogger("app")
-
 
 class BaseConfig(BaseSettings):
     ENV_STATE: Optional[str] = None
@@ -23,20 +19,70 @@ class GlobalConfig(BaseConfig):
     EMAIL: Optional[str] = None
     EMAIL_PASSWORD: Optional[str] = None
     EMAIL_HOST: Optional[str] = None
+    EMAIL_PORT: int = 465
+    EMAIL_USE_TLS: bool = True  # TLS implícito (465); False para servidores locales
     ADMIN_EMAIL: Optional[str] = None
 
+    # Outbox de correos (notifications.py)
+    OUTBOX_BATCH_SIZE: int = 50  # mensajes por conexión SMTP
+    OUTBOX_RATE_LIMIT: float = 5.0  # mensajes por segundo como máximo
+    OUTBOX_MAX_ATTEMPTS: int = 5  # después queda como failed
+    OUTBOX_RETRY_DELAY: float = 30.0  # segundos; se dobla en cada intento
+    OUTBOX_POLL_INTERVAL: float = 10.0  # segundos entre consultas sin avisos
+
     B2_KEY_ID: Optional[str] = None
     B2_APPLICATION_KEY: Optional[str] = None
     B2_BUCKET_NAME: Optional[str] = None
 
     SECRET_KEY: Optional[str] = None
     SENTRY_DSN: Optional[str] = None
+    SENTRY_TRACES_SAMPLE_RATE: float = 1.0
+    SENTRY_PROFILES_SAMPLE_RATE: float = 1.0
 
     DOCUMENT_PATH: Optional[str] = None
+    EXTRACTION_CACHE_PATH: str = ".cache/extracted"
+    EXTRACTION_CONCURRENCY: int = 4  # conversores externos simultáneos
+    EXTRACTION_TIMEOUT: float = 120.0
+    PDF_BACKEND: str = "pypdf2"  # pypdf2 | pdfium | pdfminer
 
     DOMAIN: Optional[str] = None
 
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_BASE_URL: Optional[str] = None  # benchmarks: servidor OpenAI falso
+
+    DOCUMENT_CENTROIDS: int = 1  # >1: centroides k-means extra por documento
+    SEARCH_FANOUT: int = 20  # documentos preseleccionados en la búsqueda de páginas, 0 = todos
+    SEARCH_CACHE_SIZE: int = 1024  # resultados de /documents/search en memoria, 0 = sin caché
+    LEXICAL_MAX_DF: float = 0.5  # términos en más de esa fracción de páginas no puntúan, 0 = todos
+
+    EMBEDDING_PROVIDER: str = "openai"  # openai | local (embeddings.py)
+    EMBEDDING_MODEL: str = "text-embedding-3-small"  # hasta el primer reembed.py
+    EMBEDDING_DIMENSIONS: Optional[int] = None  # p. ej. 512; None = las del modelo
+    EMBEDDING_PROFILE_TTL: float = 5.0  # segundos que se guarda el índice activo en memoria
+    EMBEDDING_LOCAL_BACKEND: str = "torch"  # torch | onnx (sentence-transformers >= 3.2)
+    EMBEDDING_LOCAL_THREADS: int = 2  # lotes en paralelo del proveedor local
+    EMBEDDING_LOCAL_BATCH_SIZE: int = 32  # textos por lote del proveedor local
+    VECTOR_QUANTIZATION: str = "none"  # none | int8 | binary, tras python quantization.py
+    RESCORE_FACTOR: int = 4  # candidatos cuantizados por resultado a reordenar
+
+    PURGE_BATCH_SIZE: int = 500  # filas por DELETE al purgar documentos borrados
+
+    PAGE_PROMPT_TOKEN_BUDGET: int = 3000  # texto de la página en el prompt de PAGE_QA
+    ANSWER_EXTRACTIVE_THRESHOLD: float = 0.5  # coseno TF-IDF mínimo sin LLM, >1 lo desactiva
+
+    ASK_TOP_PAGES: int = 3  # páginas que /ask pasa al LLM
+    ASK_TOKEN_BUDGET: int = 6000  # contexto máximo en modo packed
+
+    # Presupuesto de cada Completions.submit_message (todas sus vueltas)
+    LLM_MAX_ROUNDS: int = 5  # llamadas al LLM, incluidas las de herramientas
+    LLM_MAX_TOKENS: int = 20000  # tokens de entrada + salida acumulados
+    LLM_TIMEOUT: float = 30.0  # segundos hasta el límite de la petición
+
+    LOG_PROFILE: str = "dev"  # dev: consola Rich | prod: JSON en fichero
+    LOG_QUEUE: bool = True  # formateo y escritura en un hilo aparte
+    LOG_LEVELS: dict[str, str] = {}  # {"app.ingest": "INFO"}
+    LOG_SAMPLING: dict[str, float] = {}  # {"app.llm": 0.1}, solo < WARNING
+    LOG_FILE_MAX_BYTES: int = 50 * 1024 * 1024
 
 
 class DevConfig(GlobalConfig):
@@ -57,7 +103,23 @@ def get_config(env_state: str) -> GlobalConfig:
 
 
 config = get_config(BaseConfig().ENV_STATE)
-openai_client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
+
+configure_logging(
+    profile=config.LOG_PROFILE,
+    use_queue=config.LOG_QUEUE,
+    levels=config.LOG_LEVELS,
+    sampling=config.LOG_SAMPLING,
+    max_bytes=config.LOG_FILE_MAX_BYTES,
+)
+logger = logging.getLogger("app")
+
+
+@lru_cache
+def get_openai_client():
+    """Cliente de OpenAI compartido; se crea en el lifespan (o al primer uso)"""
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=config.OPENAI_API_KEY, base_url=config.OPENAI_BASE_URL)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,15 @@
 import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
 
 import databases
 import sqlalchemy
 from sqlalchemy.sql import func
 
 from config import config
+from embeddings import qualified_model, vector_key
+from metrics import DB_POOL_WAIT, DB_QUERY_LATENCY
 
 metadata = sqlalchemy.MetaData()
 
@@ -14,7 +19,23 @@ document_table = sqlalchemy.Table(
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("name", sqlalchemy.String, nullable=False),
     sqlalchemy.Column("url", sqlalchemy.String, nullable=False),
-    sqlalchemy.Column("embeddings", sqlalchemy.ARRAY(sqlalchemy.Float)),
+    sqlalchemy.Column("embeddings", sqlalchemy.ARRAY(sqlalchemy.REAL)),
+    sqlalchemy.Column("codes", sqlalchemy.LargeBinary),  # embeddings cuantizados
+    sqlalchemy.Column("embedding_model", sqlalchemy.String),
+    # vector del índice en construcción (reembed.py) hasta el cambio
+    sqlalchemy.Column("next_embeddings", sqlalchemy.ARRAY(sqlalchemy.REAL)),
+    sqlalchemy.Column("next_codes", sqlalchemy.LargeBinary),
+    sqlalchemy.Column("deleted_at", sqlalchemy.TIMESTAMP),  # pendiente de purge.py
+    # Sin dueño: documentos anteriores a la propiedad, visibles para todos y
+    # modificables solo por el administrador (ADMIN_EMAIL)
+    sqlalchemy.Column(
+        "owner_id", sqlalchemy.ForeignKey("users.id", ondelete="SET NULL"), index=True
+    ),
+)
+
+# Documentos visibles: los borrados desaparecen antes de purgar sus páginas
+live_document_ids = sqlalchemy.select(document_table.c.id).where(
+    document_table.c.deleted_at.is_(None)
 )
 
 page_table = sqlalchemy.Table(
@@ -26,9 +47,37 @@ page_table = sqlalchemy.Table(
         "document_id",
         sqlalchemy.ForeignKey("documents.id", ondelete="CASCADE"),
         nullable=False,
+        index=True,
     ),
     sqlalchemy.Column("content", sqlalchemy.Text, nullable=False),
-    sqlalchemy.Column("embeddings", sqlalchemy.ARRAY(sqlalchemy.Float)),
+    sqlalchemy.Column("embeddings", sqlalchemy.ARRAY(sqlalchemy.REAL)),
+    sqlalchemy.Column("codes", sqlalchemy.LargeBinary),  # embeddings cuantizados
+    sqlalchemy.Column("embedding_model", sqlalchemy.String),
+    sqlalchemy.Column("length", sqlalchemy.Integer),  # términos indexados (BM25)
+    sqlalchemy.Column("content_hash", sqlalchemy.String),  # sha256, PUT /documents/{id}
+    # vectores del índice en construcción (reembed.py) hasta el cambio
+    sqlalchemy.Column("next_embeddings", sqlalchemy.ARRAY(sqlalchemy.REAL)),
+    sqlalchemy.Column("next_codes", sqlalchemy.LargeBinary),
+)
+
+posting_table = sqlalchemy.Table(
+    "postings",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("term", sqlalchemy.String, nullable=False, index=True),
+    sqlalchemy.Column("frequency", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column(
+        "page_id",
+        sqlalchemy.ForeignKey("pages.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    ),
+    sqlalchemy.Column(
+        "document_id",
+        sqlalchemy.ForeignKey("documents.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    ),
 )
 
 user_table = sqlalchemy.Table(
@@ -40,6 +89,75 @@ user_table = sqlalchemy.Table(
     sqlalchemy.Column("confirmed", sqlalchemy.Boolean, default=False),
 )
 
+share_table = sqlalchemy.Table(
+    "document_shares",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column(
+        "document_id",
+        sqlalchemy.ForeignKey("documents.id", ondelete="CASCADE"),
+        nullable=False,
+    ),
+    sqlalchemy.Column(
+        "user_id",
+        sqlalchemy.ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    ),
+    sqlalchemy.Column(
+        "created_at", sqlalchemy.TIMESTAMP, nullable=False, server_default=func.now()
+    ),
+    sqlalchemy.UniqueConstraint("document_id", "user_id"),
+)
+
+
+def visible_document_ids(user_id: Optional[int]):
+    """Documentos vivos del usuario, compartidos con él o sin dueño (None: todos)"""
+    if user_id is None:
+        return live_document_ids
+
+    shared = sqlalchemy.select(share_table.c.document_id).where(share_table.c.user_id == user_id)
+    return live_document_ids.where(
+        sqlalchemy.or_(
+            document_table.c.owner_id == user_id,
+            document_table.c.owner_id.is_(None),
+            document_table.c.id.in_(shared),
+        )
+    )
+
+
+def owned_document_ids(user_id: int, admin: bool = False):
+    """
+    Documentos vivos que el usuario puede modificar, borrar y compartir. Los
+    que no tienen dueño se leen pero solo los modifica el administrador.
+    """
+    owned = document_table.c.owner_id == user_id
+    if admin:
+        owned = sqlalchemy.or_(owned, document_table.c.owner_id.is_(None))
+    return live_document_ids.where(owned)
+
+
+outbox_table = sqlalchemy.Table(
+    "outbox",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("recipient", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("subject", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("body", sqlalchemy.Text, nullable=False),
+    # pending | sent | failed
+    sqlalchemy.Column("status", sqlalchemy.String, nullable=False, server_default="pending"),
+    sqlalchemy.Column("attempts", sqlalchemy.Integer, nullable=False, server_default="0"),
+    sqlalchemy.Column(
+        "next_attempt_at", sqlalchemy.TIMESTAMP, nullable=False, server_default=func.now()
+    ),
+    sqlalchemy.Column("last_error", sqlalchemy.String),
+    sqlalchemy.Column(
+        "created_at", sqlalchemy.TIMESTAMP, nullable=False, server_default=func.now()
+    ),
+    sqlalchemy.Column("sent_at", sqlalchemy.TIMESTAMP),
+    sqlalchemy.Index("ix_outbox_pending", "status", "next_attempt_at"),
+)
+
 query_table = sqlalchemy.Table(
     "querys",
     metadata,
@@ -52,17 +170,219 @@ query_table = sqlalchemy.Table(
         sqlalchemy.ForeignKey("documents.id", ondelete="CASCADE"),
         nullable=False,
     ),
+    sqlalchemy.Column("tier", sqlalchemy.String),  # extractive | llm
+    sqlalchemy.Column("tokens_in", sqlalchemy.Integer),
+    sqlalchemy.Column("tokens_out", sqlalchemy.Integer),
+    sqlalchemy.Column(
+        "user_id", sqlalchemy.ForeignKey("users.id", ondelete="SET NULL"), index=True
+    ),
+    sqlalchemy.Column(
+        "created_at", sqlalchemy.TIMESTAMP, nullable=False, server_default=func.now()
+    ),
+)
+
+centroid_table = sqlalchemy.Table(
+    "document_centroids",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column(
+        "document_id",
+        sqlalchemy.ForeignKey("documents.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    ),
+    sqlalchemy.Column("embeddings", sqlalchemy.ARRAY(sqlalchemy.REAL), nullable=False),
+    sqlalchemy.Column("codes", sqlalchemy.LargeBinary),
+    sqlalchemy.Column("embedding_model", sqlalchemy.String),
+)
+
+embedding_index_table = sqlalchemy.Table(
+    "embedding_indexes",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("model", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("dimensions", sqlalchemy.Integer),
+    sqlalchemy.Column("status", sqlalchemy.String, nullable=False),  # building | active | retired
+    sqlalchemy.Column("last_page_id", sqlalchemy.Integer, nullable=False, server_default="0"),
+    sqlalchemy.Column("pages_done", sqlalchemy.Integer, nullable=False, server_default="0"),
+    sqlalchemy.Column(
+        "created_at", sqlalchemy.TIMESTAMP, nullable=False, server_default=func.now()
+    ),
+    sqlalchemy.Column("activated_at", sqlalchemy.TIMESTAMP),
+)
+
+# Punto de control de ingest.py: un fichero importado (o fallido) por ruta de origen
+import_table = sqlalchemy.Table(
+    "imported_files",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("source", sqlalchemy.String, nullable=False, unique=True),
+    sqlalchemy.Column(
+        "document_id", sqlalchemy.ForeignKey("documents.id", ondelete="SET NULL")
+    ),
+    sqlalchemy.Column("error", sqlalchemy.String),
     sqlalchemy.Column(
         "created_at", sqlalchemy.TIMESTAMP, nullable=False, server_default=func.now()
     ),
 )
 
+# Se incrementa con cada cambio visible del corpus (subidas, borrados,
+# reembebidos); invalida la caché de resultados de búsqueda
+corpus_version = sqlalchemy.Sequence("corpus_version", metadata=metadata)
+
 connect_args = {"check_same_thread": False} if "sqlite" in config.DATABASE_URL else {}  # type: ignore
 engine = sqlalchemy.create_engine(str(config.DATABASE_URL), connect_args=connect_args)
 
-metadata.create_all(engine)
+
+def add_missing_columns() -> set[tuple[str, str]]:
+    """
+    Añade a las tablas existentes las columnas declaradas después de crearlas
+    y devuelve las añadidas como (tabla, columna)
+    """
+    inspector = sqlalchemy.inspect(engine)
+    added = set()
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                column_type = column.type.compile(engine.dialect)
+                conn.execute(
+                    sqlalchemy.text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+                added.add((table.name, column.name))
+
+    return added
+
+
+# Antes de guardar embedding_model todos los vectores salían de este modelo
+LEGACY_EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def needs_embedding_backfill(added: set[tuple[str, str]]) -> bool:
+    """Si se acaba de añadir embedding_model o quedan documentos con vector y sin modelo"""
+    tables = {"documents", "pages", "document_centroids"}
+    if any(column == "embedding_model" and table in tables for table, column in added):
+        return True
+
+    query = sqlalchemy.select(
+        sqlalchemy.exists().where(
+            document_table.c.embedding_model.is_(None), document_table.c.embeddings.is_not(None)
+        )
+    )
+    with engine.connect() as conn:
+        return bool(conn.execute(query).scalar())
+
+
+def backfill_embedding_models() -> None:
+    """
+    La búsqueda solo compara vectores del mismo modelo que la consulta, así
+    que los que no lo tienen anotado reciben el que los generó
+    """
+    with engine.begin() as conn:
+        for table in (document_table, page_table):
+            conn.execute(
+                table.update()
+                .where(table.c.embedding_model.is_(None), table.c.embeddings.is_not(None))
+                .values(embedding_model=LEGACY_EMBEDDING_MODEL)
+            )
+        conn.execute(
+            centroid_table.update()
+            .where(centroid_table.c.embedding_model.is_(None))
+            .where(centroid_table.c.document_id == document_table.c.id)
+            .values(embedding_model=document_table.c.embedding_model)
+        )
+
+
+def annotate_dimensions() -> None:
+    """
+    Antes de embeddings.vector_key, embedding_model no llevaba las dimensiones:
+    los vectores recortados del perfil activo reciben la clave completa
+    """
+    with engine.begin() as conn:
+        query = embedding_index_table.select().where(embedding_index_table.c.status == "active")
+        index = conn.execute(query).first()
+        if index:
+            model, dimensions = index.model, index.dimensions
+        else:
+            model = qualified_model(config.EMBEDDING_PROVIDER, config.EMBEDDING_MODEL)
+            dimensions = config.EMBEDDING_DIMENSIONS
+        if not dimensions:
+            return
+
+        pending = sqlalchemy.select(
+            sqlalchemy.exists().where(document_table.c.embedding_model == model)
+        )
+        if not conn.execute(pending).scalar():
+            return
+
+        for table in (document_table, page_table, centroid_table):
+            conn.execute(
+                table.update()
+                .where(table.c.embedding_model == model)
+                .where(func.cardinality(table.c.embeddings) == dimensions)
+                .values(embedding_model=vector_key(model, dimensions))
+            )
+
+
+def create_schema() -> None:
+    """Tablas y columnas que falten; lo ejecuta el lifespan de la aplicación al arrancar"""
+    metadata.create_all(engine)
+    if needs_embedding_backfill(add_missing_columns()):
+        backfill_embedding_models()
+    annotate_dimensions()
+    for table in metadata.sorted_tables:  # índices declarados después de crear la tabla
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+class InstrumentedDatabase(databases.Database):
+    """databases.Database que mide la espera del pool y la duración de cada consulta"""
+
+    @asynccontextmanager
+    async def timed_connection(self):
+        start = time.perf_counter()
+        async with self.connection() as connection:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+            yield connection
+
+    async def fetch_all(self, query, values=None):
+        async with self.timed_connection() as connection:
+            with DB_QUERY_LATENCY.time(operation="fetch_all"):
+                return await connection.fetch_all(query, values)
+
+    async def fetch_one(self, query, values=None):
+        async with self.timed_connection() as connection:
+            with DB_QUERY_LATENCY.time(operation="fetch_one"):
+                return await connection.fetch_one(query, values)
+
+    async def fetch_val(self, query, values=None, column=0):
+        async with self.timed_connection() as connection:
+            with DB_QUERY_LATENCY.time(operation="fetch_val"):
+                return await connection.fetch_val(query, values, column=column)
+
+    async def execute(self, query, values=None):
+        async with self.timed_connection() as connection:
+            with DB_QUERY_LATENCY.time(operation="execute"):
+                return await connection.execute(query, values)
+
+    async def execute_many(self, query, values):
+        async with self.timed_connection() as connection:
+            with DB_QUERY_LATENCY.time(operation="execute_many"):
+                return await connection.execute_many(query, values)
+
+
 db_args = {"min_size": 1, "max_size": 3} if "postgres" in config.DATABASE_URL else {}  # type: ignore
-database = databases.Database(str(config.DATABASE_URL), force_rollback=False, **db_args)
+database = InstrumentedDatabase(
+    str(config.DATABASE_URL), force_rollback=False, **db_args
+)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+"""
+Proveedores de embeddings. El modelo se identifica como "proveedor:nombre"
+("local:intfloat/multilingual-e5-small"); sin prefijo es un modelo de OpenAI,
+como los que ya hay guardados en embedding_model. Cada vector queda anotado
+con el modelo y las dimensiones que lo generaron (vector_key) y nunca se
+compara con los de otro.
+
+    openai  API de OpenAI (o OPENAI_BASE_URL), lotes de 512 textos por petición
+    local   modelo pequeño de sentence-transformers en CPU, sin red; lotes de
+            EMBEDDING_LOCAL_BATCH_SIZE repartidos en EMBEDDING_LOCAL_THREADS hilos
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+from config import config, get_openai_client, logger
+
+
+class EmbeddingProvider(ABC):
+    """embed devuelve un vector por texto, en el mismo orden"""
+
+    name = ""
+    batch_size = 1
+
+    @abstractmethod
+    async def embed(
+        self, texts: list[str], model: str, dimensions: Optional[int]
+    ) -> list[list[float]]: ...
+
+    def warm_up(self, model: str) -> None:
+        """Carga lo necesario antes de la primera consulta"""
+
+    def close(self) -> None:
+        pass
+
+
+class OpenAIProvider(EmbeddingProvider):
+    name = "openai"
+    batch_size = 512  # la API admite hasta 2048 entradas por petición
+
+    async def embed(self, texts, model, dimensions):
+        options = {"dimensions": dimensions} if dimensions else {}
+        response = await get_openai_client().embeddings.create(
+            input=texts, model=model, **options
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+@lru_cache
+def load_local_model(model: str):
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as exc:
+        raise RuntimeError("Local embeddings require sentence-transformers") from exc
+
+    logger.info(f"Loading local embedding model {model} ({config.EMBEDDING_LOCAL_BACKEND})")
+    return SentenceTransformer(model, device="cpu", backend=config.EMBEDDING_LOCAL_BACKEND)
+
+
+class LocalProvider(EmbeddingProvider):
+    name = "local"
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def batch_size(self):
+        return config.EMBEDDING_LOCAL_BATCH_SIZE
+
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                config.EMBEDDING_LOCAL_THREADS, thread_name_prefix="embeddings"
+            )
+        return self._executor
+
+    def encode(self, texts: list[str], model: str, dimensions: Optional[int]):
+        vectors = load_local_model(model).encode(
+            texts,
+            batch_size=len(texts),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            truncate_dim=dimensions,  # modelos Matryoshka, como dimensions en OpenAI
+        )
+        return vectors.tolist()
+
+    async def embed(self, texts, model, dimensions):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor(), self.encode, texts, model, dimensions)
+
+    def warm_up(self, model):
+        load_local_model(model)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+EMBEDDING_PROVIDERS: dict[str, EmbeddingProvider] = {
+    provider.name: provider for provider in (OpenAIProvider(), LocalProvider())
+}
+
+
+def qualified_model(provider: str, model: str) -> str:
+    """Nombre con el que se guarda el modelo; los de OpenAI van sin prefijo"""
+    return model if provider == "openai" or ":" in model else f"{provider}:{model}"
+
+
+def vector_key(model: str, dimensions: Optional[int]) -> str:
+    """
+    Lo que se guarda en embedding_model: el modelo y, si se recortan, las
+    dimensiones. Dos vectores solo se comparan si tienen la misma clave.
+    """
+    return f"{model}@{dimensions}" if dimensions else model
+
+
+def resolve_model(model: str) -> tuple[EmbeddingProvider, str]:
+    """Proveedor y nombre del modelo para el proveedor"""
+    provider, separator, name = model.partition(":")
+    if not separator:
+        return EMBEDDING_PROVIDERS["openai"], model
+    if provider not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider in {model!r}")
+    return EMBEDDING_PROVIDERS[provider], name
@@ -0,0 +1,265 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import re
+import uuid
+from enum import Enum
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, status
+
+from config import config, logger
+from pdf_backends import EncryptedDocumentError, extract_pdf_pages  # noqa: F401
+
+Extractor = Callable[[Path], Awaitable[list[str]]]
+EXTRACTORS: dict[str, Extractor] = {}
+
+_converter_slots = asyncio.Semaphore(config.EXTRACTION_CONCURRENCY)
+
+
+class FileType(Enum):
+    pdf = "application/pdf"
+    docx = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    doc = "application/msword"
+    txt = "text/plain"
+    html = "text/html"
+    md = "text/markdown"
+
+
+class ExtractionError(Exception):
+    pass
+
+
+def register_extractor(*extensions: str):
+    """Registra un extractor para las extensiones dadas (".pdf", ".docx", ...)"""
+
+    def decorator(extractor: Extractor) -> Extractor:
+        for extension in extensions:
+            EXTRACTORS[extension] = extractor
+        return extractor
+
+    return decorator
+
+
+def resolve_extension(content_type: Optional[str], filename: Optional[str]) -> str:
+    """El content type manda; si el cliente no lo conoce se usa la extensión"""
+    try:
+        return "." + FileType(content_type).name
+    except ValueError:
+        pass
+
+    extension = Path(filename or "").suffix.lower()
+    if extension in (".htm", ".markdown"):
+        extension = {".htm": ".html", ".markdown": ".md"}[extension]
+
+    if extension not in EXTRACTORS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid Format File: {content_type} Must be one of {', '.join(sorted(EXTRACTORS))}",
+        )
+
+    return extension
+
+
+async def extract_pages(
+    content_type: Optional[str], file_path: Path, filename: Optional[str] = None
+) -> list[str]:
+    """
+    Texto de cada página (o párrafo) del fichero. El resultado se cachea en
+    disco por hash de contenido, así que reimportar el mismo fichero es gratis.
+    """
+    extension = resolve_extension(content_type, filename or Path(file_path).name)
+    digest = await asyncio.to_thread(file_digest, file_path)
+    if extension == ".pdf":
+        # cada motor extrae un texto distinto
+        digest += f".{config.PDF_BACKEND}"
+    cache_path = Path(config.EXTRACTION_CACHE_PATH) / f"{digest}{extension}.json"
+
+    if await aiofiles.os.path.exists(cache_path):
+        async with aiofiles.open(cache_path, encoding="utf8") as cache_file:
+            try:
+                pages = json.loads(await cache_file.read())
+            except ValueError:
+                # fichero a medias o corrupto: se extrae de nuevo y se reescribe
+                logger.warning(f"Invalid extraction cache {cache_path}, ignoring it")
+            else:
+                logger.debug(f"Extraction cache hit for {file_path}")
+                return pages
+
+    pages = await EXTRACTORS[extension](Path(file_path))
+
+    # Se escribe aparte y se renombra: otro proceso nunca lee un JSON a medias
+    await aiofiles.os.makedirs(config.EXTRACTION_CACHE_PATH, exist_ok=True)  # type: ignore
+    temp_path = cache_path.with_name(f".{cache_path.name}.{uuid.uuid4().hex}.part")
+    try:
+        async with aiofiles.open(temp_path, "w", encoding="utf8") as cache_file:
+            await cache_file.write(json.dumps(pages))
+        await aiofiles.os.replace(temp_path, cache_path)
+    except OSError as exc:
+        logger.warning(f"Could not write extraction cache {cache_path}: {exc}")
+        with contextlib.suppress(OSError):
+            await aiofiles.os.remove(temp_path)
+
+    return pages
+
+
+async def drop_extraction_cache(file_path: Path) -> int:
+    """
+    Borra las entradas de la caché de un fichero (las de todos los motores
+    PDF) cuando deja de usarse; devuelve cuántas había
+    """
+
+    def drop() -> int:
+        removed = 0
+        digest = file_digest(file_path)
+        for entry in Path(config.EXTRACTION_CACHE_PATH).glob(f"{digest}*.json"):
+            with contextlib.suppress(FileNotFoundError):
+                entry.unlink()
+                removed += 1
+        return removed
+
+    return await asyncio.to_thread(drop)
+
+
+def file_digest(file_path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+async def run_converter(*args: str) -> str:
+    """
+    Ejecuta un conversor externo sin bloquear el event loop. Como mucho
+    EXTRACTION_CONCURRENCY procesos a la vez, cada uno con EXTRACTION_TIMEOUT.
+    """
+    async with _converter_slots:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError as exc:
+            raise ExtractionError(f"No {args[0]} installed") from exc
+
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(), config.EXTRACTION_TIMEOUT
+            )
+        except asyncio.TimeoutError as exc:
+            raise ExtractionError(
+                f"{args[0]} timed out after {config.EXTRACTION_TIMEOUT}s"
+            ) from exc
+        finally:
+            # Tiempo agotado o petición cancelada: el proceso no sobrevive a su plaza
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    if process.returncode != 0:
+        raise ExtractionError(f"{args[0]} failed: {stderr.decode(errors='ignore')}")
+
+    return stdout.decode("utf-8", errors="ignore")
+
+
+def split_paragraphs(text: str) -> list[str]:
+    return [paragraph.strip() for paragraph in re.split(r"\n\s*\n", text)]
+
+
+def read_text(file_path: Path) -> str:
+    data = file_path.read_bytes()
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+@register_extractor(".pdf")
+async def extract_pdf(file_path: Path) -> list[str]:
+    return await asyncio.to_thread(extract_pdf_pages, file_path, config.PDF_BACKEND)
+
+
+@register_extractor(".docx")
+async def extract_docx(file_path: Path) -> list[str]:
+    def extract():
+        from docx import Document as DocxDocument
+
+        return [para.text for para in DocxDocument(file_path).paragraphs]  # type: ignore
+
+    return await asyncio.to_thread(extract)
+
+
+@register_extractor(".doc")
+async def extract_doc(file_path: Path) -> list[str]:
+    return split_paragraphs(await run_converter("antiword", str(file_path)))
+
+
+@register_extractor(".txt")
+async def extract_txt(file_path: Path) -> list[str]:
+    return split_paragraphs(await asyncio.to_thread(read_text, file_path))
+
+
+class _HTMLText(HTMLParser):
+    BLOCKS = {
+        "p", "div", "br", "li", "tr", "pre", "blockquote", "section", "article",
+        "h1", "h2", "h3", "h4", "h5", "h6",
+    }  # fmt: skip
+    SKIP = {"script", "style", "head", "noscript"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts: list[str] = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skipping += 1
+        elif tag in self.BLOCKS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in self.BLOCKS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+@register_extractor(".html")
+async def extract_html(file_path: Path) -> list[str]:
+    def extract():
+        parser = _HTMLText()
+        parser.feed(read_text(file_path))
+        return [p for p in split_paragraphs("".join(parser.parts)) if p]
+
+    return await asyncio.to_thread(extract)
+
+
+MARKDOWN_PATTERNS = [
+    (re.compile(r"^```.*$", re.MULTILINE), ""),
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"),
+    (re.compile(r"\[([^\]]*)\]\([^)]*\)"), r"\1"),
+    (re.compile(r"^\s{0,3}(#{1,6}|>|[-*+]|\d+\.)\s+", re.MULTILINE), ""),
+    (re.compile(r"(\*\*|__|\*|_|`)(.+?)\1"), r"\2"),
+    (re.compile(r"<[^>]+>"), ""),
+]
+
+
+@register_extractor(".md")
+async def extract_markdown(file_path: Path) -> list[str]:
+    text = await asyncio.to_thread(read_text, file_path)
+    for pattern, replacement in MARKDOWN_PATTERNS:
+        text = pattern.sub(replacement, text)
+
+    return split_paragraphs(text)
@@ -0,0 +1,400 @@
+"""
+Importación masiva de un corpus sin pasar por /documents/upload. Recorre un
+directorio o un archivo (.zip, .tar, .tar.gz), copia cada fichero a
+DOCUMENT_PATH y extrae su texto y sus términos en un pool de procesos. Los
+embeddings se piden en lotes de --batch-pages páginas, y documentos, páginas,
+postings y centroides se escriben con COPY en una transacción por lote,
+mientras el pool sigue extrayendo los siguientes.
+
+Cada fichero queda anotado en imported_files (con su error si falló) en la
+misma transacción que sus páginas, así que una importación interrumpida se
+retoma donde se quedó con el mismo comando.
+
+    python ingest.py corpus/ --owner admin@example.com
+    python ingest.py corpus.tar.gz --workers 8 --batch-pages 2048
+    python ingest.py corpus/ --retry-failed   # vuelve a intentar los que fallaron
+
+Sin --owner los documentos no tienen dueño: los ven todos los usuarios y solo
+los modifica el administrador (ADMIN_EMAIL).
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import posixpath
+import shutil
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+import sqlalchemy
+from fastapi import HTTPException
+from tqdm import tqdm
+
+from config import config, logger
+from database import (
+    centroid_table,
+    create_schema,
+    database,
+    document_table,
+    import_table,
+    page_table,
+    posting_table,
+    user_table,
+)
+from embeddings import vector_key
+from extractors import extract_pages, resolve_extension
+from quantization import quantize
+from search import bump_corpus_version, document_vectors, lexical_terms, page_hash
+from utils import clean_text, embedding_profile, get_embeddings
+
+_loop: Optional[asyncio.AbstractEventLoop] = None  # uno por proceso del pool
+
+
+@dataclass
+class ImportStats:
+    started: float = field(default_factory=time.perf_counter)
+    documents: int = 0
+    failed: int = 0
+    skipped: int = 0
+    pages: int = 0
+    bytes: int = 0
+    embedding_seconds: float = 0.0
+    database_seconds: float = 0.0
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        return "\n".join(
+            [
+                f"{self.documents} documents and {self.pages} pages imported in {elapsed:.1f}s"
+                f" ({self.failed} failed, {self.skipped} already imported)",
+                f"  {self.documents / elapsed:.1f} documents/s, {self.pages / elapsed:.1f} pages/s,"
+                f" {self.bytes / elapsed / 1024**2:.1f} MiB/s",
+                f"  embeddings {self.embedding_seconds:.1f}s, database {self.database_seconds:.1f}s",
+            ]
+        )
+
+
+def supported(name: str) -> bool:
+    if Path(name).name.startswith("."):
+        return False
+    try:
+        resolve_extension(None, name)
+    except HTTPException:
+        return False
+    return True
+
+
+def document_name(source: str) -> str:
+    """La ruta relativa aplanada, para que dos ficheros con el mismo nombre no choquen"""
+    return source.replace("/", "_")
+
+
+def iter_sources(root: Path, done: set[str], stats: ImportStats) -> Iterator[tuple[str, Path]]:
+    """
+    (ruta de origen, copia en DOCUMENT_PATH) de cada fichero soportado que no
+    esté en done. Los tar se leen en orden, sin acceso aleatorio.
+    """
+    target = Path(config.DOCUMENT_PATH)  # type: ignore
+
+    def pending(source: str) -> bool:
+        if source in done:
+            stats.skipped += 1
+            return False
+        return supported(source)
+
+    if root.is_dir():
+        for path in sorted(root.rglob("*")):
+            source = path.relative_to(root).as_posix()
+            if path.is_file() and pending(source):
+                staged = target / document_name(source)
+                shutil.copyfile(path, staged)
+                yield source, staged
+
+    elif zipfile.is_zipfile(root):
+        with zipfile.ZipFile(root) as archive:
+            for member in archive.infolist():
+                source = posixpath.normpath(member.filename)
+                if not member.is_dir() and pending(source):
+                    staged = target / document_name(source)
+                    with archive.open(member) as file, open(staged, "wb") as staged_file:
+                        shutil.copyfileobj(file, staged_file)
+                    yield source, staged
+
+    elif tarfile.is_tarfile(root):
+        with tarfile.open(root, "r|*") as archive:
+            for member in archive:
+                source = posixpath.normpath(member.name)  # "./a.pdf" -> "a.pdf"
+                if member.isfile() and pending(source):
+                    staged = target / document_name(source)
+                    with archive.extractfile(member) as file, open(staged, "wb") as staged_file:  # type: ignore
+                        shutil.copyfileobj(file, staged_file)
+                    yield source, staged
+
+    else:
+        raise SystemExit(f"{root} is not a directory or a zip/tar archive")
+
+
+def extract_document(path: str) -> tuple[list[dict], Optional[str]]:
+    """
+    En un proceso del pool: texto limpio y términos (BM25) de cada página, o
+    el error. extract_pages usa la misma caché en disco que las subidas.
+    """
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+
+    try:
+        texts = _loop.run_until_complete(extract_pages(None, Path(path)))
+    except Exception as exc:
+        return [], f"{type(exc).__name__}: {exc}"
+
+    pages = []
+    for page_number, text in enumerate(texts):
+        content = clean_text(text)
+        if content:
+            terms = lexical_terms(content)
+            pages.append(
+                {
+                    "page_number": page_number,
+                    "content": content,
+                    "terms": terms,
+                    "length": sum(terms.values()),
+                }
+            )
+    return pages, None
+
+
+async def imported_sources(retry_failed: bool) -> set[str]:
+    if retry_failed:
+        await database.execute(import_table.delete().where(import_table.c.error.is_not(None)))
+
+    query = sqlalchemy.select(import_table.c.source)
+    return {row.source for row in await database.fetch_all(query)}  # type: ignore
+
+
+async def next_ids(table, count: int) -> list[int]:
+    """Reserva ids de la secuencia de la tabla para insertar con COPY"""
+    if not count:
+        return []
+
+    sequence = sqlalchemy.func.pg_get_serial_sequence(table.name, "id")
+    rows = sqlalchemy.func.generate_series(1, sqlalchemy.cast(count, sqlalchemy.Integer))
+    query = sqlalchemy.select(sqlalchemy.func.nextval(sequence)).select_from(rows)
+    return [row[0] for row in await database.fetch_all(query)]
+
+
+async def copy_records(table, columns: list[str], records: list[tuple]) -> None:
+    if not records:
+        return
+
+    async with database.connection() as connection:
+        await connection.raw_connection.copy_records_to_table(
+            table.name, records=records, columns=columns
+        )
+
+
+async def write_batch(
+    batch: list[dict], profile: tuple, owner_id: Optional[int], stats: ImportStats
+) -> None:
+    """Una llamada a get_embeddings y una transacción para todo el lote"""
+    model, dimensions = profile
+    key = vector_key(model, dimensions)
+    documents = [document for document in batch if document["error"] is None]
+    pages = [page for document in documents for page in document["pages"]]
+
+    start = time.perf_counter()
+    embeddings = await get_embeddings(
+        [page["content"][:2000] for page in pages], model, dimensions
+    ) if pages else []
+    mode = config.VECTOR_QUANTIZATION
+    codes = quantize(embeddings, mode) if pages and mode != "none" else [None] * len(pages)
+    for page, vector, code in zip(pages, embeddings, codes):
+        page.update(embeddings=vector, codes=code, embedding_model=key)
+    stats.embedding_seconds += time.perf_counter() - start
+
+    start = time.perf_counter()
+    document_rows, page_rows, posting_rows, centroid_rows = [], [], [], []
+    async with database.transaction():
+        document_ids = await next_ids(document_table, len(documents))
+        page_ids = iter(await next_ids(page_table, len(pages)))
+
+        for document, document_id in zip(documents, document_ids):
+            document["id"] = document_id
+            name = document_name(document["source"])
+            centroids, centroid_codes, _ = document_vectors(document["pages"])
+            document_rows.append(
+                (
+                    document_id,
+                    name,
+                    f"{config.DOMAIN}/{config.DOCUMENT_PATH}/{name}",
+                    owner_id,
+                    centroids[0],
+                    centroid_codes[0],
+                    key if document["pages"] else None,
+                )
+            )
+            centroid_rows.extend(
+                (document_id, vector, code, key)
+                for vector, code in zip(centroids[1:], centroid_codes[1:])
+            )
+
+            for page in document["pages"]:
+                page_id = next(page_ids)
+                page_rows.append(
+                    (
+                        page_id,
+                        page["page_number"],
+                        document_id,
+                        page["content"],
+                        page["embeddings"],
+                        page["codes"],
+                        key,
+                        page["length"],
+                        page_hash(page["content"]),
+                    )
+                )
+                posting_rows.extend(
+                    (term, frequency, page_id, document_id)
+                    for term, frequency in page["terms"].items()
+                )
+
+        await copy_records(
+            document_table,
+            ["id", "name", "url", "owner_id", "embeddings", "codes", "embedding_model"],
+            document_rows,
+        )
+        await copy_records(
+            page_table,
+            [
+                "id",
+                "page_number",
+                "document_id",
+                "content",
+                "embeddings",
+                "codes",
+                "embedding_model",
+                "length",
+                "content_hash",
+            ],
+            page_rows,
+        )
+        await copy_records(
+            posting_table, ["term", "frequency", "page_id", "document_id"], posting_rows
+        )
+        await copy_records(
+            centroid_table, ["document_id", "embeddings", "codes", "embedding_model"], centroid_rows
+        )
+        await copy_records(
+            import_table,
+            ["source", "document_id", "error"],
+            [(document["source"], document.get("id"), document["error"]) for document in batch],
+        )
+
+    if documents:
+        await bump_corpus_version()
+
+    stats.database_seconds += time.perf_counter() - start
+    stats.documents += len(documents)
+    stats.failed += len(batch) - len(documents)
+    stats.pages += len(pages)
+
+
+async def import_corpus(
+    root: Path, owner_id: Optional[int], workers: int, batch_pages: int, retry_failed: bool
+) -> ImportStats:
+    stats = ImportStats()
+    profile = await embedding_profile()
+    sources = iter_sources(root, await imported_sources(retry_failed), stats)
+    os.makedirs(config.DOCUMENT_PATH, exist_ok=True)  # type: ignore
+
+    loop = asyncio.get_running_loop()
+    extracting: dict[asyncio.Future, tuple[str, Path]] = {}
+    batch: list[dict] = []
+    batch_size = 0
+    writer: Optional[asyncio.Task] = None
+    exhausted = False
+
+    async def flush():
+        nonlocal batch, batch_size, writer
+        if writer is not None:
+            await writer  # como mucho un lote escribiéndose mientras se prepara el siguiente
+        writer = asyncio.create_task(write_batch(batch, profile, owner_id, stats)) if batch else None
+        batch, batch_size = [], 0
+
+    # spawn: los workers no heredan la conexión a la base de datos ni los hilos de logging
+    context = multiprocessing.get_context("spawn")
+    with (
+        ProcessPoolExecutor(workers, mp_context=context) as pool,
+        tqdm(desc="Importing", unit="file") as progress,
+    ):
+        while True:
+            while not exhausted and len(extracting) < workers * 4:
+                item = await asyncio.to_thread(next, sources, None)
+                if item is None:
+                    exhausted = True
+                    break
+                future = loop.run_in_executor(pool, extract_document, str(item[1]))
+                extracting[future] = item
+
+            if not extracting:
+                break
+
+            finished, _ = await asyncio.wait(extracting, return_when=asyncio.FIRST_COMPLETED)
+            for future in finished:
+                source, staged = extracting.pop(future)
+                pages, error = future.result()
+                if error:
+                    logger.warning(f"{source} not imported: {error}")
+                    staged.unlink(missing_ok=True)
+                else:
+                    stats.bytes += staged.stat().st_size
+
+                batch.append({"source": source, "pages": pages, "error": error})
+                batch_size += len(pages)
+                progress.update(1)
+                progress.set_postfix(pages=stats.pages)
+
+            if batch_size >= batch_pages:
+                await flush()
+
+        await flush()  # el último lote
+        await flush()  # y espera a que se escriba
+
+    return stats
+
+
+async def main(args) -> None:
+    create_schema()
+    await database.connect()
+    try:
+        owner_id = None
+        if args.owner:
+            query = user_table.select().where(user_table.c.email == args.owner)
+            owner = await database.fetch_one(query)
+            if not owner:
+                raise SystemExit(f"User {args.owner} not found")
+            owner_id = owner.id  # type: ignore
+
+        stats = await import_corpus(
+            Path(args.source), owner_id, args.workers, args.batch_pages, args.retry_failed
+        )
+    finally:
+        await database.disconnect()
+
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa un directorio o archivo de documentos")
+    parser.add_argument("source", help="directorio, .zip o .tar(.gz)")
+    parser.add_argument("--owner", help="email del dueño de los documentos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-pages", type=int, default=1024, help="páginas por lote")
+    parser.add_argument("--retry-failed", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -1,7 +1,57 @@
+import atexit
+import logging
+import queue
+import random
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 
+_listener: Optional[QueueListener] = None
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar solo una fracción de los registros por debajo de WARNING de
+    cada logger (y sus hijos). Los avisos y errores pasan siempre.
+    """
+
+    def __init__(self, rates: Optional[dict[str, float]] = None):
+        super().__init__()
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + "."):
+                return random.random() < rate
+
+        return True
+
+
+def configure_logging(
+    profile: str = "dev",
+    use_queue: bool = False,
+    levels: Optional[dict[str, str]] = None,
+    sampling: Optional[dict[str, float]] = None,
+    max_bytes: int = 1024 * 1024,
+) -> None:
+    """
+    dev: consola Rich a nivel DEBUG.
+    prod: JSON en fichero rotativo a nivel INFO y consola plana solo con avisos.
+    use_queue: los handlers corren en un hilo aparte (QueueListener) y el hilo
+    que loguea solo encola el registro.
+    """
+    global _listener
+
+    stop_logging()
+
+    handlers = ["default"] if profile == "dev" else ["console", "rotating_file"]
+    app_level = "DEBUG" if profile == "dev" else "INFO"
+    # En modo cola el correlation id se lee al encolar, en el hilo de la petición
+    handler_filters = [] if use_queue else ["correlation_id", "sampling"]
 
-def configure_logging() -> None:
     dictConfig(
         {
             "version": 1,
@@ -11,7 +61,11 @@ def configure_logging() -> None:
                     "()": "asgi_correlation_id.CorrelationIdFilter",
                     "uuid_length": 8,
                     "default_value": "-",
-                }
+                },
+                "sampling": {
+                    "()": "logging_conf.SamplingFilter",
+                    "rates": sampling or {},
+                },
             },
             "formatters": {
                 "console": {
@@ -35,34 +89,83 @@ def configure_logging() -> None:
                     "class": "rich.logging.RichHandler",
                     "level": "DEBUG",
                     "formatter": "console",
-                    "filters": ["correlation_id"],
+                    "filters": handler_filters,
+                },
+                "console": {
+                    "class": "logging.StreamHandler",
+                    "level": "WARNING",
+                    "formatter": "file",
+                    "filters": handler_filters,
                 },
                 "rotating_file": {
                     "class": "logging.handlers.RotatingFileHandler",
                     "level": "DEBUG",
                     "formatter": "file_json",
                     "filename": "records.log",
-                    "maxBytes": 1024 * 1024,  # 1MB
+                    "maxBytes": max_bytes,
                     "backupCount": 5,
                     "encoding": "utf8",
-                    "filters": ["correlation_id"],
+                    "filters": handler_filters,
+                    "delay": True,
                 },
             },
             "loggers": {
-                "waitress": {"handlers": ["default"], "level": "INFO"},
+                "waitress": {"handlers": handlers, "level": "INFO"},
                 "gunicorn": {
-                    "handlers": ["default"],
+                    "handlers": handlers,
                     "level": "WARNING",
                 },
                 "sqlalchemy": {
-                    "handlers": ["default"],
+                    "handlers": handlers,
                     "level": "WARNING",
                 },
                 "app": {
-                    "handlers": ["default"],
-                    "level": "DEBUG",
+                    "handlers": handlers,
+                    "level": app_level,
                     "propagate": False,
                 },
             },
         }
     )
+
+    for name, level in (levels or {}).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    if use_queue:
+        _listener = _install_queue(["waitress", "gunicorn", "sqlalchemy", "app"], sampling)
+        atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Vacía la cola y para el hilo del QueueListener"""
+    global _listener
+
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+def _install_queue(names: list[str], sampling: Optional[dict[str, float]]) -> QueueListener:
+    """Sustituye los handlers de los loggers por un QueueHandler compartido"""
+    from asgi_correlation_id import CorrelationIdFilter
+
+    targets: list[logging.Handler] = []
+    for name in names:
+        for handler in logging.getLogger(name).handlers:
+            if handler not in targets:
+                targets.append(handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(CorrelationIdFilter(uuid_length=8, default_value="-"))
+    queue_handler.addFilter(SamplingFilter(sampling))
+
+    for name in names:
+        logger = logging.getLogger(name)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, *targets, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -1,37 +1,62 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 import aiofiles.os
-import sentry_sdk
 from asgi_correlation_id import CorrelationIdMiddleware
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
 
-from config import config
-from database import database
+from config import config, get_openai_client
+from database import create_schema, database
+from metrics import (
+    OPENMETRICS_CONTENT_TYPE,
+    PROMETHEUS_CONTENT_TYPE,
+    MetricsMiddleware,
+    render_metrics,
+)
+from notifications import start_outbox, stop_outbox
+from purge import cancel_purges, schedule_purge
+from routers.ask import router as ask_router
 from routers.document import router as document_router
 from routers.query import router as query_router
 from routers.user import router as user_router
 from security import authenticate_user, create_access_token
+from utils import close_embeddings, warm_up_embeddings
 
-sentry_sdk.init(
-    dsn=config.SENTRY_DSN,
-    send_default_pii=True,
-    traces_sample_rate=1.0,
-    profiles_sample_rate=1.0,
-)
+# Sin DSN no se carga sentry_sdk (y su profiler) al arrancar
+if config.SENTRY_DSN:
+    import sentry_sdk
+
+    sentry_sdk.init(
+        dsn=config.SENTRY_DSN,
+        send_default_pii=True,
+        traces_sample_rate=config.SENTRY_TRACES_SAMPLE_RATE,
+        profiles_sample_rate=config.SENTRY_PROFILES_SAMPLE_RATE,
+    )
 
 
 @asynccontextmanager
 async def lifespam(app: FastAPI):
     await aiofiles.os.makedirs(config.DOCUMENT_PATH, exist_ok=True)  # type: ignore
+    await asyncio.to_thread(create_schema)
     await database.connect()
+    openai_client = get_openai_client()
+    await warm_up_embeddings()  # modelo local: la primera consulta no paga la carga
+    schedule_purge()  # borrados que quedaron a medias
+    start_outbox()
     yield
+    await stop_outbox()
+    await cancel_purges()
+    await openai_client.close()
+    close_embeddings()
     await database.disconnect()
 
 
 app = FastAPI(lifespan=lifespam)
-app.add_middleware(CorrelationIdMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(CorrelationIdMiddleware)  # la última es la más externa
 
 
 @app.post("/token")
@@ -41,6 +66,16 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     return {"access_token": token, "token_type": "bearer"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    openmetrics = "application/openmetrics-text" in request.headers.get("accept", "")
+    return PlainTextResponse(
+        render_metrics(openmetrics),
+        media_type=OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE,
+    )
+
+
+app.include_router(ask_router, prefix="/ask")
 app.include_router(document_router, prefix="/documents")
 app.include_router(user_router, prefix="/users")
 app.include_router(query_router, prefix="/querys")
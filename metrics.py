@@ -0,0 +1,240 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from asgi_correlation_id import correlation_id
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+THROUGHPUT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+REGISTRY: list = []
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Histogram:
+    """
+    Histograma acumulativo en formato Prometheus. Cada bucket guarda como
+    exemplar el correlation id de la última petición que cayó en él, así
+    una latencia alta lleva directamente a sus logs.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        exemplar = (correlation_id.get(), value, time.time())
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "exemplars": [None] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                }
+
+            series["counts"][index] += 1
+            series["sum"] += value
+            if exemplar[0]:
+                series["exemplars"][index] = exemplar
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self, openmetrics: bool = False) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {
+                key: (list(value["counts"]), list(value["exemplars"]), value["sum"])
+                for key, value in self._series.items()
+            }
+
+        for key, (counts, exemplars, total) in sorted(series.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count, exemplar in zip((*self.buckets, "+Inf"), counts, exemplars):
+                cumulative += count
+                line = f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}"
+                if openmetrics and exemplar:
+                    cid, value, timestamp = exemplar
+                    line += f' # {{correlation_id="{cid}"}} {value} {timestamp:.3f}'
+                lines.append(line)
+
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+
+        return lines
+
+
+class Counter:
+    """Contador monótono en formato Prometheus"""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self, openmetrics: bool = False) -> list[str]:
+        # OpenMetrics: la familia va sin _total y la muestra con _total
+        family = self.name.removesuffix("_total") if openmetrics else self.name
+        lines = [
+            f"# HELP {family} {self.documentation}",
+            f"# TYPE {family} counter",
+        ]
+        with self._lock:
+            series = dict(self._series)
+
+        for key, value in sorted(series.items()):
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {value}")
+
+        return lines
+
+
+def render_metrics(openmetrics: bool = False) -> str:
+    lines = [line for metric in REGISTRY for line in metric.render(openmetrics)]
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+HTTP_LATENCY = Histogram(
+    "documind_http_request_duration_seconds",
+    "Latencia de cada endpoint",
+    ("method", "route", "status"),
+)
+EMBEDDING_LATENCY = Histogram(
+    "documind_embedding_request_duration_seconds",
+    "Latencia de las llamadas a la API de embeddings",
+    ("model",),
+)
+LLM_LATENCY = Histogram(
+    "documind_llm_request_duration_seconds",
+    "Latencia de cada llamada al LLM",
+    ("call_site", "model"),
+)
+DB_QUERY_LATENCY = Histogram(
+    "documind_db_query_duration_seconds",
+    "Tiempo de ejecución de las consultas a la base de datos",
+    ("operation",),
+)
+DB_POOL_WAIT = Histogram(
+    "documind_db_pool_wait_seconds",
+    "Espera hasta obtener una conexión del pool",
+)
+INGEST_THROUGHPUT = Histogram(
+    "documind_ingest_pages_per_second",
+    "Páginas por segundo al procesar cada documento subido",
+    buckets=THROUGHPUT_BUCKETS,
+)
+
+PAGE_ANSWERS = Counter(
+    "documind_page_answers_total",
+    "Respuestas sobre una página según el nivel que respondió (extractive evita el LLM)",
+    ("tier",),
+)
+
+
+LLM_TOKENS = Counter(
+    "documind_llm_tokens_total",
+    "Tokens consumidos por cada llamada al LLM (kind: prompt | completion | cached)",
+    ("call_site", "model", "kind"),
+)
+LLM_BUDGET_EXHAUSTED = Counter(
+    "documind_llm_budget_exhausted_total",
+    "Peticiones al LLM cortadas por el presupuesto (reason: rounds | tokens | deadline)",
+    ("call_site", "reason"),
+)
+
+SEARCH_CACHE_REQUESTS = Counter(
+    "documind_search_cache_requests_total",
+    "Consultas de /documents/search servidas desde la caché (hit) o calculadas (miss)",
+    ("result",),
+)
+
+OUTBOX_MESSAGES = Counter(
+    "documind_outbox_messages_total",
+    "Correos del outbox por resultado de cada intento (sent | retry | failed)",
+    ("result",),
+)
+
+
+def route_template(scope) -> str:
+    """/documents/12/search -> /documents/{document_id}/search"""
+    if scope.get("route") is None:
+        return "unmatched"
+
+    pending = list(scope.get("path_params", {}).items())
+    segments = []
+    for segment in scope["path"].split("/"):
+        if pending and segment == str(pending[0][1]):
+            segment = "{" + pending.pop(0)[0] + "}"
+        segments.append(segment)
+
+    return "/".join(segments)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide la latencia por ruta (la plantilla, no la URL)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_LATENCY.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route_template(scope),
+                status=status_code,
+            )
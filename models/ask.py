@@ -0,0 +1,27 @@
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class AskMode(Enum):
+    concurrent = "concurrent"  # una llamada al LLM por página, en paralelo
+    packed = "packed"  # una sola llamada con las páginas dentro del presupuesto
+
+
+class Citation(BaseModel):
+    document_id: int
+    document_name: str
+    document_url: str
+    page_number: int
+    score: float
+
+
+class Answer(BaseModel):
+    answer: str
+    tier: str  # extractive | llm
+    citations: list[Citation]
+
+
+class AskResponse(BaseModel):
+    query: str
+    answers: list[Answer]
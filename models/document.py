@@ -1,4 +1,6 @@
-from pydantic import BaseModel, ConfigDict
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
 
 class UploadDocument(BaseModel):
@@ -7,40 +9,85 @@ class UploadDocument(BaseModel):
     document_url: str
 
 
+class UpdateDocument(UploadDocument):
+    pages_added: int
+    pages_removed: int
+    pages_unchanged: int
+
+
 class UserQuery(BaseModel):
     content: str
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class BatchQuery(BaseModel):
+    queries: list[str] = Field(min_length=1, max_length=256)
+
+
 class Document(BaseModel):
     id: int
     name: str
     url: str
+    owner_id: Optional[int] = None  # None: visible para todos
 
     model_config = ConfigDict(from_attributes=True)
 
 
 class DocumentWithSimilarity(Document):
-    similarity: float
+    similarity: float = 0.0
+    score: float = 0.0
 
 
 class PageWithSimilarity(BaseModel):
     document_id: int
     page_number: int
-    similarity: float
+    similarity: float = 0.0
+    score: float = 0.0
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class BatchDocumentResult(BaseModel):
+    query: str
+    documents: list[DocumentWithSimilarity]
+
+
+class BatchPageResult(BaseModel):
+    query: str
+    pages: list[PageWithSimilarity]
+
+
 class SearchResult(BaseModel):
     query: str
     answer: str
     document_id: int
     page_number: int
+    tier: Optional[str] = None
+    tokens_in: Optional[int] = None
+    tokens_out: Optional[int] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
 class DeleteResponse(BaseModel):
     detail: str
+
+
+class BulkDelete(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=1000)
+
+
+class BulkDeleteResponse(DeleteResponse):
+    deleted: list[int]
+    not_found: list[int]
+
+
+class ShareDocument(BaseModel):
+    emails: list[EmailStr] = Field(min_length=1, max_length=100)
+
+
+class ShareResponse(BaseModel):
+    document_id: int
+    shared_with: list[EmailStr]
+    not_found: list[str] = []
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 
 from pydantic import BaseModel, ConfigDict, field_serializer
 
@@ -8,6 +9,9 @@ class DocumentQuery(BaseModel):
     answer: str
     document_id: int
     page_number: int
+    tier: Optional[str] = None
+    tokens_in: Optional[int] = None
+    tokens_out: Optional[int] = None
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
@@ -1,9 +1,47 @@
+"""
+Correos salientes a través de un outbox. enqueue_email guarda el mensaje en
+la tabla outbox y avisa al emisor en segundo plano, que los envía en lotes de
+OUTBOX_BATCH_SIZE por una sola conexión SMTP autenticada, a un máximo de
+OUTBOX_RATE_LIMIT mensajes por segundo (por worker). Los fallos temporales se
+reintentan con espera exponencial hasta OUTBOX_MAX_ATTEMPTS; los rechazos
+permanentes (5xx) quedan como failed.
+
+Cada lote se reclama con FOR UPDATE SKIP LOCKED y un plazo (CLAIM_LEASE), así
+varios workers no envían el mismo mensaje y lo que reclamó un worker caído se
+reintenta al vencer el plazo.
+
+    python notifications.py                    # envía lo pendiente y termina
+    python notifications.py --to a@example.com # encola antes un correo de prueba
+    python -m benchmarks.fake_smtp             # servidor SMTP local para pruebas
+"""
+
 import asyncio
+from datetime import timedelta
 from email.message import EmailMessage
+from typing import Optional
 
 import aiosmtplib
+import sqlalchemy
 
 from config import config, logger
+from database import database, outbox_table
+from metrics import OUTBOX_MESSAGES
+
+CLAIM_LEASE = timedelta(minutes=5)
+MAX_RETRY_DELAY = 3600.0
+
+_wakeup = asyncio.Event()
+_sender: Optional[asyncio.Task] = None
+_next_send = 0.0
+
+
+def build_message(recipient: str, subject: str, body: str, sender=config.EMAIL) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(body)  # set_content para texto plano o add_alternative para HTML
+    return message
 
 
 async def send_email(
@@ -13,33 +51,26 @@ async def send_email(
     sender=config.EMAIL,
     password=config.EMAIL_PASSWORD,
     host=config.EMAIL_HOST,
-    port: int = 465,
-    use_tls: bool = True,  # Sin TLS, toda la comunicación con el servidor SMTP (incluyendo usuario, contraseña y el contenido de los correos) se envía en texto plano
+    port: int = config.EMAIL_PORT,
+    use_tls: bool = config.EMAIL_USE_TLS,  # Sin TLS, toda la comunicación con el servidor SMTP (incluyendo usuario, contraseña y el contenido de los correos) se envía en texto plano
 ):
     """
-    Envía un correo electrónico de forma asíncrona.
+    Envía un correo electrónico al momento, con su propia conexión. Para los
+    correos de la aplicación usar enqueue_email.
 
     Args:
         recipient: Dirección del destinatario
         subject: Asunto del correo
         body: Cuerpo del mensaje (puede ser HTML o texto plano)
-        sender: Remitente (por defecto julia.m@jumo.cat)
+        sender: Remitente (por defecto EMAIL)
         password: Contraseña del remitente
-        host: Servidor SMTP (por defecto smtp.jumo.cat)
-        port: Puerto SMTP (por defecto 587)
-        use_tls: Usar TLS (por defecto True)
+        host: Servidor SMTP (por defecto EMAIL_HOST)
+        port: Puerto SMTP (por defecto EMAIL_PORT)
+        use_tls: Usar TLS (por defecto EMAIL_USE_TLS)
     """
-    message = EmailMessage()
-    message["From"] = sender
-    message["To"] = recipient
-    message["Subject"] = subject
-    message.set_content(
-        body
-    )  # set_content para texto plano o add_alternative para HTML
-
     try:
         await aiosmtplib.send(
-            message,
+            build_message(recipient, subject, body, sender),
             hostname=host,
             port=port,
             username=sender,
@@ -54,12 +85,172 @@ async def send_email(
         return False
 
 
+async def enqueue_email(recipient: str, subject: str, body: str) -> int:
+    """Guarda el correo en el outbox; se envía en segundo plano"""
+    query = outbox_table.insert().values(recipient=recipient, subject=subject, body=body)
+    message_id = await database.execute(query)
+    _wakeup.set()
+    return message_id
+
+
+async def claim_messages(batch_size: int) -> list:
+    """Reclama los pendientes que ya tocan y suma un intento a cada uno"""
+    pending = (
+        sqlalchemy.select(outbox_table.c.id)
+        .where(outbox_table.c.status == "pending")
+        .where(outbox_table.c.next_attempt_at <= sqlalchemy.func.now())
+        .order_by(outbox_table.c.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    query = (
+        outbox_table.update()
+        .where(outbox_table.c.id.in_(pending.scalar_subquery()))
+        .values(
+            attempts=outbox_table.c.attempts + 1,
+            next_attempt_at=sqlalchemy.func.now() + CLAIM_LEASE,
+        )
+        .returning(*outbox_table.c)
+    )
+    return sorted(await database.fetch_all(query), key=lambda row: row.id)  # type: ignore
+
+
+async def mark_sent(message) -> None:
+    query = (
+        outbox_table.update()
+        .where(outbox_table.c.id == message.id)
+        .values(status="sent", sent_at=sqlalchemy.func.now(), last_error=None)
+    )
+    await database.execute(query)
+    OUTBOX_MESSAGES.inc(result="sent")
+
+
+async def mark_failed(message, exc: Exception, permanent: bool = False) -> None:
+    """Reintento con espera exponencial, o failed si no quedan intentos"""
+    values = {"last_error": str(exc)[:500]}
+    if permanent or message.attempts >= config.OUTBOX_MAX_ATTEMPTS:
+        values["status"] = "failed"
+        logger.error(f"Email {message.id} to {message.recipient} failed: {exc}")
+    else:
+        delay = min(config.OUTBOX_RETRY_DELAY * 2 ** (message.attempts - 1), MAX_RETRY_DELAY)
+        values["next_attempt_at"] = sqlalchemy.func.now() + timedelta(seconds=delay)
+        logger.warning(f"Email {message.id} will be retried in {delay:.0f}s: {exc}")
+
+    query = outbox_table.update().where(outbox_table.c.id == message.id).values(**values)
+    await database.execute(query)
+    OUTBOX_MESSAGES.inc(result=values.get("status", "retry"))
+
+
+def is_permanent(exc: Exception) -> bool:
+    """
+    Solo las respuestas 5xx. Un destinatario rechazado con 4xx (greylisting,
+    buzón lleno) se reintenta como cualquier otro fallo temporal.
+    """
+    if isinstance(exc, aiosmtplib.SMTPRecipientsRefused):
+        return bool(exc.recipients) and all(refused.code >= 500 for refused in exc.recipients)
+    return isinstance(exc, aiosmtplib.SMTPResponseException) and exc.code >= 500
+
+
+async def rate_limit() -> None:
+    global _next_send
+    loop = asyncio.get_running_loop()
+    wait = _next_send - loop.time()
+    if wait > 0:
+        await asyncio.sleep(wait)
+    _next_send = max(_next_send, loop.time()) + 1 / config.OUTBOX_RATE_LIMIT
+
+
+async def connect() -> aiosmtplib.SMTP:
+    smtp = aiosmtplib.SMTP(
+        hostname=config.EMAIL_HOST, port=config.EMAIL_PORT, use_tls=config.EMAIL_USE_TLS
+    )
+    await smtp.connect()
+    if config.EMAIL_PASSWORD:
+        await smtp.login(config.EMAIL, config.EMAIL_PASSWORD)  # type: ignore
+    return smtp
+
+
+async def send_batch(messages: list) -> None:
+    """
+    Una conexión y un login para todo el lote. Si el servidor corta se
+    reconecta; si no se puede conectar, el resto del lote se reintenta después.
+    """
+    smtp = None
+    try:
+        for index, message in enumerate(messages):
+            if smtp is None or not smtp.is_connected:
+                try:
+                    smtp = await connect()
+                except Exception as exc:
+                    for pending in messages[index:]:
+                        await mark_failed(pending, exc)
+                    return
+
+            await rate_limit()
+            try:
+                await smtp.send_message(
+                    build_message(message.recipient, message.subject, message.body)
+                )
+            except Exception as exc:
+                await mark_failed(message, exc, permanent=is_permanent(exc))
+                continue
+
+            await mark_sent(message)
+    finally:
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+
+async def drain_outbox() -> int:
+    """Envía todo lo pendiente que ya toca; devuelve los mensajes procesados"""
+    processed = 0
+    while messages := await claim_messages(config.OUTBOX_BATCH_SIZE):
+        await send_batch(messages)
+        processed += len(messages)
+    return processed
+
+
+async def run_outbox() -> None:
+    while True:
+        _wakeup.clear()
+        try:
+            await drain_outbox()
+        except Exception as exc:
+            logger.error(f"Outbox error: {exc}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), config.OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_outbox() -> Optional[asyncio.Task]:
+    global _sender
+    if not config.EMAIL_HOST:
+        logger.warning("EMAIL_HOST is not set, emails stay in the outbox")
+        return None
+
+    _sender = asyncio.create_task(run_outbox())
+    return _sender
+
+
+async def stop_outbox() -> None:
+    global _sender
+    if _sender is not None:
+        _sender.cancel()
+        await asyncio.gather(_sender, return_exceptions=True)
+        _sender = None
+
+
 async def send_confirmation_email(user_email, url):
     body = f"Please click the link below to confirm your email \
         \n\n{url} \
         \nDon't share it with anyone"
 
-    await send_email(
+    await enqueue_email(
         user_email,
         "Confirmation Email",
         body,
@@ -67,12 +258,22 @@ async def send_confirmation_email(user_email, url):
 
 
 if __name__ == "__main__":
+    import argparse
 
-    async def main():
-        await send_email(
-            recipient="oslianyabel@gmail.com",
-            subject="Test",
-            body="Este es un mensaje de prueba enviado de forma asíncrona.",
-        )
+    from database import create_schema
+
+    async def main(recipient: Optional[str]):
+        create_schema()
+        await database.connect()
+        if recipient:
+            await enqueue_email(
+                recipient,
+                "Test",
+                "Este es un mensaje de prueba enviado de forma asíncrona.",
+            )
+        print(f"{await drain_outbox()} emails processed")
+        await database.disconnect()
 
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Envía los correos pendientes del outbox")
+    parser.add_argument("--to", help="encola antes un correo de prueba")
+    asyncio.run(main(parser.parse_args().to))
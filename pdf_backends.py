@@ -0,0 +1,179 @@
+import importlib.util
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+if TYPE_CHECKING:
+    import PyPDF2
+
+logger = logging.getLogger("app")
+
+
+class EncryptedDocumentError(Exception):
+    pass
+
+
+class PdfBackend(ABC):
+    """
+    Motor de extracción de texto. iter_pages produce el texto de cada página
+    en orden, o None si esa página falló y debe extraerse con PyPDF2.
+    """
+
+    name = ""
+    module = ""  # paquete opcional que necesita
+
+    @abstractmethod
+    def iter_pages(self, file_path: Path, password: str) -> Iterator[Optional[str]]: ...
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+
+class PyPDF2Backend(PdfBackend):
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def iter_pages(self, file_path, password):
+        for page in open_reader(file_path).pages:
+            yield page.extract_text()
+
+
+class PdfiumBackend(PdfBackend):
+    name = "pdfium"
+    module = "pypdfium2"
+
+    def iter_pages(self, file_path, password):
+        import pypdfium2
+
+        document = pypdfium2.PdfDocument(str(file_path), password=password or None)
+        try:
+            for index in range(len(document)):
+                page = textpage = text = None
+                try:
+                    page = document[index]
+                    textpage = page.get_textpage()
+                    text = textpage.get_text_range().replace("\r\n", "\n")
+                except Exception as exc:
+                    logger.debug(f"pdfium failed on page {index}: {exc}")
+                finally:
+                    # memoria nativa: no esperar al recolector
+                    if textpage is not None:
+                        textpage.close()
+                    if page is not None:
+                        page.close()
+                yield text
+        finally:
+            document.close()
+
+
+class PdfminerBackend(PdfBackend):
+    name = "pdfminer"
+    module = "pdfminer"
+
+    def iter_pages(self, file_path, password):
+        from io import StringIO
+
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+
+        resources = PDFResourceManager(caching=True)
+        with open(file_path, "rb") as file:
+            for index, page in enumerate(PDFPage.get_pages(file, password=password)):
+                output = StringIO()
+                device = TextConverter(resources, output, laparams=LAParams())
+                try:
+                    PDFPageInterpreter(resources, device).process_page(page)
+                    yield output.getvalue()
+                except Exception as exc:
+                    logger.debug(f"pdfminer failed on page {index}: {exc}")
+                    yield None
+                finally:
+                    device.close()
+
+
+PDF_BACKENDS: dict[str, PdfBackend] = {
+    backend.name: backend
+    for backend in (PyPDF2Backend(), PdfiumBackend(), PdfminerBackend())
+}
+
+
+def open_reader(file_path: Path) -> "PyPDF2.PdfReader":
+    """
+    Abre el PDF con PyPDF2 y resuelve el cifrado: muchos PDF van cifrados con
+    contraseña de usuario vacía y se leen sin problema si se descifran con "".
+    """
+    import PyPDF2
+    from PyPDF2.errors import DependencyError
+
+    reader = PyPDF2.PdfReader(file_path)
+    if not reader.is_encrypted:
+        return reader
+
+    try:
+        decrypted = reader.decrypt("")
+    except DependencyError as exc:
+        raise EncryptedDocumentError(
+            "requiere PyCryptodome para su procesamiento"
+        ) from exc
+
+    if not decrypted:
+        raise EncryptedDocumentError("está protegido con contraseña")
+
+    return reader
+
+
+@lru_cache
+def warn_unavailable(backend: str, module: str) -> None:
+    logger.warning(f"PDF backend {backend} requires {module}, using pypdf2")
+
+
+def extract_pdf_pages(file_path: Path, backend_name: str = "pypdf2") -> list[str]:
+    """
+    Texto de cada página usando el motor elegido; las páginas en las que el
+    motor rápido falla se extraen con PyPDF2.
+    """
+    return extract_pdf_pages_with_fallbacks(file_path, backend_name)[0]
+
+
+def extract_pdf_pages_with_fallbacks(
+    file_path: Path, backend_name: str = "pypdf2"
+) -> tuple[list[str], int]:
+    """extract_pdf_pages y cuántas páginas hubo que sacar con PyPDF2"""
+    reader = open_reader(file_path)
+
+    backend = PDF_BACKENDS.get(backend_name)
+    if backend is None:
+        logger.warning(f"Unknown PDF backend {backend_name}, using pypdf2")
+        backend = PDF_BACKENDS["pypdf2"]
+    elif not backend.available():
+        warn_unavailable(backend.name, backend.module)
+        backend = PDF_BACKENDS["pypdf2"]
+
+    if backend.name == "pypdf2":
+        return [page.extract_text() for page in reader.pages], 0
+
+    pages: list[Optional[str]] = []
+    try:
+        for text in backend.iter_pages(file_path, ""):
+            pages.append(text)
+    except Exception as exc:
+        # el motor no pudo con el documento: lo que falte sale de PyPDF2
+        logger.warning(f"{backend.name} failed on {file_path}: {exc}")
+
+    num_pages = len(reader.pages)
+    pages = pages[:num_pages] + [None] * (num_pages - len(pages))
+
+    fallbacks = 0
+    for index, text in enumerate(pages):
+        if text is None:
+            pages[index] = reader.pages[index].extract_text()
+            fallbacks += 1
+
+    if fallbacks:
+        logger.debug(f"{fallbacks}/{num_pages} pages of {file_path} extracted with pypdf2")
+
+    return pages, fallbacks  # type: ignore
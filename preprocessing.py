@@ -0,0 +1,52 @@
+import logging
+import re
+from functools import lru_cache
+
+logger = logging.getLogger("app")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# La ñ se conserva: "año" y "ano" no son la misma palabra
+ACCENT_TABLE = str.maketrans("áéíóúüàèìòùâêîôûäëïö", "aeiouuaeiouaeiouaeio")
+
+
+def fold_accents(text: str) -> str:
+    return text.translate(ACCENT_TABLE)
+
+
+@lru_cache
+def _nltk_stop_words() -> tuple[str, ...]:
+    try:
+        from nltk.corpus import stopwords
+
+        return tuple(stopwords.words("spanish") + stopwords.words("english"))
+    except LookupError:
+        logger.warning("NLTK stopwords corpus not found, stopwords are not removed")
+        return ()
+
+
+@lru_cache
+def stop_words(fold: bool) -> frozenset[str]:
+    """Stopwords en español e inglés de NLTK, cargadas una vez por proceso"""
+    words = _nltk_stop_words()
+    if fold:
+        words = tuple(fold_accents(word) for word in words)
+
+    return frozenset(words)
+
+
+def tokenize(text: str, fold: bool = False, remove_stopwords: bool = True) -> list[str]:
+    text = text.lower()
+    if fold:
+        text = fold_accents(text)
+
+    tokens = TOKEN_PATTERN.findall(text)
+    if remove_stopwords:
+        stops = stop_words(fold)
+        tokens = [token for token in tokens if token not in stops]
+
+    return tokens
+
+
+def preprocess_text(text: str, fold: bool = False) -> str:
+    return " ".join(tokenize(text, fold))
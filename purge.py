@@ -0,0 +1,134 @@
+"""
+Borrado de documentos en dos fases. soft_delete marca deleted_at y el
+documento deja de verse en búsquedas y listados al momento; después una tarea
+en segundo plano borra postings, páginas y consultas en lotes de
+PURGE_BATCH_SIZE (transacciones cortas) y al final la fila, el fichero y su
+texto en la caché de extracción.
+
+Los borrados que queden a medias se retoman al arrancar la aplicación o con:
+
+    python purge.py
+"""
+
+import asyncio
+from pathlib import Path
+from typing import Iterable, Optional
+
+import aiofiles.os
+import sqlalchemy
+
+from config import config, logger
+from database import (
+    centroid_table,
+    create_schema,
+    database,
+    document_table,
+    live_document_ids,
+    page_table,
+    posting_table,
+    query_table,
+    share_table,
+)
+from extractors import drop_extraction_cache
+from search import bump_corpus_version
+
+_purges: set[asyncio.Task] = set()
+
+
+async def soft_delete(document_ids: Iterable[int], scope=live_document_ids) -> list[int]:
+    """
+    Marca los documentos como borrados y devuelve los ids que existían
+    (dentro de scope, p. ej. database.owned_document_ids)
+    """
+    query = (
+        document_table.update()
+        .where(document_table.c.id.in_(list(document_ids)))
+        .where(document_table.c.id.in_(scope))
+        .values(deleted_at=sqlalchemy.func.now())
+        .returning(document_table.c.id)
+    )
+    deleted = [row.id for row in await database.fetch_all(query)]  # type: ignore
+    if deleted:
+        await bump_corpus_version()
+
+    return deleted
+
+
+async def delete_in_batches(table, condition, batch_size: int) -> int:
+    """DELETE ... WHERE id IN (SELECT id ... LIMIT n) hasta que no queden filas"""
+    deleted = 0
+    while True:
+        batch = sqlalchemy.select(table.c.id).where(condition).limit(batch_size)
+        query = table.delete().where(table.c.id.in_(batch)).returning(table.c.id)
+        rows = await database.fetch_all(query)
+        if not rows:
+            return deleted
+        deleted += len(rows)
+
+
+async def purge_document(document_id: int) -> None:
+    query = document_table.select().where(document_table.c.id == document_id)
+    document = await database.fetch_one(query)
+    if not document or document.deleted_at is None:  # type: ignore
+        return
+
+    batch_size = config.PURGE_BATCH_SIZE
+    pages = 0
+    for table in (posting_table, page_table, query_table, centroid_table, share_table):
+        deleted = await delete_in_batches(table, table.c.document_id == document_id, batch_size)
+        if table is page_table:
+            pages = deleted
+
+    await database.execute(document_table.delete().where(document_table.c.id == document_id))
+
+    # Solo si ningún documento vivo se ha vuelto a subir con el mismo nombre
+    query = sqlalchemy.select(document_table.c.id).where(
+        document_table.c.name == document.name  # type: ignore
+    )
+    if not await database.fetch_one(query):
+        path = Path(config.DOCUMENT_PATH) / document.name  # type: ignore
+        if await aiofiles.os.path.exists(path):
+            await drop_extraction_cache(path)
+            await aiofiles.os.remove(path)
+
+    logger.info(f"Document {document.name} purged ({pages} pages)")  # type: ignore
+
+
+async def purge_documents(document_ids: Optional[list[int]] = None) -> None:
+    """Purga los documentos indicados, o todos los marcados como borrados"""
+    if document_ids is None:
+        query = sqlalchemy.select(document_table.c.id).where(
+            document_table.c.deleted_at.is_not(None)
+        )
+        document_ids = [row.id for row in await database.fetch_all(query)]  # type: ignore
+
+    for document_id in document_ids:
+        try:
+            await purge_document(document_id)
+        except Exception as exc:
+            # Sigue marcado: se reintenta en el próximo arranque
+            logger.error(f"Error purging document {document_id}: {exc}")
+
+
+def schedule_purge(document_ids: Optional[list[int]] = None) -> asyncio.Task:
+    task = asyncio.create_task(purge_documents(document_ids))
+    _purges.add(task)
+    task.add_done_callback(_purges.discard)
+    return task
+
+
+async def cancel_purges() -> None:
+    for task in list(_purges):
+        task.cancel()
+    await asyncio.gather(*_purges, return_exceptions=True)
+
+
+if __name__ == "__main__":
+
+    async def main():
+        create_schema()
+        await database.connect()
+        await purge_documents()
+        await database.disconnect()
+
+    asyncio.run(main())
@@ -0,0 +1,232 @@
+import asyncio
+import re
+import string
+from functools import lru_cache
+from typing import NamedTuple
+
+from completions import Completions
+from config import config, logger
+from metrics import PAGE_ANSWERS
+from utils2 import find_answer_in_page
+
+NO_ANSWER = "No Answer"
+
+# Instrucciones fijas primero y el texto después: las consultas repetidas sobre
+# la misma página comparten prefijo y el proveedor puede cachearlo
+PAGE_PROMPT = """El usuario te hará una consulta que debes responder con contenido LITERAL tomado del texto que sigue. Si la respuesta no aparece tu respuesta será: No Answer
+
+Texto:
+{content}"""
+
+PACKED_PROMPT = """El usuario te hará una consulta que debes responder con contenido LITERAL tomado de los siguientes fragmentos numerados. Indica el número de cada fragmento que uses entre corchetes, por ejemplo [2]. Si la respuesta no aparece tu respuesta será: No Answer
+
+{sources}"""
+
+CITATION_PATTERN = re.compile(r"\[(\d+)\]")
+
+
+class PageAnswer(NamedTuple):
+    answer: str
+    tier: str  # extractive | llm
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+
+def is_no_answer(answer: str) -> bool:
+    """El LLM no siempre responde NO_ANSWER tal cual: "No answer.", "no answer"..."""
+    return answer.strip(string.punctuation + string.whitespace).casefold() == NO_ANSWER.casefold()
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximación de ~4 caracteres por token"""
+    return len(text) // 4 + 1
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")  # gpt-4o / gpt-4o-mini
+    except ImportError:
+        logger.warning("tiktoken is not installed, token counts are estimated")
+    except Exception as exc:  # sin red para descargar el vocabulario
+        logger.warning(f"tiktoken encoding unavailable, token counts are estimated: {exc}")
+
+    return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    return len(encoding.encode(text, disallowed_special=())) if encoding else estimate_tokens(text)
+
+
+def split_line(line: str, max_tokens: int) -> list[str]:
+    """
+    Una línea que no cabe en max_tokens se parte por palabras, a mitades; una
+    sola palabra que no cabe (una URL, un bloque base64) se corta por caracteres.
+    """
+    if count_tokens(line) <= max_tokens:
+        return [line]
+
+    words = line.split()
+    if len(words) > 1:
+        half = len(words) // 2
+        return split_line(" ".join(words[:half]), max_tokens) + split_line(
+            " ".join(words[half:]), max_tokens
+        )
+
+    pieces = []
+    text = line.strip()
+    while text:
+        end = max(1, longest_prefix(text, max_tokens))
+        pieces.append(text[:end])
+        text = text[end:]
+
+    return pieces
+
+
+def longest_prefix(text: str, max_tokens: int) -> int:
+    """Longitud del prefijo más largo de text que cabe en max_tokens (búsqueda binaria)"""
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+
+    return low
+
+
+def fit_tokens(text: str, max_tokens: int) -> str:
+    """
+    Recorta el final de un texto unido a partir de trozos contados por
+    separado: el separador y los tokens que se forman en cada frontera
+    pueden pasarse de max_tokens aunque cada trozo quepa
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    return text[: longest_prefix(text, max_tokens)]
+
+
+def page_segments(content: str, max_tokens: int) -> list[str]:
+    """
+    Trocea la página en segmentos de hasta max_tokens por saltos de línea (o
+    por palabras, o caracteres, si una línea no cabe; split_line). Los cortes
+    solo dependen del texto, así que la misma ventana se repite entre
+    consultas parecidas.
+    """
+    segments: list[str] = []
+    current: list[str] = []
+    tokens = 0
+
+    for line in content.splitlines():
+        for piece in split_line(line, max_tokens):
+            piece_tokens = count_tokens(piece)
+            if current and tokens + piece_tokens > max_tokens:
+                segments.append("\n".join(current))
+                current, tokens = [], 0
+            current.append(piece)
+            tokens += piece_tokens
+
+    if current:
+        segments.append("\n".join(current))
+
+    return segments
+
+
+def page_window(content: str, question: str, token_budget: int) -> str:
+    """
+    La página entera si cabe en token_budget; si no, los dos segmentos
+    consecutivos alrededor de la frase más relevante para la consulta.
+    """
+    if count_tokens(content) <= token_budget:
+        return content
+
+    segments = page_segments(content, token_budget // 2)
+    sentence, score = find_answer_in_page(content, question)
+    best = next(
+        (index for index, segment in enumerate(segments) if score and sentence in segment), 0
+    )
+    start = min(best, max(0, len(segments) - 2))
+    return fit_tokens("\n".join(segments[start : start + 2]), token_budget)
+
+
+def page_messages(content: str, question: str) -> list[dict]:
+    window = page_window(content, question, config.PAGE_PROMPT_TOKEN_BUDGET)
+    return [
+        {"role": "system", "content": PAGE_PROMPT.format(content=window)},
+        {"role": "user", "content": question},
+    ]
+
+
+async def answer_page(content: str, question: str) -> PageAnswer:
+    """Respuesta literal a la consulta tomada de una sola página"""
+    messages = await asyncio.to_thread(page_messages, content, question)
+    llm = Completions(name="PAGE_QA")
+    answer = await llm.submit_message(messages)
+    return PageAnswer(
+        answer, "llm", llm.usage["prompt_tokens"], llm.usage["completion_tokens"]
+    )
+
+
+async def answer_page_tiered(content: str, question: str) -> PageAnswer:
+    """
+    Primero la frase más parecida según el índice TF-IDF de la página; si su
+    similitud no llega a ANSWER_EXTRACTIVE_THRESHOLD se pregunta al LLM.
+    """
+    sentence, score = await asyncio.to_thread(find_answer_in_page, content, question)
+    if sentence and score >= config.ANSWER_EXTRACTIVE_THRESHOLD:
+        result = PageAnswer(sentence, "extractive")
+    else:
+        result = await answer_page(content, question)
+
+    PAGE_ANSWERS.inc(tier=result.tier)
+    return result
+
+
+def pack_pages(contents: list[str], token_budget: int) -> list[str]:
+    """Las primeras páginas que caben en token_budget; la que no cabe se recorta"""
+    packed = []
+    remaining = token_budget
+    for content in contents:
+        tokens = count_tokens(content)
+        if tokens > remaining:
+            if remaining > 200:
+                packed.append(fit_tokens(page_segments(content, remaining)[0], remaining))
+            break
+
+        packed.append(content)
+        remaining -= tokens
+
+    return packed
+
+
+async def answer_packed(contents: list[str], question: str) -> tuple[PageAnswer, list[int]]:
+    """
+    Una sola llamada al LLM con varias páginas como fragmentos numerados.
+    Devuelve la respuesta y los índices (en contents) de los fragmentos citados.
+    """
+    sources = "\n\n".join(
+        f"[{number}] {content}" for number, content in enumerate(contents, start=1)
+    )
+    messages = [
+        {"role": "system", "content": PACKED_PROMPT.format(sources=sources)},
+        {"role": "user", "content": question},
+    ]
+    llm = Completions(name="ASK_PACKED")
+    answer = await llm.submit_message(messages)
+
+    cited = {int(number) - 1 for number in CITATION_PATTERN.findall(answer)}
+    cited = sorted(index for index in cited if 0 <= index < len(contents))
+    if not cited and not is_no_answer(answer):
+        cited = list(range(len(contents)))
+
+    result = PageAnswer(
+        CITATION_PATTERN.sub("", answer).strip(),
+        "llm",
+        llm.usage["prompt_tokens"],
+        llm.usage["completion_tokens"],
+    )
+    return result, cited
@@ -0,0 +1,196 @@
+"""
+Perfil de los vectores guardados: dimensiones reducidas y códigos
+cuantizados (int8 o binarios) para el escaneo de la búsqueda vectorial.
+Los candidatos del escaneo se reordenan después con los vectores completos.
+
+Migración de los vectores existentes al perfil del índice activo:
+
+    python quantization.py              # real[] + dimensiones + códigos que falten
+    python quantization.py --rebuild    # recalcula todos los códigos
+"""
+
+from typing import TYPE_CHECKING, Optional
+
+# numpy se importa al usarlo, como en search.py
+if TYPE_CHECKING:
+    import numpy
+
+QUANTIZATIONS = ("none", "int8", "binary")
+
+
+def normalize(vectors) -> "numpy.ndarray":
+    import numpy
+
+    matrix = numpy.atleast_2d(numpy.asarray(vectors, dtype=numpy.float32))
+    norms = numpy.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def reduce_dimensions(vector: list[float], dimensions: Optional[int]) -> list[float]:
+    """
+    Recorta y renormaliza un vector. Para los modelos text-embedding-3 equivale
+    a pedir `dimensions` a la API, así que no hace falta volver a embeber.
+    """
+    if not dimensions or len(vector) <= dimensions:
+        return vector
+
+    return normalize(vector[:dimensions])[0].tolist()
+
+
+def quantize(vectors, mode: str) -> list[bytes]:
+    """int8: un byte por dimensión; binary: un bit (el signo) por dimensión"""
+    import numpy
+
+    matrix = normalize(vectors)
+    if mode == "int8":
+        codes = numpy.clip(numpy.rint(matrix * 127), -127, 127).astype(numpy.int8)
+    elif mode == "binary":
+        codes = numpy.packbits(matrix > 0, axis=1)
+    else:
+        raise ValueError(f"Unknown quantization {mode!r}")
+
+    return [row.tobytes() for row in codes]
+
+
+def code_scores(query_embeddings, codes: list[bytes], mode: str) -> "numpy.ndarray":
+    """
+    Coseno aproximado de cada consulta (filas) contra cada código (columnas).
+    Las consultas no se cuantizan, solo el corpus.
+    """
+    import numpy
+
+    queries = normalize(query_embeddings)
+    if not codes:
+        return numpy.zeros((len(queries), 0), dtype=numpy.float32)
+
+    if mode == "int8":
+        matrix = numpy.frombuffer(b"".join(codes), dtype=numpy.int8).reshape(len(codes), -1)
+        return queries @ (matrix.astype(numpy.float32) / 127).T
+
+    if mode == "binary":
+        dimensions = queries.shape[1]
+        packed = numpy.frombuffer(b"".join(codes), dtype=numpy.uint8).reshape(len(codes), -1)
+        signs = numpy.unpackbits(packed, axis=1, count=dimensions).astype(numpy.float32)
+        return queries @ (signs * 2 - 1).T / numpy.sqrt(dimensions)
+
+    raise ValueError(f"Unknown quantization {mode!r}")
+
+
+def top_candidates(scores: "numpy.ndarray", count: int) -> "numpy.ndarray":
+    """Índices (columnas) de los `count` mejores de cada fila, sin ordenar"""
+    import numpy
+
+    if count >= scores.shape[1]:
+        return numpy.arange(scores.shape[1])
+
+    best = numpy.argpartition(-scores, count - 1, axis=1)[:, :count]
+    return numpy.unique(best)
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    import sqlalchemy
+
+    from config import config, logger
+    from database import (
+        centroid_table,
+        create_schema,
+        database,
+        document_table,
+        engine,
+        page_table,
+    )
+    from embeddings import vector_key
+    from search import bump_corpus_version
+    from utils import embedding_profile
+
+    TABLES = [page_table, document_table, centroid_table]
+
+    def use_real_arrays() -> None:
+        """double precision[] -> real[]: la mitad de espacio, la precisión sobra"""
+        inspector = sqlalchemy.inspect(engine)
+        with engine.begin() as conn:
+            for table in TABLES:
+                columns = {c["name"]: c["type"] for c in inspector.get_columns(table.name)}
+                item_type = getattr(columns["embeddings"], "item_type", None)
+                if isinstance(item_type, sqlalchemy.Float) and not isinstance(item_type, sqlalchemy.REAL):
+                    conn.execute(
+                        sqlalchemy.text(
+                            f"ALTER TABLE {table.name} ALTER COLUMN embeddings TYPE real[]"
+                        )
+                    )
+                    logger.info(f"{table.name}.embeddings -> real[]")
+
+    async def migrate_table(
+        table, model: str, dimensions: Optional[int], rebuild: bool, batch_size: int
+    ) -> None:
+        """
+        Recorre la tabla por id en lotes: reduce a las dimensiones del índice
+        activo los vectores de su modelo y rellena códigos. Los de otro modelo
+        solo reciben códigos; se vuelven a embeber con reembed.py --fix-stale.
+        """
+        mode = config.VECTOR_QUANTIZATION
+        key = vector_key(model, dimensions)
+        last_id = 0
+        updated = 0
+
+        while True:
+            query = (
+                sqlalchemy.select(
+                    table.c.id, table.c.embeddings, table.c.codes, table.c.embedding_model
+                )
+                .where(table.c.id > last_id)
+                .where(table.c.embeddings.is_not(None))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            )
+            rows = await database.fetch_all(query)
+            if not rows:
+                break
+            last_id = rows[-1].id  # type: ignore
+
+            values = []
+            for row in rows:
+                embeddings = row.embeddings  # type: ignore
+                embedding_model = row.embedding_model  # type: ignore
+                if (embedding_model or "").partition("@")[0] == model:
+                    embeddings = reduce_dimensions(embeddings, dimensions)
+                resized = len(embeddings) != len(row.embeddings)  # type: ignore
+                if resized:
+                    embedding_model = key
+                elif mode == "none" or (row.codes and not rebuild):  # type: ignore
+                    continue
+
+                codes = quantize([embeddings], mode)[0] if mode != "none" else None
+                values.append((row.id, embeddings, codes, embedding_model))  # type: ignore
+
+            async with database.transaction():
+                for row_id, embeddings, codes, embedding_model in values:
+                    update = (
+                        table.update()
+                        .where(table.c.id == row_id)
+                        .values(embeddings=embeddings, codes=codes, embedding_model=embedding_model)
+                    )
+                    await database.execute(update)
+            updated += len(values)
+
+        logger.info(f"{table.name}: {updated} vectors migrated")
+
+    async def main(rebuild: bool, batch_size: int) -> None:
+        create_schema()
+        use_real_arrays()
+        await database.connect()
+        model, dimensions = await embedding_profile()
+        for table in TABLES:
+            await migrate_table(table, model, dimensions, rebuild, batch_size)
+        await bump_corpus_version()
+        await database.disconnect()
+
+    parser = argparse.ArgumentParser(description="Migra los vectores al perfil configurado")
+    parser.add_argument("--rebuild", action="store_true", help="recalcula todos los códigos")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.rebuild, args.batch_size))
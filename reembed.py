@@ -0,0 +1,395 @@
+"""
+Re-embebe todo el corpus con otro modelo (o dimensiones) sin cortar el
+servicio. Los vectores nuevos se escriben en pages.next_embeddings en lotes
+por id, con el punto de control en embedding_indexes, así que el trabajo se
+puede interrumpir y retomar. La búsqueda sigue usando el índice activo hasta
+que están todas las páginas. Entonces se preparan los vectores de documento
+y sus centroides del índice nuevo, y el cambio se hace en una transacción.
+
+    python reembed.py --model text-embedding-3-large --dimensions 1024
+    python reembed.py --model local:intfloat/multilingual-e5-small  # en CPU, embeddings.py
+    python reembed.py --status
+    python reembed.py --fix-stale   # páginas subidas durante el cambio
+"""
+
+import argparse
+import asyncio
+from typing import Optional
+
+import sqlalchemy
+
+from config import config, logger
+from database import (
+    centroid_table,
+    create_schema,
+    database,
+    document_table,
+    embedding_index_table,
+    page_table,
+)
+from embeddings import qualified_model, vector_key
+from quantization import quantize
+from search import bump_corpus_version, document_vectors, update_document_vectors
+from utils import embedding_profile, get_embeddings, invalidate_embedding_profile
+
+STAGED = "#next"  # sufijo de los centroides preparados, que la búsqueda no ve
+
+
+async def start_index(model: str, dimensions: Optional[int], restart: bool) -> dict:
+    """Retoma el índice en construcción con el mismo perfil o empieza uno nuevo"""
+    query = embedding_index_table.select().where(embedding_index_table.c.status == "building")
+    building = await database.fetch_one(query)
+
+    if building and (building.model, building.dimensions) == (model, dimensions) and not restart:  # type: ignore
+        logger.info(f"Resuming {model} from page id {building.last_page_id}")  # type: ignore
+        return dict(building._mapping)  # type: ignore
+
+    if building and not restart:
+        raise SystemExit(
+            f"{building.model} is already being built, use --restart to discard it"  # type: ignore
+        )
+
+    async with database.transaction():
+        await database.execute(
+            embedding_index_table.update()
+            .where(embedding_index_table.c.status == "building")
+            .values(status="retired")
+        )
+        await database.execute(
+            page_table.update()
+            .where(page_table.c.next_embeddings.is_not(None))
+            .values(next_embeddings=None, next_codes=None)
+        )
+        await database.execute(
+            document_table.update()
+            .where(document_table.c.next_embeddings.is_not(None))
+            .values(next_embeddings=None, next_codes=None)
+        )
+        await database.execute(
+            centroid_table.delete().where(centroid_table.c.embedding_model.endswith(STAGED))
+        )
+        query = embedding_index_table.insert().values(
+            model=model, dimensions=dimensions, status="building"
+        )
+        index_id = await database.execute(query)
+
+    logger.info(f"Building {model} index")
+    query = embedding_index_table.select().where(embedding_index_table.c.id == index_id)
+    return dict((await database.fetch_one(query))._mapping)  # type: ignore
+
+
+def index_key(index: dict) -> str:
+    return vector_key(index["model"], index["dimensions"])
+
+
+def staged_key(index: dict) -> str:
+    return index_key(index) + STAGED
+
+
+async def embed_pages(index: dict, pages: list, staged: bool) -> None:
+    """
+    Una llamada de embeddings por lote. staged: a next_embeddings y avanza el
+    punto de control en la misma transacción; si no, directamente al índice.
+    """
+    embeddings = await get_embeddings(
+        [page.content[:2000] for page in pages], index["model"], index["dimensions"]
+    )
+    mode = config.VECTOR_QUANTIZATION
+    codes = quantize(embeddings, mode) if mode != "none" else [None] * len(pages)
+
+    async with database.transaction():
+        for page, vector, code in zip(pages, embeddings, codes):
+            if staged:
+                values = {"next_embeddings": vector, "next_codes": code}
+            else:
+                values = {"embeddings": vector, "codes": code, "embedding_model": index_key(index)}
+            await database.execute(
+                page_table.update().where(page_table.c.id == page.id).values(**values)
+            )
+
+        if staged:
+            index["last_page_id"] = pages[-1].id
+            index["pages_done"] += len(pages)
+            await database.execute(
+                embedding_index_table.update()
+                .where(embedding_index_table.c.id == index["id"])
+                .values(last_page_id=index["last_page_id"], pages_done=index["pages_done"])
+            )
+
+
+async def refresh_documents(document_ids) -> None:
+    """Los vectores de documento salen de sus páginas (search.update_document_vectors)"""
+    for document_id in document_ids:
+        query = sqlalchemy.select(
+            page_table.c.content,
+            page_table.c.embeddings,
+            page_table.c.embedding_model,
+            page_table.c.length,
+        ).where(page_table.c.document_id == document_id)
+        await update_document_vectors(document_id, await database.fetch_all(query))
+
+
+async def stage_documents(index: dict) -> dict[int, tuple]:
+    """
+    Vector de cada documento y sus centroides con el índice nuevo, a partir de
+    pages.next_embeddings: a documents.next_embeddings y a document_centroids
+    con staged_key. Se hace antes de bloquear pages, así que una subida puede
+    cambiar algún documento mientras tanto; devuelve la huella de cada uno
+    (document_fingerprints) para reconocerlos en el cambio.
+    """
+    key = staged_key(index)
+    await database.execute(centroid_table.delete().where(centroid_table.c.embedding_model == key))
+
+    fingerprints = {}
+    for row in await database.fetch_all(sqlalchemy.select(document_table.c.id)):
+        document_id = row.id  # type: ignore
+        query = sqlalchemy.select(
+            page_table.c.id,
+            page_table.c.content,
+            page_table.c.next_embeddings,
+            page_table.c.length,
+        ).where(page_table.c.document_id == document_id)
+        pages = [
+            {
+                "id": page.id,  # type: ignore
+                "content": page.content,  # type: ignore
+                "embeddings": page.next_embeddings,  # type: ignore
+                "embedding_model": key,
+                "length": page.length,  # type: ignore
+            }
+            for page in await database.fetch_all(query)
+        ]
+        centroids, codes, _ = document_vectors(pages)
+
+        async with database.transaction():
+            await database.execute(
+                document_table.update()
+                .where(document_table.c.id == document_id)
+                .values(next_embeddings=centroids[0], next_codes=codes[0])
+            )
+            await database.execute(
+                centroid_table.delete()
+                .where(centroid_table.c.document_id == document_id)
+                .where(centroid_table.c.embedding_model == key)
+            )
+            if len(centroids) > 1:
+                await database.execute_many(
+                    centroid_table.insert(),
+                    [
+                        {
+                            "document_id": document_id,
+                            "embeddings": vector,
+                            "codes": code,
+                            "embedding_model": key,
+                        }
+                        for vector, code in zip(centroids[1:], codes[1:])
+                    ],
+                )
+
+        if pages:
+            fingerprints[document_id] = (
+                len(pages),
+                sum(page["id"] for page in pages),
+                len(centroids) - 1,
+            )
+
+    return fingerprints
+
+
+async def document_fingerprints(index: dict) -> dict[int, tuple]:
+    """(páginas, suma de sus ids, centroides preparados) de cada documento"""
+    query = sqlalchemy.select(
+        page_table.c.document_id,
+        sqlalchemy.func.count(page_table.c.id),
+        sqlalchemy.func.sum(page_table.c.id),
+    ).group_by(page_table.c.document_id)
+    pages = {row[0]: (row[1], row[2]) for row in await database.fetch_all(query)}
+
+    query = (
+        sqlalchemy.select(centroid_table.c.document_id, sqlalchemy.func.count(centroid_table.c.id))
+        .where(centroid_table.c.embedding_model == staged_key(index))
+        .group_by(centroid_table.c.document_id)
+    )
+    centroids = {row[0]: row[1] for row in await database.fetch_all(query)}
+
+    return {
+        document_id: (*pages.get(document_id, (0, 0)), centroids.get(document_id, 0))
+        for document_id in pages.keys() | centroids.keys()
+    }
+
+
+async def switch_index(index: dict) -> bool:
+    """
+    Activa el índice si no quedan páginas por embeber. Los vectores de
+    documento se preparan antes (stage_documents); la tabla pages solo se
+    bloquea frente a escrituras durante el cambio, así que ninguna subida
+    queda a medias entre los dos índices. Los documentos que cambiaron
+    mientras se preparaban se recalculan dentro del bloqueo.
+    """
+    staged = await stage_documents(index)
+    key = index_key(index)
+
+    async with database.transaction():
+        await database.execute(sqlalchemy.text("LOCK TABLE pages IN SHARE ROW EXCLUSIVE MODE"))
+
+        query = sqlalchemy.select(sqlalchemy.func.count(page_table.c.id)).where(
+            page_table.c.id > index["last_page_id"]
+        )
+        if await database.fetch_val(query):
+            return False
+
+        current = await document_fingerprints(index)
+        changed = [
+            document_id
+            for document_id in current.keys() | staged.keys()
+            if current.get(document_id) != staged.get(document_id)
+        ]
+
+        await database.execute(
+            page_table.update()
+            .where(page_table.c.next_embeddings.is_not(None))
+            .values(
+                embeddings=page_table.c.next_embeddings,
+                codes=page_table.c.next_codes,
+                embedding_model=key,
+                next_embeddings=None,
+                next_codes=None,
+            )
+        )
+        await database.execute(
+            document_table.update().values(
+                embeddings=document_table.c.next_embeddings,
+                codes=document_table.c.next_codes,
+                embedding_model=sqlalchemy.case(
+                    (document_table.c.next_embeddings.is_not(None), key), else_=None
+                ),
+                next_embeddings=None,
+                next_codes=None,
+            )
+        )
+        await database.execute(
+            centroid_table.delete().where(
+                centroid_table.c.embedding_model.is_distinct_from(staged_key(index))
+            )
+        )
+        await database.execute(
+            centroid_table.update()
+            .where(centroid_table.c.embedding_model == staged_key(index))
+            .values(embedding_model=key)
+        )
+        await database.execute(
+            embedding_index_table.update()
+            .where(embedding_index_table.c.status == "active")
+            .values(status="retired")
+        )
+        await database.execute(
+            embedding_index_table.update()
+            .where(embedding_index_table.c.id == index["id"])
+            .values(status="active", activated_at=sqlalchemy.func.now())
+        )
+        await refresh_documents(changed)
+
+    invalidate_embedding_profile()  # fix_stale compara con el índice nuevo
+    await bump_corpus_version()
+
+    logger.info(
+        f"{index['model']} index is now active ({index['pages_done']} pages, "
+        f"{len(changed)} documents refreshed during the switch)"
+    )
+    return True
+
+
+async def build(model: str, dimensions: Optional[int], batch_size: int, restart: bool) -> None:
+    index = await start_index(model, dimensions, restart)
+
+    while True:
+        query = (
+            sqlalchemy.select(page_table.c.id, page_table.c.content)
+            .where(page_table.c.id > index["last_page_id"])
+            .order_by(page_table.c.id)
+            .limit(batch_size)
+        )
+        pages = await database.fetch_all(query)
+
+        if not pages:
+            if await switch_index(index):
+                break
+            continue  # llegaron páginas nuevas mientras tanto
+
+        await embed_pages(index, pages, staged=True)
+        logger.info(f"{index['pages_done']} pages embedded (last id {index['last_page_id']})")
+
+    await fix_stale(batch_size)
+
+
+async def fix_stale(batch_size: int) -> None:
+    """Re-embebe en su sitio las páginas con un modelo o dimensiones distintos del activo"""
+    model, dimensions = await embedding_profile()
+    index = {"model": model, "dimensions": dimensions}
+    document_ids = set()
+    last_id = 0
+
+    while True:
+        query = (
+            sqlalchemy.select(page_table.c.id, page_table.c.content, page_table.c.document_id)
+            .where(page_table.c.id > last_id)
+            .where(page_table.c.embedding_model.is_distinct_from(vector_key(model, dimensions)))
+            .order_by(page_table.c.id)
+            .limit(batch_size)
+        )
+        pages = await database.fetch_all(query)
+        if not pages:
+            break
+
+        await embed_pages(index, pages, staged=False)
+        document_ids.update(page.document_id for page in pages)  # type: ignore
+        last_id = pages[-1].id  # type: ignore
+
+    await refresh_documents(document_ids)
+    if document_ids:
+        await bump_corpus_version()
+        logger.info(f"Stale pages of {len(document_ids)} documents re-embedded with {index_key(index)}")
+
+
+async def status() -> None:
+    total = await database.fetch_val(sqlalchemy.select(sqlalchemy.func.count(page_table.c.id)))
+    model, dimensions = await embedding_profile()
+    stale = await database.fetch_val(
+        sqlalchemy.select(sqlalchemy.func.count(page_table.c.id)).where(
+            page_table.c.embedding_model.is_distinct_from(vector_key(model, dimensions))
+        )
+    )
+    query = embedding_index_table.select().where(
+        embedding_index_table.c.status.in_(["active", "building"])
+    )
+    for index in await database.fetch_all(query):
+        progress = f" {index.pages_done}/{total} pages" if index.status == "building" else ""  # type: ignore
+        print(f"{index.status:<9} {index.model} dims={index.dimensions}{progress}")  # type: ignore
+    print(f"serving {vector_key(model, dimensions)}, {stale} of {total} pages with another model")
+
+
+async def main(args) -> None:
+    create_schema()
+    await database.connect()
+    try:
+        if args.status:
+            await status()
+        elif args.fix_stale:
+            await fix_stale(args.batch_size)
+        else:
+            await build(args.model, args.dimensions, args.batch_size, args.restart)
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embebe el corpus con otro modelo")
+    parser.add_argument(
+        "--model", default=qualified_model(config.EMBEDDING_PROVIDER, config.EMBEDDING_MODEL)
+    )
+    parser.add_argument("--dimensions", type=int)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--restart", action="store_true", help="descarta el índice a medias")
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--fix-stale", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,20 @@
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONModelResponse(JSONResponse):
+    """
+    JSON serializado con orjson, modelos pydantic incluidos, sin pasar por
+    jsonable_encoder. Los endpoints que la devuelven ya construida se saltan
+    además la validación del response_model (que queda para la documentación).
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
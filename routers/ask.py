@@ -0,0 +1,131 @@
+import asyncio
+from typing import Annotated
+
+import sqlalchemy
+from fastapi import APIRouter, Depends
+
+from config import config
+from database import (
+    database,
+    document_table,
+    page_table,
+    query_table,
+    visible_document_ids,
+)
+from models.ask import Answer, AskMode, AskResponse, Citation
+from models.document import UserQuery
+from models.user import UserOut
+from qa import PageAnswer, answer_packed, answer_page_tiered, is_no_answer, pack_pages
+from search import retrieve_pages
+from security import get_current_user
+from utils import query_embeddings
+
+router = APIRouter()
+UserWithToken = Annotated[UserOut, Depends(get_current_user)]
+
+
+async def fetch_pages(hits: list[dict]) -> list[dict]:
+    """Contenido y documento de cada página recuperada, en el orden de hits"""
+    keys = [(hit["document_id"], hit["page_number"]) for hit in hits]
+    query = (
+        sqlalchemy.select(
+            page_table.c.document_id,
+            page_table.c.page_number,
+            page_table.c.content,
+            document_table.c.name,
+            document_table.c.url,
+        )
+        .join(document_table, document_table.c.id == page_table.c.document_id)
+        .where(sqlalchemy.tuple_(page_table.c.document_id, page_table.c.page_number).in_(keys))
+        .where(document_table.c.deleted_at.is_(None))
+    )
+    rows = {
+        (row.document_id, row.page_number): row  # type: ignore
+        for row in await database.fetch_all(query)
+    }
+
+    pages = []
+    for hit, key in zip(hits, keys):
+        row = rows.get(key)
+        if row and row.content:  # type: ignore
+            pages.append({**hit, "content": row.content, "name": row.name, "url": row.url})  # type: ignore
+
+    return pages
+
+
+def citation(page: dict) -> Citation:
+    return Citation(
+        document_id=page["document_id"],
+        document_name=page["name"],
+        document_url=page["url"],
+        page_number=page["page_number"],
+        score=page["score"],
+    )
+
+
+@router.post("", response_model=AskResponse)
+async def ask(
+    user_query: UserQuery,
+    current_user: UserWithToken,
+    mode: AskMode = AskMode.concurrent,
+    limit: int = config.ASK_TOP_PAGES,
+):
+    """
+    Responde una consulta sobre los documentos visibles para el usuario: un
+    embedding de la consulta, una recuperación de páginas y una ronda de LLM
+    (en paralelo por página o todas juntas en un solo contexto), con las
+    páginas citadas.
+    """
+    question = user_query.content
+    model, embeddings = await query_embeddings([question])
+    hits = await retrieve_pages(
+        question, embeddings[0], limit, scope=visible_document_ids(current_user.id), model=model
+    )
+    pages = await fetch_pages(hits)
+
+    answers: list[tuple[PageAnswer, list[dict]]] = []
+    if mode == AskMode.packed:
+        contents = pack_pages([page["content"] for page in pages], config.ASK_TOKEN_BUDGET)
+        if contents:
+            result, cited = await answer_packed(contents, question)
+            if not is_no_answer(result.answer):
+                answers.append((result, [pages[index] for index in cited]))
+    else:
+        results = await asyncio.gather(
+            *(answer_page_tiered(page["content"], question) for page in pages)
+        )
+        answers = [
+            (result, [page])
+            for result, page in zip(results, pages)
+            if not is_no_answer(result.answer)
+        ]
+
+    # Los tokens de una llamada van solo en la fila de la primera página citada
+    rows = [
+        {
+            "query": question,
+            "answer": result.answer,
+            "document_id": page["document_id"],
+            "page_number": page["page_number"],
+            "tier": result.tier,
+            "tokens_in": result.tokens_in if index == 0 else None,
+            "tokens_out": result.tokens_out if index == 0 else None,
+            "user_id": current_user.id,
+        }
+        for result, cited in answers
+        for index, page in enumerate(cited)
+    ]
+    if rows:
+        await database.execute_many(query_table.insert(), rows)
+
+    return AskResponse(
+        query=question,
+        answers=[
+            Answer(
+                answer=result.answer,
+                tier=result.tier,
+                citations=[citation(page) for page in cited],
+            )
+            for result, cited in answers
+        ],
+    )
@@ -1,36 +1,93 @@
+import asyncio
 import os
-from concurrent.futures import ThreadPoolExecutor
+import time
+import uuid
 from pathlib import Path
 from typing import Annotated, Optional
 
-import numpy
+import aiofiles.os
+import sqlalchemy
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
 from fastapi.responses import FileResponse
-from sklearn.metrics.pairwise import cosine_similarity
+from sqlalchemy.dialects.postgresql import insert
 
-from completions import Completions
 from config import config, logger
-from database import database, document_table, page_table, query_table
+from database import (
+    database,
+    document_table,
+    owned_document_ids,
+    page_table,
+    query_table,
+    share_table,
+    user_table,
+    visible_document_ids,
+)
+from embeddings import vector_key
+from extractors import EncryptedDocumentError, drop_extraction_cache, extract_pages
+from metrics import INGEST_THROUGHPUT
 from models.document import (
+    BatchDocumentResult,
+    BatchPageResult,
+    BatchQuery,
+    BulkDelete,
+    BulkDeleteResponse,
     DeleteResponse,
     Document,
     DocumentWithSimilarity,
     PageWithSimilarity,
     SearchResult,
+    ShareDocument,
+    ShareResponse,
+    UpdateDocument,
     UploadDocument,
     UserQuery,
 )
 from models.user import UserOut
-from security import get_current_user
-from utils import download_file, get_document_content, get_embedding
+from purge import schedule_purge, soft_delete
+from qa import answer_page_tiered
+from responses import ORJSONModelResponse
+from search import (
+    ResultCache,
+    SearchMode,
+    batch_lexical_scores,
+    bump_corpus_version,
+    current_corpus_version,
+    document_similarities,
+    index_page,
+    lexical_document_scores,
+    page_changes,
+    ranking,
+    reciprocal_rank_fusion,
+    retrieve_pages,
+    top_scores,
+    update_document_vectors,
+    vector_scores,
+)
+from security import get_current_user, is_admin
+from utils import (
+    clean_text,
+    download_file,
+    embedding_profile,
+    get_document_content,
+    get_embeddings,
+    query_embeddings,
+)
 
 router = APIRouter()
 UserWithToken = Annotated[UserOut, Depends(get_current_user)]
+search_cache = ResultCache(config.SEARCH_CACHE_SIZE)
+
+
+def editable_document_ids(user):
+    """Los del usuario; también los que no tienen dueño si es el administrador"""
+    return owned_document_ids(user.id, is_admin(user))
 
 
 @router.get("/", response_model=list[Document])
-async def get_documents(limit: Optional[int] = None):
-    query = document_table.select()
+async def get_documents(current_user: UserWithToken, limit: Optional[int] = None):
+    query = document_table.select().where(
+        document_table.c.id.in_(visible_document_ids(current_user.id))
+    )
     documents = await database.fetch_all(query)
     if limit:
         return documents[:limit]
@@ -40,21 +97,93 @@ async def get_documents(limit: Optional[int] = None):
 
 @router.delete("/{document_id}", response_model=DeleteResponse)
 async def delete_document(document_id: int, current_user: UserWithToken):
-    query = document_table.select().where(document_table.c.id == document_id)
-    document = await database.fetch_one(query)
-    if not document:
+    """
+    Desaparece de las búsquedas al momento; páginas, consultas y fichero se
+    borran en segundo plano (purge.py)
+    """
+    if not await soft_delete([document_id], editable_document_ids(current_user)):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
         )
 
-    path = Path(config.DOCUMENT_PATH) / document.name  # type: ignore
-    if path.exists():
-        os.remove(path)
+    schedule_purge([document_id])
+    return {"detail": "File deleted successfully"}
 
-    query = document_table.delete().where(document_table.c.id == document_id)
-    await database.execute(query)
 
-    return {"detail": "File deleted successfully"}
+@router.post("/delete", response_model=BulkDeleteResponse)
+async def delete_documents(bulk_delete: BulkDelete, current_user: UserWithToken):
+    """Borrado de varios documentos con una sola purga en segundo plano"""
+    deleted = await soft_delete(bulk_delete.ids, editable_document_ids(current_user))
+    if deleted:
+        schedule_purge(deleted)
+
+    return BulkDeleteResponse(
+        detail=f"{len(deleted)} files deleted successfully",
+        deleted=deleted,
+        not_found=sorted(set(bulk_delete.ids) - set(deleted)),
+    )
+
+
+async def shared_emails(document_id: int) -> list[str]:
+    query = (
+        sqlalchemy.select(user_table.c.email)
+        .select_from(share_table.join(user_table))
+        .where(share_table.c.document_id == document_id)
+        .order_by(user_table.c.email)
+    )
+    return [row.email for row in await database.fetch_all(query)]  # type: ignore
+
+
+@router.get("/{document_id}/share", response_model=ShareResponse)
+async def get_document_shares(document_id: int, current_user: UserWithToken):
+    await get_document_or_404(document_id, editable_document_ids(current_user))
+    return ShareResponse(document_id=document_id, shared_with=await shared_emails(document_id))
+
+
+@router.post("/{document_id}/share", response_model=ShareResponse)
+async def share_document(document_id: int, share: ShareDocument, current_user: UserWithToken):
+    """Comparte el documento con otros usuarios; solo su dueño o el administrador"""
+    await get_document_or_404(document_id, editable_document_ids(current_user))
+
+    query = sqlalchemy.select(user_table.c.id, user_table.c.email).where(
+        user_table.c.email.in_(share.emails)
+    )
+    users = await database.fetch_all(query)
+    if users:
+        query = (
+            insert(share_table)
+            .values([{"document_id": document_id, "user_id": user.id} for user in users])  # type: ignore
+            .on_conflict_do_nothing()
+        )
+        await database.execute(query)
+        await bump_corpus_version()
+
+    found = {user.email for user in users}  # type: ignore
+    return ShareResponse(
+        document_id=document_id,
+        shared_with=await shared_emails(document_id),
+        not_found=[email for email in share.emails if email not in found],
+    )
+
+
+@router.delete("/{document_id}/share/{email}", response_model=ShareResponse)
+async def unshare_document(document_id: int, email: str, current_user: UserWithToken):
+    await get_document_or_404(document_id, editable_document_ids(current_user))
+
+    user_ids = sqlalchemy.select(user_table.c.id).where(user_table.c.email == email)
+    query = (
+        share_table.delete()
+        .where(share_table.c.document_id == document_id)
+        .where(share_table.c.user_id.in_(user_ids))
+        .returning(share_table.c.id)
+    )
+    if not await database.fetch_all(query):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Document is not shared with that user"
+        )
+
+    await bump_corpus_version()
+    return ShareResponse(document_id=document_id, shared_with=await shared_emails(document_id))
 
 
 @router.post("/upload", status_code=201)
@@ -69,21 +198,22 @@ async def upload_documents(
     for file in files:
         try:
             file_path = await download_file(file)
+            start = time.perf_counter()
 
             try:
-                content, pages = await get_document_content(file.content_type, file_path)
-            except Exception as e:
-                if "PyCryptodome is required for AES algorithm" in str(e):
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"El documento {file.filename} está encriptado y requiere PyCryptodome para su procesamiento"
-                    )
-                raise
+                content, pages = await get_document_content(
+                    file.content_type, file_path, file.filename
+                )
+            except EncryptedDocumentError as exc:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"El documento {file.filename} está encriptado y {exc}",
+                )
 
             data = {
                 "name": file.filename,
                 "url": f"{config.DOMAIN}/{config.DOCUMENT_PATH}/{file.filename}",
-                "embeddings": await get_embedding(content[:2000]),
+                "owner_id": current_user.id,
             }
             query = document_table.insert().values(data)
             id = await database.execute(query)
@@ -91,9 +221,12 @@ async def upload_documents(
             try:
                 for page in pages:  # type: ignore
                     page["document_id"] = id
-                    query = page_table.insert().values(page)
-                    await database.execute(query)
+                    await index_page(page)
+                await update_document_vectors(id, pages)  # type: ignore
+                await bump_corpus_version()
 
+                if pages:
+                    INGEST_THROUGHPUT.observe(len(pages) / (time.perf_counter() - start))
                 logger.info(f"Document {data['name']} with {len(pages)} pages was uploaded")  # type: ignore
 
                 results.append(UploadDocument(
@@ -122,22 +255,158 @@ async def upload_documents(
     return results
 
 
-@router.get("/{document_id}", response_model=Document)
-async def get_document(document_id: int):
-    query = document_table.select().where(document_table.c.id == document_id)
-    document = await database.fetch_one(query)
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
+def stored_pages(document_id: int):
+    """Páginas guardadas para page_changes; las anteriores a los hashes traen el contenido"""
+    return sqlalchemy.select(
+        page_table.c.id,
+        page_table.c.page_number,
+        page_table.c.content_hash,
+        sqlalchemy.case(
+            (page_table.c.content_hash.is_(None), page_table.c.content), else_=None
+        ).label("content"),
+    ).where(page_table.c.document_id == document_id)
 
-    return document
+
+async def embed_contents(
+    contents: list[str], model: str, dimensions: Optional[int]
+) -> dict[str, list[float]]:
+    if not contents:
+        return {}
+    vectors = await get_embeddings([content[:2000] for content in contents], model, dimensions)
+    return dict(zip(contents, vectors))
+
+
+@router.put("/{document_id}")
+async def update_document(
+    document_id: int, file: UploadFile, current_user: UserWithToken
+) -> UpdateDocument:
+    """
+    Sustituye el fichero de un documento. Las páginas se comparan por hash con
+    las guardadas: las que no cambian conservan embeddings y postings (solo se
+    renumeran si se han desplazado) y solo las nuevas o modificadas se embeben.
+    """
+    await get_document_or_404(document_id, editable_document_ids(current_user))
+    # El fichero nuevo se guarda aparte y sustituye al anterior dentro de la
+    # transacción: si algo falla, el original sigue intacto
+    file_path = Path(config.DOCUMENT_PATH) / file.filename  # type: ignore
+    temp_path = file_path.with_name(f".{file.filename}.{uuid.uuid4().hex}.part")
+    await download_file(file, temp_path)
+
+    try:
+        start = time.perf_counter()
+
+        try:
+            texts = await extract_pages(file.content_type, temp_path, file.filename)
+        except EncryptedDocumentError as exc:
+            raise HTTPException(
+                status_code=400,
+                detail=f"El documento {file.filename} está encriptado y {exc}",
+            )
+
+        new_pages = {}
+        for page_number, text in enumerate(texts):
+            content = clean_text(text)
+            if content:
+                new_pages[page_number] = content
+
+        # Se embebe antes de bloquear el documento, con las páginas de ahora
+        _, added, _ = page_changes(await database.fetch_all(stored_pages(document_id)), new_pages)
+        model, dimensions = await embedding_profile()
+        embeddings = await embed_contents([content for _, content in added], model, dimensions)
+
+        async with database.transaction():
+            # Dos PUT del mismo documento se ordenan aquí: el segundo espera a que
+            # el primero confirme y compara con sus páginas, y el fichero que
+            # queda es el de la última versión confirmada
+            query = (
+                document_table.select()
+                .where(document_table.c.id == document_id)
+                .where(document_table.c.id.in_(editable_document_ids(current_user)))
+                .with_for_update()
+            )
+            document = await database.fetch_one(query)
+            if not document:
+                raise HTTPException(status_code=404, detail="Document not found")
+
+            moved, added, removed = page_changes(
+                await database.fetch_all(stored_pages(document_id)), new_pages
+            )
+            missing = [content for _, content in added if content not in embeddings]
+            if missing:  # otro PUT cambió las páginas mientras se embebía
+                embeddings.update(await embed_contents(missing, model, dimensions))
+
+            if removed:
+                await database.execute(page_table.delete().where(page_table.c.id.in_(removed)))
+            for page_id, page_number in moved:
+                query = page_table.update().where(page_table.c.id == page_id).values(page_number=page_number)
+                await database.execute(query)
+            for page_number, content in added:
+                await index_page(
+                    {
+                        "page_number": page_number,
+                        "document_id": document_id,
+                        "content": content,
+                        "embeddings": embeddings[content],
+                        "embedding_model": vector_key(model, dimensions),
+                    }
+                )
+
+            url = f"{config.DOMAIN}/{config.DOCUMENT_PATH}/{file.filename}"
+            query = (
+                document_table.update()
+                .where(document_table.c.id == document_id)
+                .values(name=file.filename, url=url)
+            )
+            await database.execute(query)
+
+            query = sqlalchemy.select(
+                page_table.c.content,
+                page_table.c.embeddings,
+                page_table.c.embedding_model,
+                page_table.c.length,
+            ).where(page_table.c.document_id == document_id)
+            await update_document_vectors(document_id, await database.fetch_all(query))
+
+            await aiofiles.os.replace(temp_path, file_path)
+    finally:
+        if await aiofiles.os.path.exists(temp_path):
+            await aiofiles.os.remove(temp_path)
+
+    await bump_corpus_version()
+    if document.name != file.filename:  # type: ignore
+        # Solo si ningún otro documento usa el mismo nombre (como purge.purge_document)
+        query = sqlalchemy.select(document_table.c.id).where(
+            document_table.c.name == document.name  # type: ignore
+        )
+        old_path = Path(config.DOCUMENT_PATH) / document.name  # type: ignore
+        if not await database.fetch_one(query) and await aiofiles.os.path.exists(old_path):
+            await drop_extraction_cache(old_path)
+            await aiofiles.os.remove(old_path)
+
+    if added:
+        INGEST_THROUGHPUT.observe(len(added) / (time.perf_counter() - start))
+    logger.info(
+        f"Document {file.filename} updated: {len(added)} pages added, {len(removed)} removed"
+    )
+
+    return UpdateDocument(
+        detail="file updated successfully",
+        document_id=document_id,
+        document_url=url,
+        pages_added=len(added),
+        pages_removed=len(removed),
+        pages_unchanged=len(new_pages) - len(added),
+    )
+
+
+@router.get("/{document_id}", response_model=Document)
+async def get_document(document_id: int, current_user: UserWithToken):
+    return await get_document_or_404(document_id, visible_document_ids(current_user.id))
 
 
 @router.get("/{document_id}/download")
-async def download_document(document_id: int) -> FileResponse:
-    query = document_table.select().where(document_table.c.id == document_id)
-    document = await database.fetch_one(query)
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
+async def download_document(document_id: int, current_user: UserWithToken) -> FileResponse:
+    document = await get_document_or_404(document_id, visible_document_ids(current_user.id))
 
     file_path = Path(config.DOCUMENT_PATH) / document.name  # type: ignore = Path(config.DOCUMENT_PATH) / document.name # type: ignore
 
@@ -151,82 +420,255 @@ async def download_document(document_id: int) -> FileResponse:
     )
 
 
-@router.post("/search")
-async def get_relevant_documents(
-    user_query: UserQuery, limit: int = 3
-) -> list[DocumentWithSimilarity]:
-    user_query_embedding = await get_embedding(user_query.content)
-    user_query_embedding = numpy.array(user_query_embedding).reshape(1, -1)
+async def search_documents(
+    queries: list[str], limit: int, mode: SearchMode, user_id: Optional[int] = None
+) -> list[list[DocumentWithSimilarity]]:
+    """
+    Resultados de la caché para las consultas ya vistas en esta versión del
+    corpus; el resto se calcula en un solo lote con rank_documents. Cada
+    usuario tiene sus propias entradas: solo ve sus documentos.
+    """
+    version = await current_corpus_version()
+    keys = [ResultCache.key(query, limit, mode.value, user_id) for query in queries]
+    results = [search_cache.get(key, version) for key in keys]
+
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        ranked = await rank_documents(
+            [queries[index] for index in missing], limit, mode, visible_document_ids(user_id)
+        )
+        for index, documents in zip(missing, ranked):
+            search_cache.put(keys[index], version, documents)
+            results[index] = documents
 
-    query = document_table.select()
-    documents = await database.fetch_all(query)
+    return [list(documents) for documents in results]  # type: ignore
 
-    def calculate_doc_similarity(doc) -> DocumentWithSimilarity | None:
-        if doc.embeddings:  # type: ignore
-            doc_embedding = numpy.array(doc.embeddings).reshape(1, -1)  # type: ignore
-            similarity = cosine_similarity(user_query_embedding, doc_embedding)[0][0]
 
-            return DocumentWithSimilarity(
-                id=doc.id,  # type: ignore
-                name=doc.name,  # type: ignore
-                url=doc.url,  # type: ignore
-                similarity=float(similarity),
+async def rank_documents(
+    queries: list[str], limit: int, mode: SearchMode, scope
+) -> list[list[DocumentWithSimilarity]]:
+    """
+    Búsqueda híbrida de documentos para varias consultas a la vez: una sola
+    llamada de embeddings, un único producto matriz-matriz contra los
+    documentos de scope (filtrados en la consulta, antes de puntuar) y una
+    sola suma BM25 para todo el lote (batch_lexical_scores).
+    """
+
+    async def vector_search() -> list[dict[int, float]]:
+        if mode == SearchMode.lexical:
+            return [{} for _ in queries]
+        model, embeddings = await query_embeddings(queries)
+        return await document_similarities(embeddings, limit, scope, model)
+
+    async def lexical_search() -> list[dict[int, float]]:
+        if mode == SearchMode.vector:
+            return [{} for _ in queries]
+        return await lexical_document_scores(queries, limit * config.RESCORE_FACTOR, scope)
+
+    similarities, lexical_scores = await asyncio.gather(vector_search(), lexical_search())
+
+    fused = [
+        reciprocal_rank_fusion(ranking(vector), ranking(lexical))
+        for vector, lexical in zip(similarities, lexical_scores)
+    ]
+    winners = [ranking(scores, limit) for scores in fused]
+
+    query = (
+        document_table.select()
+        .where(document_table.c.id.in_({id for ids in winners for id in ids}))
+        .where(document_table.c.id.in_(scope))
+    )
+    documents = {doc.id: doc for doc in await database.fetch_all(query)}  # type: ignore
+
+    return [
+        [
+            DocumentWithSimilarity(
+                id=id,
+                name=documents[id].name,  # type: ignore
+                url=documents[id].url,  # type: ignore
+                owner_id=documents[id].owner_id,  # type: ignore
+                similarity=vector.get(id, 0.0),
+                score=scores[id],
             )
+            for id in ids
+            if id in documents
+        ]
+        for ids, vector, scores in zip(winners, similarities, fused)
+    ]
 
-        return None
 
-    with ThreadPoolExecutor() as executor:
-        documents_with_similarity = list(
-            executor.map(calculate_doc_similarity, documents)
+async def search_pages(
+    document_id: int, queries: list[str], limit: int, mode: SearchMode
+) -> list[list[PageWithSimilarity]]:
+    similarities: list[dict[int, float]] = [{} for _ in queries]
+    lexical_scores: list[dict[int, float]] = [{} for _ in queries]
+
+    if mode != SearchMode.lexical:
+        model, embeddings = await query_embeddings(queries)
+        page_numbers, scores = await vector_scores(
+            page_table,
+            [page_table.c.page_number],
+            embeddings,
+            page_table.c.document_id == document_id,
+            candidates=limit,
+            model=model,
         )
+        similarities = top_scores(page_numbers, scores, limit * config.RESCORE_FACTOR)
 
-    documents_with_similarity = [doc for doc in documents_with_similarity if doc]
-    documents_with_similarity.sort(key=lambda doc: doc.similarity, reverse=True)
+    if mode != SearchMode.vector:
+        page_scores = await batch_lexical_scores(
+            queries, limit * config.RESCORE_FACTOR, document_id
+        )
+        lexical_scores = [
+            {page_number: score for (_, page_number), score in scores.items()}
+            for scores in page_scores
+        ]
 
-    return documents_with_similarity[:limit]
+    results = []
+    for vector, lexical in zip(similarities, lexical_scores):
+        fused = reciprocal_rank_fusion(ranking(vector), ranking(lexical))
+        results.append(
+            [
+                PageWithSimilarity(
+                    document_id=document_id,
+                    page_number=page_number,
+                    similarity=vector.get(page_number, 0.0),
+                    score=fused[page_number],
+                )
+                for page_number in ranking(fused, limit)
+            ]
+        )
 
+    return results
 
-@router.post("/{document_id}/search")
-async def get_document_response(
-    document_id: int, user_query: UserQuery, limit: int = 3
-) -> list[PageWithSimilarity]:
-    query = document_table.select().where(document_table.c.id == document_id)
+
+async def get_document_or_404(document_id: int, scope):
+    """scope: visible_document_ids para leer, editable_document_ids para modificar"""
+    query = (
+        document_table.select()
+        .where(document_table.c.id == document_id)
+        .where(document_table.c.id.in_(scope))
+    )
     document = await database.fetch_one(query)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    user_query_embedding = await get_embedding(user_query.content)
-    user_query_embedding = numpy.array(user_query_embedding).reshape(1, -1)
+    return document
 
-    query = page_table.select().where(page_table.c.document_id == document.id)  # type: ignore
-    pages = await database.fetch_all(query)
 
-    def calculate_page_similarity(page) -> PageWithSimilarity | None:
-        if page.embeddings:  # type: ignore
-            page_embedding = numpy.array(page.embeddings).reshape(1, -1)  # type: ignore
-            similarity = cosine_similarity(user_query_embedding, page_embedding)[0][0]
+# Las búsquedas devuelven la respuesta ya serializada con orjson (responses.py);
+# response_model solo documenta el esquema
 
-            return PageWithSimilarity(
-                document_id=page.document_id,  # type: ignore
-                page_number=page.page_number,  # type: ignore
-                similarity=float(similarity),
-            )
 
-        return None
+@router.post(
+    "/search",
+    response_model=list[DocumentWithSimilarity],
+    response_class=ORJSONModelResponse,
+)
+async def get_relevant_documents(
+    user_query: UserQuery,
+    current_user: UserWithToken,
+    limit: int = 3,
+    mode: SearchMode = SearchMode.hybrid,
+):
+    results = await search_documents([user_query.content], limit, mode, current_user.id)
+    return ORJSONModelResponse(results[0])
+
+
+@router.post(
+    "/search/batch",
+    response_model=list[BatchDocumentResult],
+    response_class=ORJSONModelResponse,
+)
+async def get_relevant_documents_batch(
+    batch_query: BatchQuery,
+    current_user: UserWithToken,
+    limit: int = 3,
+    mode: SearchMode = SearchMode.hybrid,
+):
+    results = await search_documents(batch_query.queries, limit, mode, current_user.id)
+    return ORJSONModelResponse(
+        [
+            {"query": query, "documents": documents}
+            for query, documents in zip(batch_query.queries, results)
+        ]
+    )
+
 
-    with ThreadPoolExecutor() as executor:
-        pages_with_similarity = list(executor.map(calculate_page_similarity, pages))
+@router.post(
+    "/pages/search",
+    response_model=list[PageWithSimilarity],
+    response_class=ORJSONModelResponse,
+)
+async def get_relevant_pages(
+    user_query: UserQuery,
+    current_user: UserWithToken,
+    limit: int = 3,
+    fanout: Optional[int] = None,
+    mode: SearchMode = SearchMode.hybrid,
+):
+    """
+    Búsqueda de páginas en todo el corpus. Solo se comparan las páginas de
+    los `fanout` documentos más cercanos (SEARCH_FANOUT por defecto).
+    """
+    model, query_embedding = None, None
+    if mode != SearchMode.lexical:
+        model, embeddings = await query_embeddings([user_query.content])
+        query_embedding = embeddings[0]
+
+    pages = await retrieve_pages(
+        user_query.content,
+        query_embedding,
+        limit,
+        fanout,
+        lexical=mode != SearchMode.vector,
+        scope=visible_document_ids(current_user.id),
+        model=model,
+    )
+    return ORJSONModelResponse(pages)
 
-    pages_with_similarity = [page for page in pages_with_similarity if page]
-    pages_with_similarity.sort(key=lambda page: page.similarity, reverse=True)
 
-    return pages_with_similarity[:limit]
+@router.post(
+    "/{document_id}/search",
+    response_model=list[PageWithSimilarity],
+    response_class=ORJSONModelResponse,
+)
+async def get_document_response(
+    document_id: int,
+    user_query: UserQuery,
+    current_user: UserWithToken,
+    limit: int = 3,
+    mode: SearchMode = SearchMode.hybrid,
+):
+    document = await get_document_or_404(document_id, visible_document_ids(current_user.id))
+    results = await search_pages(document.id, [user_query.content], limit, mode)  # type: ignore
+    return ORJSONModelResponse(results[0])
+
+
+@router.post(
+    "/{document_id}/search/batch",
+    response_model=list[BatchPageResult],
+    response_class=ORJSONModelResponse,
+)
+async def get_document_response_batch(
+    document_id: int,
+    batch_query: BatchQuery,
+    current_user: UserWithToken,
+    limit: int = 3,
+    mode: SearchMode = SearchMode.hybrid,
+):
+    document = await get_document_or_404(document_id, visible_document_ids(current_user.id))
+    results = await search_pages(document.id, batch_query.queries, limit, mode)  # type: ignore
+    return ORJSONModelResponse(
+        [{"query": query, "pages": pages} for query, pages in zip(batch_query.queries, results)]
+    )
 
 
 @router.post("/{document_id}/page/{page_number}/search")
 async def get_page_response(
-    document_id: int, page_number: int, user_query: UserQuery
+    document_id: int, page_number: int, user_query: UserQuery, current_user: UserWithToken
 ) -> SearchResult:
+    await get_document_or_404(document_id, visible_document_ids(current_user.id))
     query = (
         page_table.select()
         .where(page_table.c.document_id == document_id)
@@ -240,23 +682,18 @@ async def get_page_response(
     if not page.content:  # type: ignore
         raise HTTPException(status_code=404, detail="Page is empty")
 
-    messages = [
-        {
-            "role": "system",
-            "content": f"El usuario te hará una consulta que debes responder con contenido LITERAL tomado del siguiente texto: {page.content}. Si la respuesta no aparece tu respuesta será: No Answer",  # type: ignore
-        },
-        {"role": "user", "content": user_query.content},  # type: ignore
-    ]
-    llm = Completions()
-    ans = await llm.submit_message(messages)
+    result = await answer_page_tiered(page.content, user_query.content)  # type: ignore
 
     query_data = {
         "query": user_query.content,
-        "answer": ans,
+        "answer": result.answer,
         "document_id": document_id,
         "page_number": page_number,
+        "tier": result.tier,
+        "tokens_in": result.tokens_in,
+        "tokens_out": result.tokens_out,
     }
-    query = query_table.insert().values(query_data)
+    query = query_table.insert().values(**query_data, user_id=current_user.id)
     await database.execute(query)
 
     return SearchResult(**query_data)
@@ -1,8 +1,9 @@
 from typing import Annotated, Optional
 
+import sqlalchemy
 from fastapi import APIRouter, Depends, HTTPException, status
 
-from database import database, query_table
+from database import database, query_table, visible_document_ids
 from models.query import DocumentQuery
 from models.user import UserOut
 from security import get_current_user
@@ -11,9 +12,25 @@ router = APIRouter()
 UserWithToken = Annotated[UserOut, Depends(get_current_user)]
 
 
+def user_querys(user_id: int):
+    """
+    Consultas del usuario y las anteriores a la propiedad (sin usuario) sobre
+    documentos que puede ver, como los documentos sin dueño
+    """
+    return query_table.select().where(
+        sqlalchemy.or_(
+            query_table.c.user_id == user_id,
+            sqlalchemy.and_(
+                query_table.c.user_id.is_(None),
+                query_table.c.document_id.in_(visible_document_ids(user_id)),
+            ),
+        )
+    )
+
+
 @router.get("/", response_model=list[DocumentQuery])
 async def get_querys(current_user: UserWithToken, limit: Optional[int] = None):
-    query = query_table.select()
+    query = user_querys(current_user.id)
     querys = await database.fetch_all(query)
 
     if not querys:
@@ -29,7 +46,7 @@ async def get_querys(current_user: UserWithToken, limit: Optional[int] = None):
 
 @router.get("/{document_id}", response_model=list[DocumentQuery])
 async def get_query_by_document(document_id: int, current_user: UserWithToken, limit: Optional[int] = None):
-    query = query_table.select().where(query_table.c.document_id == document_id)
+    query = user_querys(current_user.id).where(query_table.c.document_id == document_id)
     querys = await database.fetch_all(query)
 
     if not querys:
@@ -1,6 +1,6 @@
 from config import logger
 from database import database, user_table
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, status
+from fastapi import APIRouter, HTTPException, Request, status
 from models.user import UserIn
 from notifications import send_confirmation_email
 from security import (
@@ -16,7 +16,7 @@ router = APIRouter()
 
 
 @router.post("/register")
-async def register(user: UserIn, request: Request, background_tasks: BackgroundTasks):
+async def register(user: UserIn, request: Request):
     logger.info("register")
 
     if await get_user(user.email):
@@ -36,7 +36,7 @@ async def register(user: UserIn, request: Request, background_tasks: BackgroundT
     token = create_confirmation_token(user.email)
     url = request.url_for("confirm_email", token=token)
     logger.debug(url)
-    background_tasks.add_task(send_confirmation_email, user.email, url)
+    await send_confirmation_email(user.email, str(url))  # al outbox, se envía en segundo plano
 
     return {"detail": "User created. Please confirm your email"}
 
@@ -3,7 +3,8 @@ import asyncio
 from config import config
 from database import database, user_table
 from models.document import UserQuery
-from routers.document import get_relevant_documents
+from routers.document import search_documents
+from search import SearchMode
 from utils import get_embedding
 
 if __name__ == "__main__":
@@ -11,7 +12,7 @@ if __name__ == "__main__":
     async def main():
         await database.connect()
         user_query = UserQuery(content="Quien es Blancanieves?")
-        documents = await get_relevant_documents(user_query)
+        documents = (await search_documents([user_query.content], 3, SearchMode.hybrid))[0]
         for doc in documents:
             print(doc.name)  # type: ignore
 
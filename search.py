@@ -0,0 +1,695 @@
+import asyncio
+import hashlib
+import heapq
+import math
+from collections import Counter, OrderedDict, defaultdict
+from enum import Enum
+from typing import TYPE_CHECKING, Hashable, Iterable, Optional
+
+import sqlalchemy
+
+from config import config, logger
+from database import (
+    centroid_table,
+    corpus_version,
+    database,
+    document_table,
+    live_document_ids,
+    page_table,
+    posting_table,
+)
+from metrics import SEARCH_CACHE_REQUESTS
+from preprocessing import tokenize
+from quantization import code_scores, quantize, top_candidates
+from utils import invalidate_embedding_profile
+
+# numpy se importa al usarlo: solo lo necesitan los vectores, no el arranque
+if TYPE_CHECKING:
+    import numpy
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+
+class SearchMode(Enum):
+    hybrid = "hybrid"
+    vector = "vector"
+    lexical = "lexical"
+
+
+def lexical_terms(text: str) -> Counter:
+    """Frecuencia de cada término del texto, tal como se guarda en postings"""
+    return Counter(tokenize(text, fold=True))
+
+
+def page_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def page_changes(stored: Iterable, new_pages: dict[int, str]) -> tuple[list, list, list]:
+    """
+    Compara por hash las páginas guardadas (id, page_number, content_hash y,
+    si no tienen hash, content) con las nuevas {page_number: content}.
+    Devuelve las que solo se desplazan [(id, page_number)], las que hay que
+    embeber [(page_number, content)] y los ids de las que sobran.
+    """
+    by_hash: dict[str, list] = defaultdict(list)
+    for page in stored:
+        by_hash[page.content_hash or page_hash(page.content)].append(page)
+
+    moved, added = [], []
+    for page_number, content in new_pages.items():
+        same = by_hash.get(page_hash(content))
+        if same:
+            page = same.pop(0)
+            if page.page_number != page_number:
+                moved.append((page.id, page_number))
+        else:
+            added.append((page_number, content))
+    removed = [page.id for pages in by_hash.values() for page in pages]
+
+    return moved, added, removed
+
+
+def page_postings(page_id: int, document_id: int, terms: Counter) -> list[dict]:
+    return [
+        {
+            "term": term,
+            "frequency": frequency,
+            "page_id": page_id,
+            "document_id": document_id,
+        }
+        for term, frequency in terms.items()
+    ]
+
+
+async def index_page(page: dict) -> int:
+    """Inserta una página con sus postings y devuelve su id"""
+    terms = lexical_terms(page["content"])
+    page["length"] = sum(terms.values())
+    page["content_hash"] = page_hash(page["content"])
+    if page.get("embeddings") and config.VECTOR_QUANTIZATION != "none":
+        page["codes"] = quantize([page["embeddings"]], config.VECTOR_QUANTIZATION)[0]
+
+    query = page_table.insert().values(page)
+    page_id = await database.execute(query)
+
+    postings = page_postings(page_id, page["document_id"], terms)
+    if postings:
+        await database.execute_many(posting_table.insert(), postings)
+
+    return page_id
+
+
+def bm25_idf(total_pages: int, document_frequency: int) -> float:
+    return math.log(1 + (total_pages - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+async def batch_lexical_scores(
+    queries: list[str],
+    limit: int,
+    document_id: Optional[int] = None,
+    scope=live_document_ids,
+    per_document: bool = False,
+) -> list[dict]:
+    """
+    Por cada consulta, sus `limit` mejores páginas por BM25
+    {(document_id, page_number): score}, o documentos {document_id: score}
+    (su mejor página) con per_document. Las estadísticas y la frecuencia de
+    los términos se piden una vez para todo el lote, y la suma de todas las
+    consultas se hace en una sola consulta a la base de datos: solo llegan
+    los ganadores. No requiere embeddings. scope es la select de los
+    documentos visibles (database.visible_document_ids): postings y
+    estadísticas se filtran antes de puntuar.
+
+    Los términos que aparecen en más de LEXICAL_MAX_DF de las páginas apenas
+    distinguen y arrastrarían casi toda la tabla de postings: no puntúan,
+    salvo el más raro de una consulta hecha solo de términos así.
+    """
+    query_terms = [list(lexical_terms(text)) for text in queries]
+    terms = sorted({term for text_terms in query_terms for term in text_terms})
+    if not terms or limit <= 0:
+        return [{} for _ in queries]
+
+    pages = [page_table.c.length.is_not(None), page_table.c.document_id.in_(scope)]
+    postings = [posting_table.c.document_id.in_(scope)]
+    if document_id is not None:
+        pages.append(page_table.c.document_id == document_id)
+        postings.append(posting_table.c.document_id == document_id)
+
+    stats_query = sqlalchemy.select(
+        sqlalchemy.func.count(page_table.c.id), sqlalchemy.func.avg(page_table.c.length)
+    ).where(*pages)
+    frequency_query = (
+        sqlalchemy.select(posting_table.c.term, sqlalchemy.func.count().label("frequency"))
+        .where(posting_table.c.term.in_(terms), *postings)
+        .group_by(posting_table.c.term)
+    )
+    stats, frequencies = await asyncio.gather(
+        database.fetch_one(stats_query), database.fetch_all(frequency_query)
+    )
+    total_pages, avg_length = stats[0] or 1, float(stats[1] or 1)  # type: ignore
+    document_frequency = {row.term: row.frequency for row in frequencies}  # type: ignore
+
+    weights = [
+        (index, term, bm25_idf(total_pages, frequency))
+        for index, text_terms in enumerate(query_terms)
+        for term, frequency in selective_terms(
+            {term: document_frequency[term] for term in text_terms if term in document_frequency},
+            total_pages,
+        ).items()
+    ]
+    results: list[dict] = [{} for _ in queries]
+    if not weights:
+        return results
+
+    query = page_bm25_query(weights, avg_length, postings)
+    keys = [query.selected_columns.document_id, query.selected_columns.page_number]
+    if per_document:
+        query = query.subquery()
+        query = sqlalchemy.select(
+            query.c.query, query.c.document_id, sqlalchemy.func.max(query.c.score).label("score")
+        ).group_by(query.c.query, query.c.document_id)
+        keys = [query.selected_columns.document_id]
+
+    rank = sqlalchemy.func.row_number().over(
+        partition_by=query.selected_columns.query,
+        order_by=[query.selected_columns.score.desc(), *keys],
+    )
+    query = query.add_columns(rank.label("rank")).subquery()
+    query = (
+        sqlalchemy.select(query)
+        .where(query.c.rank <= limit)
+        .order_by(query.c.query, query.c.rank)
+    )
+    for row in await database.fetch_all(query):
+        results[row.query][row_key(row, len(keys), start=1)] = row.score  # type: ignore
+
+    return results
+
+
+async def lexical_page_scores(
+    query_text: str, limit: int, document_id: Optional[int] = None, scope=live_document_ids
+) -> dict[tuple[int, int], float]:
+    """batch_lexical_scores de una sola consulta"""
+    return (await batch_lexical_scores([query_text], limit, document_id, scope))[0]
+
+
+async def lexical_document_scores(
+    queries: list[str], limit: int, scope=live_document_ids
+) -> list[dict[int, float]]:
+    """Un documento puntúa como su mejor página"""
+    return await batch_lexical_scores(queries, limit, scope=scope, per_document=True)
+
+
+def selective_terms(frequencies: dict[str, int], total_pages: int) -> dict[str, int]:
+    """Términos de una consulta que puntúan (ver batch_lexical_scores) con su frecuencia"""
+    if not frequencies or not config.LEXICAL_MAX_DF:
+        return frequencies
+
+    limit = config.LEXICAL_MAX_DF * total_pages
+    selective = {term: df for term, df in frequencies.items() if df <= limit}
+    if not selective:
+        rarest = min(frequencies, key=lambda term: (frequencies[term], term))
+        selective = {rarest: frequencies[rarest]}
+
+    return selective
+
+
+def page_bm25_query(weights: list[tuple[int, str, float]], avg_length: float, conditions: list):
+    """
+    select de (query, document_id, page_number, score) con la suma BM25 de
+    cada página para cada consulta; weights son las tuplas (consulta, término, idf)
+    """
+    query_terms = (
+        sqlalchemy.func.unnest(
+            sqlalchemy.cast([row[0] for row in weights], sqlalchemy.ARRAY(sqlalchemy.Integer)),
+            sqlalchemy.cast([row[1] for row in weights], sqlalchemy.ARRAY(sqlalchemy.String)),
+            sqlalchemy.cast([row[2] for row in weights], sqlalchemy.ARRAY(sqlalchemy.Float)),
+        )
+        .table_valued("query", "term", "idf")
+        .render_derived(name="query_terms")
+    )
+    frequency = sqlalchemy.cast(posting_table.c.frequency, sqlalchemy.Float)
+    length = sqlalchemy.cast(sqlalchemy.func.coalesce(page_table.c.length, 0), sqlalchemy.Float)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+    score = sqlalchemy.func.sum(
+        query_terms.c.idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+    )
+
+    return (
+        sqlalchemy.select(
+            query_terms.c.query,
+            page_table.c.document_id,
+            page_table.c.page_number,
+            score.label("score"),
+        )
+        .select_from(
+            query_terms.join(posting_table, posting_table.c.term == query_terms.c.term).join(
+                page_table, page_table.c.id == posting_table.c.page_id
+            )
+        )
+        .where(*conditions)
+        .group_by(query_terms.c.query, page_table.c.document_id, page_table.c.page_number)
+    )
+
+
+def cosine_matrix(query_embeddings: list, embeddings: list) -> "numpy.ndarray":
+    """Coseno de cada consulta (filas) contra cada embedding (columnas)"""
+    import numpy
+
+    queries = numpy.asarray(query_embeddings, dtype=numpy.float32)
+    matrix = numpy.asarray(embeddings, dtype=numpy.float32)
+
+    query_norms = numpy.linalg.norm(queries, axis=1, keepdims=True)
+    norms = numpy.linalg.norm(matrix, axis=1)
+    query_norms[query_norms == 0] = 1.0
+    norms[norms == 0] = 1.0
+
+    return (queries / query_norms) @ (matrix / norms[:, None]).T
+
+
+def top_k(scores: "numpy.ndarray", count: int) -> "numpy.ndarray":
+    """Índices de los `count` mayores de un vector de scores, de mayor a menor"""
+    import numpy
+
+    if count <= 0 or count >= len(scores):
+        return numpy.argsort(-scores, kind="stable")
+
+    best = numpy.argpartition(-scores, count - 1)[:count]
+    return best[numpy.argsort(-scores[best], kind="stable")]
+
+
+def top_scores(keys: list, scores: "numpy.ndarray", count: int) -> list[dict]:
+    """
+    Por cada consulta (fila) {clave: coseno} de sus `count` mejores claves
+    (todas con count=0). La selección se hace sobre el array: solo los
+    ganadores llegan a convertirse en objetos de Python.
+    """
+    return [{keys[index]: float(row[index]) for index in top_k(row, count)} for row in scores]
+
+
+def row_key(row, width: int, start: int = 0):
+    if width == 1:
+        return row[start]
+    return tuple(row[index] for index in range(start, start + width))
+
+
+async def vector_scores(
+    table,
+    key_columns: list,
+    query_embeddings: list,
+    *conditions,
+    candidates: int = 0,
+    model: Optional[str] = None,
+) -> tuple[list, "numpy.ndarray"]:
+    """
+    Coseno de cada consulta (filas) contra los vectores de `table` que cumplen
+    `conditions`, junto con la clave de cada columna (key_columns). Con model
+    (la embeddings.vector_key de las consultas) solo cuentan los vectores con
+    esa clave: los de otro proveedor o con otras dimensiones nunca se comparan.
+
+    Con VECTOR_QUANTIZATION y candidates > 0 el escaneo lee solo los códigos
+    cuantizados, y los candidates * RESCORE_FACTOR mejores de cada consulta
+    se vuelven a puntuar con el vector completo; el resto no se devuelve.
+    """
+    import numpy
+
+    mode = config.VECTOR_QUANTIZATION
+    width = len(key_columns)
+    if model is not None:
+        conditions = (*conditions, table.c.embedding_model == model)
+
+    if mode == "none" or not candidates:
+        query = sqlalchemy.select(*key_columns, table.c.embeddings).where(
+            table.c.embeddings.is_not(None), *conditions
+        )
+        rows = await database.fetch_all(query)
+        if not rows:
+            return [], numpy.zeros((len(query_embeddings), 0), dtype=numpy.float32)
+
+        keys = [row_key(row, width) for row in rows]
+        return keys, cosine_matrix(query_embeddings, [row[width] for row in rows])
+
+    query = sqlalchemy.select(table.c.id, table.c.codes, *key_columns).where(
+        table.c.codes.is_not(None), *conditions
+    )
+    rows = await database.fetch_all(query)
+    if not rows:
+        return [], numpy.zeros((len(query_embeddings), 0), dtype=numpy.float32)
+
+    approximate = code_scores(query_embeddings, [row[1] for row in rows], mode)
+    shortlist = [rows[index] for index in top_candidates(approximate, candidates * config.RESCORE_FACTOR)]
+
+    query = sqlalchemy.select(table.c.id, table.c.embeddings).where(
+        table.c.id.in_([row[0] for row in shortlist])
+    )
+    embeddings = {row[0]: row[1] for row in await database.fetch_all(query)}
+    shortlist = [row for row in shortlist if embeddings.get(row[0])]
+
+    keys = [row_key(row, width, start=2) for row in shortlist]
+    return keys, cosine_matrix(query_embeddings, [embeddings[row[0]] for row in shortlist])
+
+
+async def retrieve_pages(
+    query_text: str,
+    query_embedding: Optional[list[float]],
+    limit: int,
+    fanout: Optional[int] = None,
+    lexical: bool = True,
+    scope=live_document_ids,
+    model: Optional[str] = None,
+) -> list[dict]:
+    """
+    Mejores páginas de todo el corpus fusionando coseno y BM25, de grueso a
+    fino: primero se preseleccionan los `fanout` documentos más cercanos
+    (vectores de documento + BM25) y solo se comparan los vectores de sus
+    páginas. fanout=0 recorre todas las páginas. Sin query_embedding solo se
+    usa BM25, y con lexical=False solo los vectores. Solo se puntúan los
+    documentos de scope y los vectores de model.
+    """
+    similarities: dict[tuple[int, int], float] = {}
+    if fanout is None:
+        fanout = config.SEARCH_FANOUT
+
+    # las páginas léxicas también preseleccionan documentos: tantas como la fusión de ambos
+    lexical_limit = max(limit, fanout) * config.RESCORE_FACTOR if lexical else 0
+    lexical_task = asyncio.ensure_future(
+        lexical_page_scores(query_text, lexical_limit, scope=scope)
+    )
+    try:
+        if query_embedding is not None:
+            conditions = [page_table.c.document_id.in_(scope)]
+
+            if fanout > 0:
+                document_scores = (
+                    await document_similarities([query_embedding], fanout, scope, model)
+                )[0]
+                lexical_documents: dict[int, float] = {}
+                for (document_id, _), score in (await lexical_task).items():
+                    best = lexical_documents.get(document_id, 0.0)
+                    lexical_documents[document_id] = max(score, best)
+
+                shortlist = ranking(
+                    reciprocal_rank_fusion(ranking(document_scores), ranking(lexical_documents)),
+                    fanout,
+                )
+                conditions.append(page_table.c.document_id.in_(shortlist))
+
+            keys, scores = await vector_scores(
+                page_table,
+                [page_table.c.document_id, page_table.c.page_number],
+                [query_embedding],
+                *conditions,
+                candidates=limit,
+                model=model,
+            )
+            similarities = top_scores(keys, scores, limit * config.RESCORE_FACTOR)[0]
+
+        lexical_scores = await lexical_task
+    except BaseException:
+        lexical_task.cancel()  # sin esperar a una búsqueda que ya nadie va a usar
+        raise
+
+    fused = reciprocal_rank_fusion(ranking(similarities), ranking(lexical_scores))
+
+    return [
+        {
+            "document_id": key[0],
+            "page_number": key[1],
+            "similarity": similarities.get(key, 0.0),
+            "score": fused[key],
+        }
+        for key in ranking(fused, limit)
+    ]
+
+
+def document_centroids(
+    embeddings: list, weights: list[float], clusters: int = 1
+) -> list[list[float]]:
+    """
+    Vectores de un documento calculados a partir de sus páginas, sin llamar a
+    la API. El primero es la media ponderada por longitud de página; con
+    clusters > 1 siguen los centroides de un k-means esférico, para que un
+    documento con varios temas se encuentre por cualquiera de ellos.
+    """
+    import numpy
+
+    matrix = numpy.asarray(embeddings, dtype=numpy.float32)
+    norms = numpy.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+    page_weights = numpy.maximum(numpy.asarray(weights, dtype=numpy.float32), 1.0)
+
+    def centroid(rows: numpy.ndarray, row_weights: numpy.ndarray) -> numpy.ndarray:
+        vector = row_weights @ rows
+        return vector / (numpy.linalg.norm(vector) or 1.0)
+
+    mean = centroid(matrix, page_weights)
+    if clusters <= 1 or len(matrix) <= clusters:
+        return [mean.tolist()]
+
+    # Inicialización determinista: la página más central y luego las más alejadas
+    chosen = [int(numpy.argmax(matrix @ mean))]
+    while len(chosen) < clusters:
+        closest = (matrix @ matrix[chosen].T).max(axis=1)
+        chosen.append(int(numpy.argmin(closest)))
+    centers = matrix[chosen]
+
+    for _ in range(10):
+        assignment = numpy.argmax(matrix @ centers.T, axis=1)
+        updated = numpy.stack(
+            [
+                centroid(matrix[assignment == k], page_weights[assignment == k])
+                if (assignment == k).any()
+                else centers[k]
+                for k in range(clusters)
+            ]
+        )
+        if numpy.allclose(updated, centers):
+            break
+        centers = updated
+
+    return [mean.tolist(), *centers.tolist()]
+
+
+def document_vectors(pages: list) -> tuple[list, list, Optional[str]]:
+    """
+    Vector del documento y centroides extra (document_centroids), sus códigos
+    cuantizados y el modelo, a partir de sus páginas
+    """
+    pages = [page for page in pages if page["embeddings"]]
+    centroids = (
+        document_centroids(
+            [page["embeddings"] for page in pages],
+            [page["length"] or len(page["content"]) for page in pages],
+            config.DOCUMENT_CENTROIDS,
+        )
+        if pages
+        else [None]
+    )
+    codes = (
+        quantize(centroids, config.VECTOR_QUANTIZATION)
+        if pages and config.VECTOR_QUANTIZATION != "none"
+        else [None] * len(centroids)
+    )
+    return centroids, codes, pages[0]["embedding_model"] if pages else None
+
+
+async def update_document_vectors(document_id: int, pages: list) -> None:
+    """Recalcula el vector del documento y sus centroides desde sus páginas"""
+    centroids, codes, model = document_vectors(pages)
+
+    async with database.transaction():
+        query = (
+            document_table.update()
+            .where(document_table.c.id == document_id)
+            .values(embeddings=centroids[0], codes=codes[0], embedding_model=model)
+        )
+        await database.execute(query)
+        await database.execute(
+            centroid_table.delete().where(centroid_table.c.document_id == document_id)
+        )
+        if len(centroids) > 1:
+            await database.execute_many(
+                centroid_table.insert(),
+                [
+                    {
+                        "document_id": document_id,
+                        "embeddings": vector,
+                        "codes": code,
+                        "embedding_model": model,
+                    }
+                    for vector, code in zip(centroids[1:], codes[1:])
+                ],
+            )
+
+
+async def document_similarities(
+    query_embeddings: list,
+    candidates: int = 0,
+    scope=live_document_ids,
+    model: Optional[str] = None,
+) -> list[dict[int, float]]:
+    """
+    Coseno de cada consulta contra cada documento; con centroides extra un
+    documento puntúa como el más cercano de sus vectores. Con candidates > 0
+    solo se devuelven los candidates * RESCORE_FACTOR mejores de cada consulta.
+    """
+    import numpy
+
+    (document_keys, document_scores), (centroid_keys, centroid_scores) = await asyncio.gather(
+        vector_scores(
+            document_table,
+            [document_table.c.id],
+            query_embeddings,
+            document_table.c.id.in_(scope),
+            candidates=candidates,
+            model=model,
+        ),
+        vector_scores(
+            centroid_table,
+            [centroid_table.c.document_id],
+            query_embeddings,
+            centroid_table.c.document_id.in_(scope),
+            candidates=candidates,
+            model=model,
+        ),
+    )
+    if not document_keys and not centroid_keys:
+        return [{} for _ in query_embeddings]
+
+    ids = numpy.asarray([*document_keys, *centroid_keys])
+    order = numpy.argsort(ids, kind="stable")
+    document_ids, starts = numpy.unique(ids[order], return_index=True)
+
+    scores = numpy.hstack([document_scores, centroid_scores])[:, order]
+    best = numpy.maximum.reduceat(scores, starts, axis=1)
+
+    return top_scores(document_ids.tolist(), best, candidates * config.RESCORE_FACTOR)
+
+
+def ranking(scores: dict, limit: Optional[int] = None) -> list:
+    """Claves de mayor a menor score; con limit solo las `limit` primeras"""
+    if limit is not None:
+        return heapq.nlargest(limit, scores, key=scores.__getitem__)
+    return sorted(scores, key=scores.__getitem__, reverse=True)
+
+
+def reciprocal_rank_fusion(*rankings: Iterable[Hashable]) -> dict:
+    """Fusiona varias listas ordenadas: score = sum(1 / (k + rank))"""
+    fused: dict = defaultdict(float)
+    for items in rankings:
+        for rank, key in enumerate(items, start=1):
+            fused[key] += 1.0 / (RRF_K + rank)
+
+    return fused
+
+
+async def current_corpus_version() -> int:
+    # Una secuencia recién creada ya dice last_value=1 antes del primer nextval
+    query = sqlalchemy.text(
+        "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM corpus_version"
+    )
+    return await database.fetch_val(query)  # type: ignore
+
+
+async def bump_corpus_version() -> int:
+    invalidate_embedding_profile()  # el corpus cambió, quizá también el índice activo
+    return await database.fetch_val(sqlalchemy.select(corpus_version.next_value()))  # type: ignore
+
+
+class ResultCache:
+    """
+    LRU de resultados de búsqueda por (consulta normalizada, parámetros).
+    Todas las entradas pertenecen a una versión del corpus: al ver una
+    versión nueva se vacía entera. Una petición que leyó una versión anterior
+    no la usa ni la vuelve a llenar.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.version: Optional[int] = None
+        self._entries: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def key(query_text: str, *params) -> tuple:
+        return (" ".join(query_text.lower().split()), *params)
+
+    def get(self, key: tuple, version: int):
+        if self.version is None or version > self.version:
+            self._entries.clear()
+            self.version = version
+
+        value = self._entries.get(key) if version == self.version else None
+        if value is None:
+            SEARCH_CACHE_REQUESTS.inc(result="miss")
+            return None
+
+        self._entries.move_to_end(key)
+        SEARCH_CACHE_REQUESTS.inc(result="hit")
+        return value
+
+    def put(self, key: tuple, version: int, value) -> None:
+        if version != self.version or not self.maxsize:
+            return  # el corpus cambió mientras se calculaba
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    async def index_existing_pages():
+        """Construye las postings de las páginas subidas antes del índice léxico"""
+        query = page_table.select().where(page_table.c.length.is_(None))
+        pages = await database.fetch_all(query)
+
+        for page in pages:
+            terms = lexical_terms(page.content)  # type: ignore
+            postings = page_postings(page.id, page.document_id, terms)  # type: ignore
+            if postings:
+                await database.execute_many(posting_table.insert(), postings)
+
+            update_query = (
+                page_table.update()
+                .where(page_table.c.id == page.id)  # type: ignore
+                .values(length=sum(terms.values()))
+            )
+            await database.execute(update_query)
+
+        logger.info(f"{len(pages)} pages indexed")
+
+    async def compute_document_vectors():
+        """Sustituye el embedding de los primeros 2000 caracteres por el centroide de las páginas"""
+        documents = await database.fetch_all(sqlalchemy.select(document_table.c.id))
+        for document in documents:
+            query = sqlalchemy.select(
+                page_table.c.content,
+                page_table.c.embeddings,
+                page_table.c.embedding_model,
+                page_table.c.length,
+            ).where(page_table.c.document_id == document.id)  # type: ignore
+            pages = await database.fetch_all(query)
+            await update_document_vectors(document.id, pages)  # type: ignore
+
+        logger.info(f"{len(documents)} document vectors computed")
+
+    async def main(steps: list[str]):
+        await database.connect()
+        if "postings" in steps:
+            await index_existing_pages()
+        if "centroids" in steps:
+            await compute_document_vectors()
+        await database.disconnect()
+
+    parser = argparse.ArgumentParser(description="Backfill de los índices de búsqueda")
+    parser.add_argument(
+        "--only", choices=["postings", "centroids"], help="por defecto ambos pasos"
+    )
+    only = parser.parse_args().only
+    asyncio.run(main([only] if only else ["postings", "centroids"]))
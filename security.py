@@ -54,6 +54,11 @@ async def get_user(email: str) -> Record | None:
     return user if user else None
 
 
+def is_admin(user) -> bool:
+    """El usuario de ADMIN_EMAIL administra los documentos sin dueño"""
+    return bool(config.ADMIN_EMAIL) and user.email.lower() == config.ADMIN_EMAIL.lower()  # type: ignore
+
+
 async def authenticate_user(email: str, password: str):
     user = await get_user(email)
 
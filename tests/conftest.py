@@ -0,0 +1,40 @@
+"""
+Los tests importan los módulos de la raíz con ENV_STATE=dev. Los que usan
+Postgres (fixture db) se saltan si no hay TEST_DATABASE_URL; vacían tablas,
+así que no debe apuntar a una base con datos.
+
+    TEST_DATABASE_URL=postgresql://localhost/documind_test pytest tests
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["ENV_STATE"] = "dev"
+os.environ["DEV_DATABASE_URL"] = os.environ.get(
+    "TEST_DATABASE_URL", "postgresql://localhost/documind_test"
+)
+os.environ.setdefault("DEV_EMAIL", "documind@example.com")
+os.environ.setdefault("DEV_LOG_QUEUE", "false")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    if not os.environ.get("TEST_DATABASE_URL"):
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    from database import create_schema, database
+
+    create_schema()
+    await database.connect()
+    yield database
+    await database.disconnect()
@@ -0,0 +1,65 @@
+import numpy
+import pytest
+
+from config import config
+from search import document_centroids, document_vectors
+
+
+def unit(*values):
+    vector = numpy.asarray(values, dtype=numpy.float32)
+    return (vector / numpy.linalg.norm(vector)).tolist()
+
+
+def test_mean_is_weighted_by_page_length():
+    centroids = document_centroids([[1.0, 0.0], [0.0, 1.0]], [300, 100])
+
+    assert len(centroids) == 1
+    assert centroids[0] == pytest.approx(unit(3, 1), abs=1e-6)
+
+
+def test_pages_are_normalized_before_averaging():
+    centroids = document_centroids([[10.0, 0.0], [0.0, 1.0]], [1, 1])
+
+    assert centroids[0] == pytest.approx(unit(1, 1), abs=1e-6)
+
+
+def test_clusters_find_each_topic():
+    topic_a = [unit(1, 0.1, 0), unit(1, -0.1, 0), unit(1, 0, 0.1)]
+    topic_b = [unit(0, 0.1, 1), unit(0, -0.1, 1)]
+    centroids = document_centroids(topic_a + topic_b, [100] * 5, clusters=2)
+
+    mean, *centers = centroids
+    assert len(centers) == 2
+    assert all(numpy.linalg.norm(vector) == pytest.approx(1.0) for vector in centroids)
+    best = sorted(max(numpy.dot(center, page) for center in centers) for page in topic_a + topic_b)
+    # cada página queda cerca de algún centroide, aunque la media no se parezca a ninguna
+    assert best[0] > 0.98
+    assert min(numpy.dot(mean, page) for page in topic_b) < 0.9
+
+
+def test_fewer_pages_than_clusters_keeps_only_the_mean():
+    assert len(document_centroids([unit(1, 0), unit(0, 1)], [1, 1], clusters=4)) == 1
+
+
+def test_document_vectors_skips_pages_without_embeddings(monkeypatch):
+    monkeypatch.setattr(config, "DOCUMENT_CENTROIDS", 1)
+    monkeypatch.setattr(config, "VECTOR_QUANTIZATION", "int8")
+    pages = [
+        {"content": "a", "embeddings": [1.0, 0.0], "embedding_model": "m@2", "length": 10},
+        {"content": "b", "embeddings": None, "embedding_model": None, "length": 10},
+    ]
+
+    centroids, codes, model = document_vectors(pages)
+    assert centroids == [pytest.approx([1.0, 0.0])]
+    assert len(codes) == 1 and len(codes[0]) == 2
+    assert model == "m@2"
+
+
+def test_document_vectors_without_embeddings(monkeypatch):
+    monkeypatch.setattr(config, "VECTOR_QUANTIZATION", "int8")
+
+    assert document_vectors([{"content": "a", "embeddings": None, "length": 1}]) == (
+        [None],
+        [None],
+        None,
+    )
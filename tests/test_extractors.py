@@ -0,0 +1,71 @@
+import asyncio
+import shutil
+
+import pytest
+
+import extractors
+from config import config
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    path = tmp_path / "cache"
+    monkeypatch.setattr(config, "EXTRACTION_CACHE_PATH", str(path))
+    return path
+
+
+async def test_extraction_is_cached_and_dropped(tmp_path, cache):
+    document = tmp_path / "manual.txt"
+    document.write_text("Primer párrafo.\n\nSegundo párrafo.")
+
+    assert await extractors.extract_pages("text/plain", document) == [
+        "Primer párrafo.",
+        "Segundo párrafo.",
+    ]
+    [entry] = cache.iterdir()
+    entry.write_text('["desde la caché"]')
+    assert await extractors.extract_pages("text/plain", document) == ["desde la caché"]
+
+    assert await extractors.drop_extraction_cache(document) == 1
+    assert list(cache.iterdir()) == []
+    assert await extractors.drop_extraction_cache(document) == 0
+
+
+async def test_corrupt_cache_is_a_miss(tmp_path, cache):
+    document = tmp_path / "manual.txt"
+    document.write_text("Texto.")
+    await extractors.extract_pages("text/plain", document)
+    [entry] = cache.iterdir()
+    entry.write_text('["a medias')
+
+    assert await extractors.extract_pages("text/plain", document) == ["Texto."]
+
+
+@pytest.mark.skipif(not shutil.which("sleep"), reason="needs the sleep command")
+async def test_converter_is_killed_on_timeout(monkeypatch):
+    monkeypatch.setattr(config, "EXTRACTION_TIMEOUT", 0.1)
+
+    with pytest.raises(extractors.ExtractionError, match="timed out"):
+        await extractors.run_converter("sleep", "30")
+
+
+@pytest.mark.skipif(not shutil.which("sleep"), reason="needs the sleep command")
+async def test_cancelled_converter_is_killed(monkeypatch):
+    processes = []
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def spawn(*args, **kwargs):
+        processes.append(await create_subprocess_exec(*args, **kwargs))
+        return processes[-1]
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", spawn)
+    task = asyncio.create_task(extractors.run_converter("sleep", "30"))
+    while not processes:
+        await asyncio.sleep(0.01)
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert processes[0].returncode is not None
@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+
+import logging_conf
+from logging_conf import SamplingFilter
+
+
+def record(name: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, "message", None, None)
+
+
+@pytest.fixture
+def roll(monkeypatch):
+    """random.random() del filtro devuelve el valor que se fije"""
+    value = [0.5]
+    monkeypatch.setattr(logging_conf.random, "random", lambda: value[0])
+    return value
+
+
+def test_without_rates_everything_passes():
+    assert SamplingFilter().filter(record("app.llm"))
+
+
+def test_sampled_logger_and_its_children(roll):
+    sampling = SamplingFilter({"app.llm": 0.1})
+
+    roll[0] = 0.05
+    assert sampling.filter(record("app.llm"))
+    roll[0] = 0.5
+    assert not sampling.filter(record("app.llm"))
+    assert not sampling.filter(record("app.llm.tools"))
+    # mismo prefijo, otro logger
+    assert sampling.filter(record("app.llmx"))
+    assert sampling.filter(record("app"))
+
+
+def test_warnings_are_never_sampled(roll):
+    sampling = SamplingFilter({"app": 0.0})
+
+    assert not sampling.filter(record("app.ingest"))
+    assert sampling.filter(record("app.ingest", logging.WARNING))
+    assert sampling.filter(record("app.ingest", logging.ERROR))
+
+
+def test_most_specific_rate_wins(roll):
+    sampling = SamplingFilter({"app": 0.0, "app.llm": 1.0})
+
+    assert sampling.filter(record("app.llm.tools"))
+    assert not sampling.filter(record("app.search"))
@@ -0,0 +1,44 @@
+from metrics import REGISTRY, Counter, Histogram, route_template
+
+
+def scope(path: str, **path_params):
+    return {"route": object(), "path": path, "path_params": path_params}
+
+
+def test_route_template_replaces_path_params():
+    assert route_template(scope("/documents/12/search", document_id=12)) == (
+        "/documents/{document_id}/search"
+    )
+    assert route_template(scope("/documents/3/page/3/search", document_id=3, page_number=3)) == (
+        "/documents/{document_id}/page/{page_number}/search"
+    )
+
+
+def test_route_template_without_params():
+    assert route_template(scope("/documents/search")) == "/documents/search"
+
+
+def test_unmatched_routes_share_one_label():
+    assert route_template({"path": "/wp-login.php", "path_params": {}}) == "unmatched"
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_latency_seconds", "Test", ("route",), buckets=(0.1, 1.0))
+    REGISTRY.remove(histogram)
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, route="/a")
+
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{route="/a",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{route="/a"} 4' in lines
+
+
+def test_counter_family_name_in_openmetrics():
+    counter = Counter("test_events_total", "Test", ("result",))
+    REGISTRY.remove(counter)
+    counter.inc(result='a"b')
+
+    assert 'test_events_total{result="a\\"b"} 1' in counter.render()
+    assert "# TYPE test_events counter" in counter.render(openmetrics=True)
@@ -0,0 +1,167 @@
+import socket
+
+import aiosmtplib
+import pytest
+import sqlalchemy
+
+import notifications
+from benchmarks import fake_smtp
+from config import config
+from database import engine, outbox_table
+
+pytestmark = pytest.mark.anyio
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+async def outbox(db, monkeypatch):
+    await db.execute(outbox_table.delete())
+    monkeypatch.setattr(config, "OUTBOX_RATE_LIMIT", 1000.0)
+    monkeypatch.setattr(config, "OUTBOX_RETRY_DELAY", 30.0)
+    monkeypatch.setattr(config, "OUTBOX_MAX_ATTEMPTS", 5)
+    yield db
+    await db.execute(outbox_table.delete())
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    port = free_port()
+    controller, handler = fake_smtp.start(port)
+    monkeypatch.setattr(config, "EMAIL_HOST", "127.0.0.1")
+    monkeypatch.setattr(config, "EMAIL_PORT", port)
+    monkeypatch.setattr(config, "EMAIL_USE_TLS", False)
+    monkeypatch.setattr(config, "EMAIL_PASSWORD", None)
+    yield handler
+    controller.stop()
+
+
+async def fetch(db, message_id: int):
+    query = sqlalchemy.select(
+        outbox_table,
+        sqlalchemy.extract("epoch", outbox_table.c.next_attempt_at - sqlalchemy.func.now()).label(
+            "wait"
+        ),
+    ).where(outbox_table.c.id == message_id)
+    return await db.fetch_one(query)
+
+
+async def expire(db, message_id: int) -> None:
+    """Como si hubiera pasado la espera (o el plazo del reclamo)"""
+    query = (
+        outbox_table.update()
+        .where(outbox_table.c.id == message_id)
+        .values(next_attempt_at=sqlalchemy.func.now() - sqlalchemy.text("interval '1 second'"))
+    )
+    await db.execute(query)
+
+
+async def test_claim_skips_locked_messages(outbox):
+    ids = [
+        await notifications.enqueue_email(f"user{n}@example.com", "Hi", "Body") for n in range(3)
+    ]
+
+    # otro worker tiene el primero bloqueado en su transacción
+    with engine.connect() as conn:
+        conn.execute(
+            sqlalchemy.select(outbox_table.c.id)
+            .where(outbox_table.c.id == ids[0])
+            .with_for_update()
+        )
+        claimed = await notifications.claim_messages(10)
+        conn.rollback()
+
+    assert [message.id for message in claimed] == ids[1:]
+    assert all(message.attempts == 1 for message in claimed)
+    # los reclamados no se vuelven a reclamar mientras dura el plazo
+    assert [message.id for message in await notifications.claim_messages(10)] == ids[:1]
+
+
+async def test_expired_lease_is_reclaimed(outbox):
+    message_id = await notifications.enqueue_email("user@example.com", "Hi", "Body")
+
+    [claimed] = await notifications.claim_messages(10)
+    row = await fetch(outbox, message_id)
+    assert row.wait > notifications.CLAIM_LEASE.total_seconds() - 60
+    assert await notifications.claim_messages(10) == []
+
+    # el worker cayó sin enviarlo: al vencer el plazo se reclama otra vez
+    await expire(outbox, message_id)
+    [reclaimed] = await notifications.claim_messages(10)
+    assert reclaimed.id == claimed.id
+    assert reclaimed.attempts == 2
+
+
+async def test_transient_failure_is_retried_with_backoff(outbox, smtp):
+    smtp.temporary_failures = 1.0
+    message_id = await notifications.enqueue_email("user@example.com", "Hi", "Body")
+
+    assert await notifications.drain_outbox() == 1
+    row = await fetch(outbox, message_id)
+    assert (row.status, row.attempts) == ("pending", 1)
+    assert "451" in row.last_error
+    assert 25 < row.wait <= 30
+
+    await expire(outbox, message_id)
+    await notifications.drain_outbox()
+    row = await fetch(outbox, message_id)
+    assert (row.status, row.attempts) == ("pending", 2)
+    assert 55 < row.wait <= 60
+
+    smtp.temporary_failures = 0.0
+    await expire(outbox, message_id)
+    await notifications.drain_outbox()
+    row = await fetch(outbox, message_id)
+    assert (row.status, row.attempts, row.last_error) == ("sent", 3, None)
+    assert len(smtp.messages) == 1
+
+
+async def test_transient_failure_fails_after_max_attempts(outbox, smtp, monkeypatch):
+    monkeypatch.setattr(config, "OUTBOX_MAX_ATTEMPTS", 1)
+    smtp.temporary_failures = 1.0
+    message_id = await notifications.enqueue_email("user@example.com", "Hi", "Body")
+
+    await notifications.drain_outbox()
+    row = await fetch(outbox, message_id)
+    assert (row.status, row.attempts) == ("failed", 1)
+
+
+async def test_permanent_failure_is_terminal(outbox, smtp):
+    smtp.permanent_failures = 1.0
+    message_id = await notifications.enqueue_email("user@example.com", "Hi", "Body")
+
+    assert await notifications.drain_outbox() == 1
+    row = await fetch(outbox, message_id)
+    assert (row.status, row.attempts) == ("failed", 1)
+    assert "550" in row.last_error
+    assert await notifications.claim_messages(10) == []
+    assert smtp.messages == []
+
+
+@pytest.mark.parametrize(
+    ("codes", "permanent"),
+    [
+        ([550], True),
+        ([450], False),  # greylisting
+        ([550, 452], False),
+        ([550, 553], True),
+    ],
+)
+def test_refused_recipients_by_reply_code(codes, permanent):
+    exc = aiosmtplib.SMTPRecipientsRefused(
+        [
+            aiosmtplib.SMTPRecipientRefused(code, "refused", f"user{n}@example.com")
+            for n, code in enumerate(codes)
+        ]
+    )
+    assert notifications.is_permanent(exc) is permanent
+
+
+def test_response_codes():
+    assert notifications.is_permanent(aiosmtplib.SMTPDataError(554, "rejected"))
+    assert not notifications.is_permanent(aiosmtplib.SMTPDataError(451, "try again"))
+    assert not notifications.is_permanent(aiosmtplib.SMTPServerDisconnected("gone"))
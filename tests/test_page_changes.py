@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from search import page_changes, page_hash
+
+
+def stored(page_id: int, page_number: int, content: str, hashed: bool = True):
+    return SimpleNamespace(
+        id=page_id,
+        page_number=page_number,
+        content_hash=page_hash(content) if hashed else None,
+        content=None if hashed else content,
+    )
+
+
+def test_unchanged_document():
+    pages = [stored(1, 0, "uno"), stored(2, 1, "dos")]
+
+    assert page_changes(pages, {0: "uno", 1: "dos"}) == ([], [], [])
+
+
+def test_inserted_page_moves_the_following_ones():
+    pages = [stored(1, 0, "uno"), stored(2, 1, "dos")]
+
+    moved, added, removed = page_changes(pages, {0: "nueva", 1: "uno", 2: "dos"})
+    assert moved == [(1, 1), (2, 2)]
+    assert added == [(0, "nueva")]
+    assert removed == []
+
+
+def test_edited_and_removed_pages():
+    pages = [stored(1, 0, "uno"), stored(2, 1, "dos"), stored(3, 2, "tres")]
+
+    moved, added, removed = page_changes(pages, {0: "uno", 1: "dos editada"})
+    assert moved == []
+    assert added == [(1, "dos editada")]
+    assert sorted(removed) == [2, 3]
+
+
+def test_repeated_pages_are_matched_one_to_one():
+    pages = [stored(1, 0, "igual"), stored(2, 1, "igual")]
+
+    moved, added, removed = page_changes(pages, {0: "igual", 1: "otra", 2: "igual"})
+    assert moved == [(2, 2)]
+    assert added == [(1, "otra")]
+    assert removed == []
+
+    assert page_changes(pages, {0: "igual"}) == ([], [], [2])
+
+
+def test_pages_stored_before_hashes_use_their_content():
+    pages = [stored(1, 0, "uno", hashed=False), stored(2, 1, "dos")]
+
+    assert page_changes(pages, {0: "dos", 1: "uno"}) == ([(2, 0), (1, 1)], [], [])
@@ -0,0 +1,80 @@
+import pytest
+
+from qa import (
+    count_tokens,
+    fit_tokens,
+    is_no_answer,
+    page_segments,
+    page_window,
+    split_line,
+)
+
+
+@pytest.mark.parametrize(
+    "answer", ["No Answer", "No answer.", " no answer \n", '"No Answer"', "NO ANSWER!"]
+)
+def test_no_answer_variants(answer):
+    assert is_no_answer(answer)
+
+
+@pytest.mark.parametrize(
+    "answer", ["No answer was found in the manual, but see page 3", "Answer", ""]
+)
+def test_real_answers(answer):
+    assert not is_no_answer(answer)
+
+
+def test_segments_fit_the_budget_and_keep_the_text():
+    content = "\n".join(
+        [
+            "Introducción breve.",
+            " ".join(f"palabra{n}" for n in range(400)),
+            "https://example.com/" + "a1b2c3d4" * 200,
+            "Cierre.",
+        ]
+    )
+    segments = page_segments(content, 50)
+
+    assert all(count_tokens(segment) <= 50 for segment in segments)
+    assert "".join("".join(segments).split()) == "".join(content.split())
+
+
+def test_long_token_is_cut_by_characters():
+    token = "x" * 5000
+    pieces = split_line(token, 20)
+
+    assert len(pieces) > 1
+    assert all(count_tokens(piece) <= 20 for piece in pieces)
+    assert "".join(pieces) == token
+
+
+def test_segments_are_deterministic():
+    content = "uno dos tres\n" * 200
+    assert page_segments(content, 30) == page_segments(content, 30)
+
+
+def test_window_of_a_page_with_a_huge_url():
+    content = "La válvula de presión se revisa cada semana.\n" + "https://x.io/" + "q" * 20000
+    window = page_window(content, "¿Cada cuánto se revisa la válvula?", 200)
+
+    assert count_tokens(window) <= 200
+
+
+@pytest.mark.parametrize("budget", [40, 75, 200])
+def test_window_never_exceeds_the_budget(budget):
+    lines = [f"línea {n}: " + " ".join(f"tok{n}{k}" for k in range(n % 7 + 1)) for n in range(300)]
+    content = "\n".join(lines + ["https://x.io/" + "ab" * 3000])
+
+    window = page_window(content, "¿Qué dice la línea 150?", budget)
+
+    assert window
+    assert count_tokens(window) <= budget
+
+
+def test_fit_tokens_trims_only_what_does_not_fit():
+    text = " ".join(["palabra"] * 100)
+
+    assert fit_tokens(text, 1000) == text
+    trimmed = fit_tokens(text, 10)
+    assert text.startswith(trimmed)
+    assert count_tokens(trimmed) <= 10 < count_tokens(text[: len(trimmed) + 1])
@@ -0,0 +1,71 @@
+import numpy
+import pytest
+
+from quantization import code_scores, quantize, reduce_dimensions, top_candidates
+from search import cosine_matrix
+
+
+@pytest.fixture
+def vectors():
+    rng = numpy.random.default_rng(0)
+    return rng.normal(size=(50, 64)).tolist()
+
+
+def test_int8_codes(vectors):
+    codes = quantize(vectors, "int8")
+
+    assert len(codes) == 50
+    assert all(len(code) == 64 for code in codes)
+
+
+def test_binary_codes_pack_one_bit_per_dimension(vectors):
+    codes = quantize(vectors, "binary")
+
+    assert all(len(code) == 8 for code in codes)
+    signs = numpy.unpackbits(numpy.frombuffer(codes[0], dtype=numpy.uint8))
+    assert (signs == (numpy.asarray(vectors[0]) > 0)).all()
+
+
+def test_unknown_quantization(vectors):
+    with pytest.raises(ValueError):
+        quantize(vectors, "int4")
+    with pytest.raises(ValueError):
+        code_scores(vectors[:1], quantize(vectors, "int8"), "int4")
+
+
+def test_int8_scores_approximate_cosine(vectors):
+    queries = vectors[:3]
+    exact = cosine_matrix(queries, vectors)
+    approximate = code_scores(queries, quantize(vectors, "int8"), "int8")
+
+    assert approximate.shape == (3, 50)
+    assert numpy.abs(approximate - exact).max() < 0.02
+
+
+def test_binary_scores_keep_the_best_match(vectors):
+    queries = vectors[:5]
+    scores = code_scores(queries, quantize(vectors, "binary"), "binary")
+
+    # cada consulta está en el corpus: su propio código es el más parecido
+    assert (scores.argmax(axis=1) == numpy.arange(5)).all()
+
+
+def test_scores_without_codes(vectors):
+    assert code_scores(vectors[:2], [], "int8").shape == (2, 0)
+
+
+def test_top_candidates_union_of_each_row():
+    scores = numpy.asarray([[0.9, 0.1, 0.8, 0.0], [0.0, 0.7, 0.1, 0.9]])
+
+    assert top_candidates(scores, 1).tolist() == [0, 3]
+    assert sorted(top_candidates(scores, 2).tolist()) == [0, 1, 2, 3]
+    assert top_candidates(scores, 10).tolist() == [0, 1, 2, 3]
+
+
+def test_reduce_dimensions_renormalizes():
+    vector = [3.0, 4.0, 12.0]
+
+    reduced = reduce_dimensions(vector, 2)
+    assert reduced == pytest.approx([0.6, 0.8])
+    assert reduce_dimensions(vector, None) is vector
+    assert reduce_dimensions(vector, 3) is vector
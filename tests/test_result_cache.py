@@ -0,0 +1,73 @@
+from search import ResultCache
+
+
+def test_key_normalizes_the_query():
+    assert ResultCache.key("  Motor   Diesel ", 10, "hybrid") == ResultCache.key(
+        "motor diesel", 10, "hybrid"
+    )
+    assert ResultCache.key("motor", 10, "hybrid", 1) != ResultCache.key("motor", 10, "hybrid", 2)
+
+
+def test_hit_within_the_same_version():
+    cache = ResultCache(10)
+    key = ResultCache.key("motor", 10)
+
+    assert cache.get(key, 1) is None
+    cache.put(key, 1, ["doc"])
+    assert cache.get(key, 1) == ["doc"]
+
+
+def test_new_version_clears_everything():
+    cache = ResultCache(10)
+    first, second = ResultCache.key("motor", 10), ResultCache.key("valvula", 10)
+    cache.get(first, 1)
+    cache.put(first, 1, ["a"])
+    cache.put(second, 1, ["b"])
+
+    assert cache.get(first, 2) is None
+    assert cache.get(second, 2) is None
+
+
+def test_older_version_does_not_reset_the_cache():
+    cache = ResultCache(10)
+    key = ResultCache.key("motor", 10)
+    cache.get(key, 2)
+    cache.put(key, 2, ["new"])
+
+    # una petición que leyó la versión antes del último cambio
+    assert cache.get(key, 1) is None
+    cache.put(key, 1, ["old"])
+    assert cache.get(key, 2) == ["new"]
+
+
+def test_result_computed_for_an_old_version_is_not_stored():
+    cache = ResultCache(10)
+    key = ResultCache.key("motor", 10)
+    cache.get(key, 1)
+
+    cache.get(ResultCache.key("otra", 10), 2)  # el corpus cambió mientras se calculaba
+    cache.put(key, 1, ["stale"])
+    assert cache.get(key, 2) is None
+
+
+def test_least_recently_used_is_evicted():
+    cache = ResultCache(2)
+    a, b, c = (ResultCache.key(text, 10) for text in "abc")
+    cache.get(a, 1)
+    cache.put(a, 1, ["a"])
+    cache.put(b, 1, ["b"])
+    cache.get(a, 1)
+    cache.put(c, 1, ["c"])
+
+    assert cache.get(a, 1) == ["a"]
+    assert cache.get(b, 1) is None
+    assert cache.get(c, 1) == ["c"]
+
+
+def test_size_zero_disables_the_cache():
+    cache = ResultCache(0)
+    key = ResultCache.key("motor", 10)
+    cache.get(key, 1)
+    cache.put(key, 1, ["doc"])
+
+    assert cache.get(key, 1) is None
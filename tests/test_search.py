@@ -0,0 +1,195 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy
+
+import search
+from config import config
+from database import document_table
+from search import (
+    BM25_B,
+    BM25_K1,
+    RRF_K,
+    batch_lexical_scores,
+    bm25_idf,
+    index_page,
+    lexical_document_scores,
+    lexical_page_scores,
+    ranking,
+    reciprocal_rank_fusion,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def corpus(db, monkeypatch):
+    """Documentos de prueba {nombre: id} y la select que los limita (scope)"""
+    monkeypatch.setattr(config, "LEXICAL_MAX_DF", 0.5)
+    corpus = SimpleNamespace(ids={}, scope=None)
+
+    async def add(name: str, *pages: str) -> int:
+        id = await db.execute(document_table.insert().values(name=name, url=name))
+        for page_number, content in enumerate(pages):
+            await index_page({"document_id": id, "page_number": page_number, "content": content})
+
+        corpus.ids[name] = id
+        corpus.scope = sqlalchemy.select(document_table.c.id).where(
+            document_table.c.id.in_(list(corpus.ids.values()))
+        )
+        return id
+
+    corpus.add = add
+    yield corpus
+    await db.execute(document_table.delete().where(document_table.c.id.in_(corpus.ids.values())))
+
+
+def expected_bm25(frequency: int, length: int, avg_length: float, idf: float) -> float:
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+    return idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+
+def test_idf_decreases_with_document_frequency():
+    assert bm25_idf(10, 1) > bm25_idf(10, 3) > bm25_idf(10, 10) > 0
+
+
+async def test_rare_terms_weigh_more(corpus):
+    rare = await corpus.add("rare", "valvula relleno")
+    common = [await corpus.add(name, "motor relleno") for name in "abc"]
+    for name in "defghi":
+        await corpus.add(name, "nada relleno extra")
+
+    scores = await lexical_page_scores("valvula motor", 10, scope=corpus.scope)
+
+    assert set(scores) == {(rare, 0), *((id, 0) for id in common)}
+    assert scores[(rare, 0)] > scores[(common[0], 0)] == pytest.approx(scores[(common[1], 0)])
+
+
+async def test_sum_matches_bm25(corpus, monkeypatch):
+    monkeypatch.setattr(config, "LEXICAL_MAX_DF", 0)  # motor está en 2 de 3 páginas
+    first = await corpus.add("first", "motor valvula motor otra", "motor")
+    await corpus.add("second", "freno freno freno freno")
+
+    scores = await lexical_page_scores("motor valvula", 10, scope=corpus.scope)
+
+    avg_length = (4 + 1 + 4) / 3
+    motor, valvula = bm25_idf(3, 2), bm25_idf(3, 1)
+    assert scores[(first, 0)] == pytest.approx(
+        expected_bm25(2, 4, avg_length, motor) + expected_bm25(1, 4, avg_length, valvula)
+    )
+    assert scores[(first, 1)] == pytest.approx(expected_bm25(1, 1, avg_length, motor))
+
+
+async def test_term_frequency_saturates(corpus):
+    ids = [
+        await corpus.add(str(count), " ".join(["motor"] * count + ["x"] * (100 - count)))
+        for count in (1, 10, 100)
+    ]
+    await corpus.add("other", "x " * 100)
+    await corpus.add("short", "motor x")
+
+    scores = await lexical_page_scores("motor", 10, scope=corpus.scope)
+    one, ten, hundred = (scores[(id, 0)] for id in ids)
+
+    assert one < ten < hundred
+    assert hundred - ten < ten - one
+    assert scores[(corpus.ids["short"], 0)] > one
+
+
+async def test_limit_keeps_the_best(corpus):
+    ids = [await corpus.add(str(count), "motor " * count + "x " * 10) for count in range(1, 6)]
+    for name in "abcde":
+        await corpus.add(name, "x")
+
+    scores = await lexical_page_scores("motor", 2, scope=corpus.scope)
+
+    assert list(scores) == [(ids[4], 0), (ids[3], 0)]
+
+
+async def test_per_document_takes_the_best_page(corpus):
+    best = await corpus.add("best", "x", "motor motor", "motor")
+    await corpus.add("other", "x", "x")
+    await corpus.add("third", "y", "y")
+
+    pages = await lexical_page_scores("motor", 10, scope=corpus.scope)
+    [documents] = await lexical_document_scores(["motor"], 10, scope=corpus.scope)
+
+    assert documents == {best: pytest.approx(max(pages.values()))}
+
+
+async def test_common_terms_do_not_score(corpus):
+    rare = await corpus.add("rare", "el motor")
+    for name in "abc":
+        await corpus.add(name, "el freno")
+
+    assert set(await lexical_page_scores("el motor", 10, scope=corpus.scope)) == {(rare, 0)}
+    # una consulta solo de términos comunes se queda con el más raro
+    assert len(await lexical_page_scores("el", 10, scope=corpus.scope)) == 4
+
+
+async def test_scores_within_a_document(corpus):
+    first = await corpus.add("first", "motor", "freno")
+    await corpus.add("second", "motor")
+
+    scores = await lexical_page_scores("motor", 10, first, scope=corpus.scope)
+
+    assert list(scores) == [(first, 0)]
+    assert await lexical_page_scores("", 10, scope=corpus.scope) == {}
+
+
+def test_ranking_orders_and_limits():
+    scores = {"a": 0.1, "b": 0.9, "c": 0.5}
+
+    assert ranking(scores) == ["b", "c", "a"]
+    assert ranking(scores, 2) == ["b", "c"]
+    assert ranking({}, 3) == []
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion(["a", "b", "c"], ["c", "a"])
+
+    assert fused["a"] == pytest.approx(1 / (RRF_K + 1) + 1 / (RRF_K + 2))
+    assert fused["b"] == pytest.approx(1 / (RRF_K + 2))
+    assert fused["c"] == pytest.approx(1 / (RRF_K + 3) + 1 / (RRF_K + 1))
+    # lo que aparece en las dos listas gana a lo que está arriba en una sola
+    assert ranking(fused) == ["a", "c", "b"]
+
+
+def test_reciprocal_rank_fusion_of_one_ranking_keeps_its_order():
+    assert ranking(reciprocal_rank_fusion(["x", "y", "z"])) == ["x", "y", "z"]
+
+
+async def test_batch_scores_each_query_separately(corpus):
+    motor = await corpus.add("motor", "motor motor", "motor")
+    freno = await corpus.add("freno", "freno")
+    await corpus.add("other", "x", "y")
+
+    pages = await batch_lexical_scores(["motor", "freno", "", "motor freno"], 1, scope=corpus.scope)
+    documents = await lexical_document_scores(["motor", "freno"], 10, scope=corpus.scope)
+
+    assert [list(scores) for scores in pages] == [[(motor, 0)], [(freno, 0)], [], [(freno, 0)]]
+    assert pages[0] == await lexical_page_scores("motor", 1, scope=corpus.scope)
+    assert [list(scores) for scores in documents] == [[motor], [freno]]
+
+
+async def test_failed_vector_search_cancels_the_lexical_one(monkeypatch):
+    cancelled = asyncio.Event()
+
+    async def lexical_page_scores(*args, **kwargs):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def document_similarities(*args):
+        await asyncio.sleep(0)
+        raise RuntimeError("embeddings index unavailable")
+
+    monkeypatch.setattr(search, "lexical_page_scores", lexical_page_scores)
+    monkeypatch.setattr(search, "document_similarities", document_similarities)
+
+    with pytest.raises(RuntimeError):
+        await search.retrieve_pages("motor", [1.0, 0.0], 5, fanout=2)
+    await asyncio.wait_for(cancelled.wait(), 1)
@@ -1,49 +1,117 @@
 import asyncio
-from enum import Enum
+import time
 from pathlib import Path
 from tqdm import tqdm
 from typing import Optional
 
 import aiofiles
-import PyPDF2
-from docx import Document as DocxDocument
-from fastapi import HTTPException, status
 
-from config import config, logger, openai_client
+from config import config, logger
+from database import database, embedding_index_table
+from embeddings import EMBEDDING_PROVIDERS, qualified_model, resolve_model, vector_key
+from extractors import FileType, extract_pages  # noqa: F401
+from metrics import EMBEDDING_LATENCY
+
+ingest_logger = logger.getChild("ingest")  # una línea por página: LOG_LEVELS
+
+# (momento de la lectura, perfil) y cuántas veces se ha invalidado
+_profile: Optional[tuple[float, tuple[str, Optional[int]]]] = None
+_profile_generation = 0
+
+
+async def embedding_profile() -> tuple[str, Optional[int]]:
+    """
+    Modelo y dimensiones del índice activo; los de config si aún no hay
+    ninguno. Se guarda en memoria EMBEDDING_PROFILE_TTL segundos: cada
+    consulta lo necesita, y cuando reembed.py activa un índice desde otro
+    proceso basta con que los servidores lo vean al caducar.
+    """
+    global _profile
+    now = time.monotonic()
+    if _profile is not None and now - _profile[0] < config.EMBEDDING_PROFILE_TTL:
+        return _profile[1]
+
+    generation = _profile_generation
+    query = embedding_index_table.select().where(embedding_index_table.c.status == "active")
+    index = await database.fetch_one(query)
+    if index:
+        profile = (index.model, index.dimensions)  # type: ignore
+    else:
+        profile = (
+            qualified_model(config.EMBEDDING_PROVIDER, config.EMBEDDING_MODEL),
+            config.EMBEDDING_DIMENSIONS,
+        )
+
+    if generation == _profile_generation:  # no se invalidó mientras se leía
+        _profile = (now, profile)
+    return profile
+
+
+def invalidate_embedding_profile() -> None:
+    global _profile, _profile_generation
+    _profile = None
+    _profile_generation += 1
 
 
 async def get_embedding(
-    text: str, model: str = "text-embedding-3-small"
+    text: str, model: Optional[str] = None, dimensions: Optional[int] = None
 ) -> list[float]:
-    text = text.replace("\n", " ")
-    response = await openai_client.embeddings.create(input=[text], model=model)
-    return response.data[0].embedding
+    return (await get_embeddings([text], model, dimensions))[0]
+
+
+async def get_embeddings(
+    texts: list[str], model: Optional[str] = None, dimensions: Optional[int] = None
+) -> list[list[float]]:
+    """
+    Embeddings de varios textos en lotes del tamaño que admite el proveedor
+    del modelo (embeddings.py). Sin model se usa el del índice activo, para
+    que las consultas se comparen siempre con vectores del mismo modelo.
+    """
+    if model is None:
+        model, dimensions = await embedding_profile()
+
+    provider, name = resolve_model(model)
+    texts = [text.replace("\n", " ") for text in texts]
+
+    async def embed_batch(batch: list[str]) -> list[list[float]]:
+        with EMBEDDING_LATENCY.time(model=model):
+            return await provider.embed(batch, name, dimensions)
+
+    batches = await asyncio.gather(
+        *(
+            embed_batch(texts[start : start + provider.batch_size])
+            for start in range(0, len(texts), provider.batch_size)
+        )
+    )
+    return [vector for batch in batches for vector in batch]
 
 
-def clean_text(text: str) -> str:
-    """Remove null bytes and ensure UTF-8 encoding"""
-    return text.replace("\x00", "").encode("utf-8", errors="ignore").decode("utf-8")
+async def query_embeddings(texts: list[str]) -> tuple[str, list[list[float]]]:
+    """Embeddings de las consultas y la clave (vector_key) de los vectores con los que se comparan"""
+    model, dimensions = await embedding_profile()
+    return vector_key(model, dimensions), await get_embeddings(texts, model, dimensions)
 
 
-async def get_page_embedding(idx: int, content: str, pbar: Optional[tqdm] = None):
-    logger.debug(
-        f"Getting embeddings from page or paragraph {idx} with {len(content)} characters"
-    )
-    result = {
-        "page_number": idx,
-        "content": content,
-        "embeddings": await get_embedding(content[:2000]),
-    }
+async def warm_up_embeddings() -> None:
+    """Carga en el arranque el modelo local del índice activo, si lo es"""
+    model, _ = await embedding_profile()
+    provider, name = resolve_model(model)
+    await asyncio.to_thread(provider.warm_up, name)
+
 
-    if pbar:
-        pbar.update(1)
+def close_embeddings() -> None:
+    for provider in EMBEDDING_PROVIDERS.values():
+        provider.close()
 
-    return result
+
+def clean_text(text: str) -> str:
+    """Remove null bytes and ensure UTF-8 encoding"""
+    return text.replace("\x00", "").encode("utf-8", errors="ignore").decode("utf-8")
 
 
-async def download_file(file):
+async def download_file(file, file_path: Optional[Path] = None):
     CHUNK_SIZE = 1024 * 1024
-    file_path = Path(config.DOCUMENT_PATH) / file.filename  # type: ignore
+    file_path = file_path or Path(config.DOCUMENT_PATH) / file.filename  # type: ignore
     file_size = file.size
     
     with tqdm(total=file_size, unit='B', unit_scale=True, desc="Downloading file") as pbar:
@@ -55,65 +123,40 @@ async def download_file(file):
     return file_path
 
 
-class FileType(Enum):
-    pdf = "application/pdf"
-    docx = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+async def get_document_content(content_type, file_path, filename=None):
+    texts = await extract_pages(content_type, file_path, filename)
+    return await get_pages_embeddings(texts)
 
 
-async def get_document_content(content_type, file_path):
-    if content_type == FileType.pdf.value:
-        return await get_pdf_content(file_path)
-
-    elif content_type == FileType.docx.value:
-        return await get_docx_content(file_path)
-
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid Format File: {content_type} Must be .pdf or .docx",
-        )
-
-
-async def get_pdf_content(file_path):
-    content = ""
-    pages = []
-    process_list = []
-
-    with open(file_path, "rb") as new_file:
-        reader = PyPDF2.PdfReader(new_file)
-        num_pages = len(reader.pages)
-        
-        with tqdm(total=num_pages, desc="Processing PDF pages") as pbar:
-            for idx, page in enumerate(reader.pages):
-                content_page = clean_text(page.extract_text())
-                if content_page:
-                    process_list.append(get_page_embedding(idx, content_page, pbar))
-                content += content_page + "\n"
-
-            if process_list:
-                pages = await asyncio.gather(*process_list)
-
-    return content, pages
-
-
-async def get_docx_content(file_path):
+async def get_pages_embeddings(texts: list[str]):
+    """Una sola llamada a get_embeddings para todas las páginas con texto"""
     content = ""
     pages = []
-    process_list = []
-    doc = DocxDocument(file_path)  # type: ignore
-    paragraphs = doc.paragraphs
-    num_paragraphs = len(paragraphs)
-    
-    with tqdm(total=num_paragraphs, desc="Processing DOCX paragraphs") as pbar:
-        for idx, para in enumerate(paragraphs):
-            content_page = clean_text(para.text)
-            if content_page:
-                process_list.append(get_page_embedding(idx, content_page, pbar))
-            content += content_page + "\n"
-
-        if process_list:
-            pages = await asyncio.gather(*process_list)
-
+    model, dimensions = await embedding_profile()
+
+    for idx, text in enumerate(texts):
+        content_page = clean_text(text)
+        if content_page:
+            ingest_logger.debug(
+                "Getting embeddings from page or paragraph %s with %s characters",
+                idx,
+                len(content_page),
+            )
+            pages.append(
+                {
+                    "page_number": idx,
+                    "content": content_page,
+                    "embedding_model": vector_key(model, dimensions),
+                }
+            )
+        content += content_page + "\n"
+
+    if pages:
+        embeddings = await get_embeddings(
+            [page["content"][:2000] for page in pages], model, dimensions
+        )
+        for page, vector in zip(pages, embeddings):
+            page["embeddings"] = vector
 
     return content, pages
 
@@ -1,16 +1,14 @@
 import re
-import subprocess
+from functools import lru_cache, partial
 
-import PyPDF2
-from docx import Document
-from fastapi import HTTPException, status
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+# PyPDF2, python-docx y sklearn se importan al usarlos: tardan en cargar y
+# la mayoría de peticiones no los necesitan
+from preprocessing import preprocess_text
 
 
 def extract_text_from_pdf(file_path):
+    import PyPDF2
+
     text = ""
     with open(file_path, "rb") as file:
         reader = PyPDF2.PdfReader(file)
@@ -20,35 +18,15 @@ def extract_text_from_pdf(file_path):
 
 
 def extract_text_from_docx(file_path):
+    from docx import Document
+
     doc = Document(file_path)
     return "\n".join([para.text for para in doc.paragraphs])
 
 
-def extract_text_from_doc(doc_path):
-    result = subprocess.run(["antiword", doc_path], capture_output=True, text=True)
-    if result.returncode == 0:
-        return result.stdout
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="No antiword installed",
-        )
-
-
-def preprocess_text(text):
-    text = text.lower()
-
-    text = re.sub(r"[^\w\s]", "", text)
-
-    tokens = word_tokenize(text)
-
-    stop_words = set(stopwords.words("spanish") + stopwords.words("english"))
-    tokens = [word for word in tokens if word not in stop_words]
-
-    return " ".join(tokens)
-
-
 def create_search_index(document_text):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
     chunks = [chunk for chunk in document_text.split("\n") if chunk.strip()]
 
     vectorizer = TfidfVectorizer(preprocessor=preprocess_text)
@@ -58,6 +36,8 @@ def create_search_index(document_text):
 
 
 def find_most_relevant_chunk(query, vectorizer, tfidf_matrix, chunks):
+    from sklearn.metrics.pairwise import cosine_similarity
+
     query_vec = vectorizer.transform([query])
 
     similarities = cosine_similarity(query_vec, tfidf_matrix)
@@ -67,6 +47,45 @@ def find_most_relevant_chunk(query, vectorizer, tfidf_matrix, chunks):
     return chunks[most_similar_idx], similarities[0][most_similar_idx], most_similar_idx
 
 
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+
+def split_sentences(text: str, min_length: int = 20) -> list[str]:
+    return [
+        sentence.strip()
+        for sentence in SENTENCE_PATTERN.split(text)
+        if len(sentence.strip()) >= min_length
+    ]
+
+
+@lru_cache(maxsize=256)
+def create_sentence_index(text: str):
+    """Índice TF-IDF por frases de una página; se reutiliza entre consultas"""
+    sentences = split_sentences(text)
+    if not sentences:
+        return None, None, []
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    vectorizer = TfidfVectorizer(preprocessor=partial(preprocess_text, fold=True))
+    try:
+        tfidf_matrix = vectorizer.fit_transform(sentences)
+    except ValueError:  # solo stopwords
+        return None, None, []
+
+    return vectorizer, tfidf_matrix, sentences
+
+
+def find_answer_in_page(text: str, query: str) -> tuple[str, float]:
+    """Frase de la página más parecida a la consulta y su similitud coseno"""
+    vectorizer, tfidf_matrix, sentences = create_sentence_index(text)
+    if not sentences:
+        return "", 0.0
+
+    sentence, score, _ = find_most_relevant_chunk(query, vectorizer, tfidf_matrix, sentences)
+    return sentence, float(score)
+
+
 def find_answer_in_document(text: str, query: str):
     # Crear índice de búsqueda
     vectorizer, tfidf_matrix, chunks = create_search_index(text)
@@ -77,22 +96,16 @@ def find_answer_in_document(text: str, query: str):
 
     return {
         "answer": most_relevant_chunk,
-        "context": get_context(text, most_relevant_chunk),
+        "context": get_context(chunks, most_similar_idx),
         "paragraph": most_similar_idx,
     }
 
 
-def get_context(full_text, answer_chunk, window_size=2):
+def get_context(paragraphs, idx, window_size=2):
     # Obtener párrafos alrededor de la respuesta para contexto
-    paragraphs = [p for p in full_text.split("\n") if p.strip()]
-    try:
-        idx = paragraphs.index(answer_chunk)
-        start = max(0, idx - window_size)
-        end = min(len(paragraphs), idx + window_size + 1)
-        return "\n".join(paragraphs[start:end])
-
-    except ValueError:
-        return answer_chunk
+    start = max(0, idx - window_size)
+    end = min(len(paragraphs), idx + window_size + 1)
+    return "\n".join(paragraphs[start:end])
 
 
 if __name__ == "__main__":